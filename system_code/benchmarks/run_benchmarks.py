@@ -0,0 +1,432 @@
+# -*- coding: utf-8 -*-
+"""
+End-to-end benchmark of the ingest, processing, dashboard and search paths.
+
+Everything runs against a separate database (``--database``) on the configured Postgres server,
+with its own cache directory, so the real data and caches are left alone. The search path goes
+to a StubRetrievalServer instead of the Viking knowledge base.
+
+Phases (``--phases``):
+    ingest   The bundled All_Beauty_part_*.csv files, scaled up ``--scale`` times with synthetic
+             copies, loaded through PGClient.init_reviews into an emptied database (rows/sec).
+    process  PGClient.process_and_update_reviews over every review (reviews/sec).
+    routes   Every /api/dashboard/* route and /api/search, served by the Flask app (or the async
+             app with ``--server asgi``) in a subprocess, under ``--concurrency`` concurrent
+             clients: p50/p95/p99 latency, throughput, errors and cache hit ratio per route.
+
+Peak RSS is recorded for this process, its worker processes and the server. Results are written
+as JSON; ``--compare`` prints the change of every metric against an earlier result file.
+
+Usage:
+    python system_code/benchmarks/run_benchmarks.py --scale 4 --concurrency 16 --output before.json
+    python system_code/benchmarks/run_benchmarks.py --scale 4 --concurrency 16 --compare before.json
+"""
+import sys
+import os
+import re
+import json
+import time
+import glob
+import random
+import shutil
+import argparse
+import platform
+import resource
+import tempfile
+import threading
+import subprocess
+from datetime import datetime
+from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+import pandas as pd
+import requests
+import psycopg2
+from psycopg2 import sql
+from psycopg2.extensions import ISOLATION_LEVEL_AUTOCOMMIT
+
+# Add project root to Python path to allow imports like system_code.server.database
+project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..'))
+sys.path.insert(0, project_root)
+
+from system_code.core.config import Config, logger
+from system_code.server.database.postgres_client import PGClient
+from system_code.server.fd.backend.dashboard_queries import PANELS
+from system_code.benchmarks.stub_retrieval import StubRetrievalServer
+
+DATASET_GLOB = str(Config.STATICS_PATH / 'datasets' / 'reviews' / 'csv' / 'All_Beauty_part_*.csv')
+QUERY_PATH = Config.STATICS_PATH / 'datasets' / 'deep_search' / 'query_database.json'
+# Synthetic copies of a review are moved by up to this many days
+DAY_JITTER = 180
+MS_PER_DAY = 86400000
+SENTENCE_PATTERN = re.compile(r'(?<=[.!?])\s+')
+# Seconds the server gets to answer /api/health
+STARTUP_TIMEOUT = 180
+SERVER_COMMANDS = {
+    'flask': [sys.executable, '-c', "from system_code.server.fd.backend.app import app; "
+                                    "app.run(host='127.0.0.1', port={port}, threaded=True)"],
+    'asgi': [sys.executable, '-m', 'uvicorn', 'system_code.server.fd.backend.async_app:app',
+             '--host', '127.0.0.1', '--port', '{port}', '--log-level', 'warning'],
+}
+
+
+def peak_rss_mb(who=resource.RUSAGE_SELF):
+    """Peak resident set size in MB; RUSAGE_CHILDREN is the largest finished child process."""
+    # ru_maxrss is in KB on Linux
+    return round(resource.getrusage(who).ru_maxrss / 1024, 1)
+
+
+def process_peak_rss_mb(pid):
+    """Peak resident set size of a running process in MB, None where /proc is not available."""
+    try:
+        with open(f'/proc/{pid}/status') as f:
+            for line in f:
+                if line.startswith('VmHWM:'):
+                    return round(int(line.split()[1]) / 1024, 1)
+    except OSError:
+        pass
+    return None
+
+
+def git_version():
+    try:
+        return subprocess.run(['git', 'describe', '--always', '--dirty'], cwd=project_root,
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def use_workspace(workdir, database, stub_url=None):
+    """
+    Points this process and the processes it starts at a config naming ``database`` (and the
+    stub retrieval server) and at a cache directory inside ``workdir``.
+    """
+    with open(Config.CONFIG_PATH) as f:
+        config = json.load(f)
+    config['database'] = dict(config['database'], database=database)
+    # No reranker or semantic cache model downloads while measuring
+    config['retrieval'] = dict(config.get('retrieval', {}), backend='remote', remote_url=stub_url,
+                               reranker_model=None, semantic_cache=False)
+    config_path = os.path.join(workdir, 'config.json')
+    with open(config_path, 'w') as f:
+        json.dump(config, f, indent=2)
+
+    cache_dir = os.path.join(workdir, 'cache')
+    os.makedirs(cache_dir, exist_ok=True)
+    Config.CONFIG_PATH, Config.CACHE_DIR = Path(config_path), Path(cache_dir)
+    os.environ['INSIGHTREVIEW_CONFIG'], os.environ['INSIGHTREVIEW_CACHE_DIR'] = config_path, cache_dir
+    # The Viking client is built even though the stub ignores signatures
+    for name in ('VOLCENGINE_AK', 'VOLCENGINE_SK', 'COLLECTION_NAME'):
+        os.environ.setdefault(name, 'benchmark')
+
+
+def ensure_database(database):
+    """Creates ``database``; PGClient connects to it before its own validation could."""
+    config = Config().postgresql
+    conn = psycopg2.connect(host=config['host'], port=config['port'], user=config['user'],
+                            password=config['password'], database='postgres')
+    conn.set_isolation_level(ISOLATION_LEVEL_AUTOCOMMIT)
+    try:
+        with conn.cursor() as cursor:
+            cursor.execute("SELECT 1 FROM pg_database WHERE datname = %s", (database,))
+            if cursor.fetchone() is None:
+                # Explicit, as clusters initialized with a C locale default to SQL_ASCII
+                cursor.execute(sql.SQL("CREATE DATABASE {} ENCODING 'UTF8' TEMPLATE template0").format(sql.Identifier(database)))
+    finally:
+        conn.close()
+
+
+def shuffle_sentences(text, rng):
+    if not isinstance(text, str):
+        return text
+    sentences = SENTENCE_PATTERN.split(text)
+    return ' '.join(sentences[i] for i in rng.permutation(len(sentences)))
+
+
+def scale_dataset(files, scale, out_dir, seed=0):
+    """
+    Writes every review file ``scale`` times over: the original rows, then copies from other
+    users, moved by up to DAY_JITTER days and with their sentences shuffled, so the copies are
+    neither duplicates to the loader nor (mostly) to the analysis cache.
+
+    Returns (paths, rows).
+    """
+    rng = np.random.default_rng(seed)
+    paths, rows = [], 0
+    for path in files:
+        df = pd.read_csv(path)
+        copies = [df]
+        for k in range(1, scale):
+            copy = df.copy()
+            copy['user_id'] = copy['user_id'].astype(str) + f'-x{k}'
+            copy['timestamp'] = copy['timestamp'] + rng.integers(-DAY_JITTER, DAY_JITTER + 1, len(copy)) * MS_PER_DAY
+            copy['text'] = [shuffle_sentences(text, rng) for text in copy['text']]
+            copies.append(copy)
+        scaled = pd.concat(copies, ignore_index=True)
+        out_path = os.path.join(out_dir, f'{os.path.splitext(os.path.basename(path))[0]}_x{scale}.csv')
+        scaled.to_csv(out_path, index=False)
+        paths.append(out_path)
+        rows += len(scaled)
+    return paths, rows
+
+
+def count_reviews(client, condition='TRUE'):
+    return client.execute(f'SELECT COUNT(*) FROM beauty_reviews WHERE {condition}')[0][0]
+
+
+def bench_ingest(client, files):
+    """Loads ``files`` into emptied tables."""
+    client.execute('TRUNCATE beauty_reviews, daily_review_stats, daily_word_totals, daily_word_stats, analysis_cache')
+    started = time.perf_counter()
+    client.init_reviews(files)
+    seconds = time.perf_counter() - started
+    rows = count_reviews(client)
+    return {'rows': rows, 'seconds': round(seconds, 3), 'rows_per_sec': round(rows / seconds, 1),
+            'peak_rss_mb': peak_rss_mb()}
+
+
+def bench_processing(client, workers, batch_size):
+    """Classifies every review from scratch: earlier results and the analysis cache are dropped."""
+    if count_reviews(client, "sentiment != '' OR summary != ''"):
+        client.execute("UPDATE beauty_reviews SET sentiment = '', summary = '', real_review = FALSE")
+        client.refresh_daily_review_stats()
+        client.refresh_daily_word_stats()
+    client.execute('TRUNCATE analysis_cache')
+
+    started = time.perf_counter()
+    processed = client.process_and_update_reviews(workers=workers, batch_size=batch_size)
+    seconds = time.perf_counter() - started
+    if not processed:
+        raise RuntimeError('no reviews were processed, see the log above')
+    return {'reviews': processed, 'workers': workers, 'seconds': round(seconds, 3),
+            'reviews_per_sec': round(processed / seconds, 1), 'peak_rss_mb': peak_rss_mb(),
+            'workers_peak_rss_mb': peak_rss_mb(resource.RUSAGE_CHILDREN) if workers > 1 else None}
+
+
+def filter_sets(client, count, rng):
+    """``count`` random dashboard filter combinations over whole months of the loaded data."""
+    first, last = client.execute('SELECT MIN(day), MAX(day) FROM daily_review_stats')[0]
+    if first is None:
+        raise RuntimeError('the benchmark database is empty, run the ingest phase first')
+    months = pd.date_range(first.replace(day=1), last, freq='MS')
+    sets = []
+    for _ in range(count):
+        args = {}
+        if rng.random() < 0.7:
+            start, end = sorted(rng.sample(range(len(months)), 2)) if len(months) > 1 else (0, 0)
+            args['start_date'] = months[start].strftime('%Y-%m-%d')
+            args['end_date'] = (months[end] + pd.offsets.MonthEnd(0)).strftime('%Y-%m-%d')
+        real_reviews = rng.choice([None, 'true', 'false'])
+        if real_reviews:
+            args['real_reviews'] = real_reviews
+        sentiment = rng.choice([None, 'positive', 'negative', 'neutral'])
+        if sentiment:
+            args['sentiment'] = sentiment
+        sets.append(args)
+    return sets
+
+
+def latency_stats(samples, seconds):
+    latencies = np.array([sample['ms'] for sample in samples])
+    cached = [sample['cache'] for sample in samples if sample['cache']]
+    return {
+        'requests': len(samples),
+        'errors': sum(1 for sample in samples if not sample['ok']),
+        'throughput_rps': round(len(samples) / seconds, 1),
+        'mean_ms': round(float(latencies.mean()), 2),
+        'p50_ms': round(float(np.percentile(latencies, 50)), 2),
+        'p95_ms': round(float(np.percentile(latencies, 95)), 2),
+        'p99_ms': round(float(np.percentile(latencies, 99)), 2),
+        'max_ms': round(float(latencies.max()), 2),
+        'cache_hit_ratio': round(cached.count('HIT') / len(cached), 4) if cached else None,
+    }
+
+
+class LoadGenerator:
+    """Fires requests at the server from ``concurrency`` threads, one keep-alive session each."""
+
+    def __init__(self, base_url, concurrency):
+        self.base_url = base_url
+        self.concurrency = concurrency
+        self._local = threading.local()
+
+    def _session(self):
+        if not hasattr(self._local, 'session'):
+            self._local.session = requests.Session()
+        return self._local.session
+
+    def fire(self, request):
+        method, path, kwargs = request
+        started = time.perf_counter()
+        try:
+            response = self._session().request(method, self.base_url + path, timeout=60, **kwargs)
+            ok = response.status_code == 200 and response.json().get('success', False)
+            cache = response.headers.get('X-Cache')
+        except (requests.RequestException, ValueError):
+            ok, cache = False, None
+        return {'ms': (time.perf_counter() - started) * 1000, 'ok': ok, 'cache': cache}
+
+    def run(self, requests_):
+        """Latency stats of ``requests_``, each (method, path, requests kwargs)."""
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=self.concurrency) as executor:
+            samples = list(executor.map(self.fire, requests_))
+        return latency_stats(samples, time.perf_counter() - started)
+
+
+def start_server(kind, port, workdir):
+    command = [part.format(port=port) for part in SERVER_COMMANDS[kind]]
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join(filter(None, [project_root, os.environ.get('PYTHONPATH')])))
+    log = open(os.path.join(workdir, 'server.log'), 'w')
+    process = subprocess.Popen(command, cwd=project_root, env=env, stdout=log, stderr=subprocess.STDOUT)
+
+    base_url = f'http://127.0.0.1:{port}'
+    deadline = time.monotonic() + STARTUP_TIMEOUT
+    while time.monotonic() < deadline and process.poll() is None:
+        try:
+            health = requests.get(base_url + '/api/health', timeout=2).json()
+            return process, base_url, health['data']['models_ready']
+        except (requests.RequestException, ValueError):
+            time.sleep(0.5)
+    stop_server(process)
+    with open(log.name) as f:
+        tail = f.read()[-2000:]
+    raise RuntimeError(f'{kind} server did not come up on port {port}:\n{tail}')
+
+
+def stop_server(process):
+    process.terminate()
+    try:
+        process.wait(timeout=10)
+    except subprocess.TimeoutExpired:
+        process.kill()
+        process.wait()
+
+
+def bench_routes(client, args, workdir, stub):
+    rng = random.Random(args.seed)
+    filters = filter_sets(client, args.distinct_filters, rng)
+    with open(QUERY_PATH) as f:
+        queries = rng.sample([item['query'] for item in json.load(f)], args.distinct_queries)
+
+    process, base_url, models_ready = start_server(args.server, args.port, workdir)
+    try:
+        load = LoadGenerator(base_url, args.concurrency)
+        routes = {}
+        for panel in PANELS:
+            route = f'/api/dashboard/{panel}'
+            logger.info(f'[Benchmark] {route}: {args.requests} requests, {args.concurrency} concurrent')
+            routes[route] = load.run([('GET', route, {'params': rng.choice(filters)})
+                                      for _ in range(args.requests)])
+        logger.info(f'[Benchmark] /api/search: {args.requests} requests, {args.concurrency} concurrent')
+        stub_requests = stub.requests
+        routes['/api/search'] = load.run([('POST', '/api/search', {'json': {'query': rng.choice(queries), 'limit': 10}})
+                                          for _ in range(args.requests)])
+        routes['/api/search']['retrieval_calls'] = stub.requests - stub_requests
+        server = {'kind': args.server, 'models_ready': models_ready, 'peak_rss_mb': process_peak_rss_mb(process.pid)}
+    finally:
+        stop_server(process)
+    return routes, server
+
+
+def flatten(results, prefix=''):
+    """Numeric leaves of a result file, keyed by their dotted path."""
+    values = {}
+    for key, value in results.items():
+        if isinstance(value, dict):
+            values.update(flatten(value, f'{prefix}{key}.'))
+        elif isinstance(value, (int, float)) and not isinstance(value, bool):
+            values[f'{prefix}{key}'] = value
+    return values
+
+
+def compare(results, baseline_path):
+    with open(baseline_path) as f:
+        baseline = json.load(f)
+    before, after = flatten(baseline), flatten(results)
+    print(f"\nChange against {baseline_path} ({baseline['meta'].get('version')} -> {results['meta'].get('version')}):")
+    for key in sorted(before.keys() & after.keys()):
+        if key.startswith(('meta.', 'args.')):
+            continue
+        change = f'{(after[key] - before[key]) / before[key] * 100:+.1f}%' if before[key] else 'n/a'
+        print(f'  {key:<48} {before[key]:>12} {after[key]:>12} {change:>9}')
+
+
+def main():
+    """Runs the selected phases and writes the results."""
+    parser = argparse.ArgumentParser(description="End-to-end benchmark of ingest, processing, dashboard and search.")
+    parser.add_argument('--phases', default='ingest,process,routes', help="Comma-separated subset of ingest,process,routes")
+    parser.add_argument('--database', default='insightreview_bench', help="Database the benchmark owns; emptied by the ingest phase")
+    parser.add_argument('--scale', type=int, default=2, help="Copies of the bundled review files to load")
+    parser.add_argument('--workers', type=int, default=1, help="Processing worker processes")
+    parser.add_argument('--batch-size', type=int, default=None, help="Reviews claimed per processing transaction")
+    parser.add_argument('--server', choices=sorted(SERVER_COMMANDS), default='flask', help="App serving the routes")
+    parser.add_argument('--port', type=int, default=5055, help="Port of the app under test")
+    parser.add_argument('--concurrency', type=int, default=16, help="Concurrent clients per route")
+    parser.add_argument('--requests', type=int, default=500, help="Requests per route")
+    parser.add_argument('--distinct-filters', type=int, default=50, help="Dashboard filter combinations to draw from")
+    parser.add_argument('--distinct-queries', type=int, default=200, help="Search queries to draw from")
+    parser.add_argument('--retrieval-latency-ms', type=float, default=20, help="Simulated latency of the stub retrieval server")
+    parser.add_argument('--seed', type=int, default=0, help="Seed of the synthetic data and the request mix")
+    parser.add_argument('--output', default=None, help="Result file (default: benchmark-<version>-<time>.json)")
+    parser.add_argument('--compare', default=None, help="Earlier result file to print the change against")
+    args = parser.parse_args()
+    phases = [phase.strip() for phase in args.phases.split(',') if phase.strip()]
+
+    version = git_version()
+    results = {'meta': {
+        'version': version,
+        'started_at': datetime.now().isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpu_count': os.cpu_count(),
+    }, 'args': vars(args)}
+
+    workdir = tempfile.mkdtemp(prefix='insightreview-bench-')
+    stub, client = None, None
+    try:
+        documents = pd.concat(pd.read_csv(path, usecols=['text', 'asin']) for path in sorted(glob.glob(DATASET_GLOB)))
+        documents = documents.dropna().sample(n=min(5000, len(documents)), random_state=args.seed).to_dict('records')
+        stub = StubRetrievalServer(documents, latency=args.retrieval_latency_ms / 1000).start()
+        use_workspace(workdir, args.database, stub.url)
+
+        logger.info(f"[Benchmark] Using database {args.database}, workspace {workdir}")
+        ensure_database(args.database)
+        client = PGClient()
+
+        if 'ingest' in phases:
+            files, rows = scale_dataset(sorted(glob.glob(DATASET_GLOB)), args.scale, workdir, seed=args.seed)
+            results['dataset'] = {'files': len(files), 'scale': args.scale, 'rows': rows}
+            logger.info(f"[Benchmark] Ingesting {rows} rows from {len(files)} files")
+            results['ingest'] = bench_ingest(client, files)
+
+        if 'process' in phases:
+            logger.info(f"[Benchmark] Processing with {args.workers} worker(s)")
+            try:
+                results['processing'] = bench_processing(client, args.workers, args.batch_size)
+            except Exception as e:
+                logger.error(f"[Benchmark] Processing failed: {e}")
+                results['processing'] = {'error': str(e)}
+
+        if 'routes' in phases:
+            results['routes'], results['server'] = bench_routes(client, args, workdir, stub)
+    finally:
+        if client:
+            client.close()
+        if stub:
+            stub.close()
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    results['meta']['peak_rss_mb'] = peak_rss_mb()
+    results['meta']['finished_at'] = datetime.now().isoformat(timespec='seconds')
+    output = args.output or f"benchmark-{version or 'unknown'}-{datetime.now():%Y%m%d-%H%M%S}.json"
+    with open(output, 'w') as f:
+        json.dump(results, f, indent=2)
+    logger.info(f"[Benchmark] Results written to {output}")
+
+    if args.compare:
+        compare(results, args.compare)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,98 @@
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from loguru import logger
+
+
+class StubRetrievalServer:
+    """
+    Stand-in for the Viking ``search_knowledge`` API, so the search path can be benchmarked
+    without network access or credentials.
+
+    Every query gets ``limit`` hits drawn from ``documents`` (the same ones for the same query),
+    formatted like the knowledge base's (``text:<review>\\nasin:<product>``), after sleeping
+    ``latency`` seconds to stand for the remote round trip. Signatures are not checked.
+    """
+
+    SEARCH_PATH = '/api/knowledge/collection/search_knowledge'
+    # Pending connections; a load test opens many at once
+    LISTEN_BACKLOG = 1024
+
+    def __init__(self, documents, host='127.0.0.1', port=0, latency=0.0):
+        self.documents = documents
+        self.latency = latency
+        self.requests = 0
+        self._lock = threading.Lock()
+
+        class Server(ThreadingHTTPServer):
+            daemon_threads = True
+            request_queue_size = self.LISTEN_BACKLOG
+
+        self.server = Server((host, port), self._handler())
+        self.thread = None
+
+    @property
+    def url(self):
+        host, port = self.server.server_address[:2]
+        return f'http://{host}:{port}'
+
+    def search(self, query, limit=10):
+        rng = random.Random(query)
+        picked = rng.sample(range(len(self.documents)), min(limit, len(self.documents)))
+        return [{
+            'id': f'doc-{index}',
+            'point_id': f'point-{index}',
+            'score': round(1.0 - rank / (limit + 1), 4),
+            'content': f"text:{self.documents[index]['text']}\nasin:{self.documents[index]['asin']}",
+        } for rank, index in enumerate(picked)]
+
+    def _handler(self):
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            # Keep-alive, as the real endpoint does
+            protocol_version = 'HTTP/1.1'
+
+            def do_POST(self):
+                body = self.rfile.read(int(self.headers.get('Content-Length', 0)))
+                if self.path.split('?')[0] != stub.SEARCH_PATH:
+                    self._reply(404, {'code': 1000, 'message': 'not found'})
+                    return
+                try:
+                    params = json.loads(body or b'{}')
+                    query, limit = params['query'], int(params.get('limit', 10))
+                except (ValueError, KeyError) as e:
+                    self._reply(400, {'code': 1001, 'message': f'bad request: {e}'})
+                    return
+                if stub.latency:
+                    time.sleep(stub.latency)
+                with stub._lock:
+                    stub.requests += 1
+                result_list = stub.search(query, limit)
+                self._reply(200, {'code': 0, 'message': 'success',
+                                  'data': {'result_list': result_list, 'count': len(result_list)}})
+
+            def _reply(self, status, payload):
+                data = json.dumps(payload).encode('utf-8')
+                self.send_response(status)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
+
+    def start(self):
+        self.thread = threading.Thread(target=self.server.serve_forever, name='stub-retrieval', daemon=True)
+        self.thread.start()
+        logger.info(f'[StubRetrievalServer] Serving {len(self.documents)} documents at {self.url}')
+        return self
+
+    def close(self):
+        self.server.shutdown()
+        self.server.server_close()
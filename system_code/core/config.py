@@ -8,7 +8,9 @@ from pathlib import Path
 class Config:
     ROOT_PATH = Path(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
     STATICS_PATH = Path(os.path.join(ROOT_PATH, 'statics'))
-    CONFIG_PATH = STATICS_PATH / 'config.json'
+    # Both can be pointed elsewhere, e.g. so a benchmark run leaves the real data and caches alone
+    CONFIG_PATH = Path(os.getenv('INSIGHTREVIEW_CONFIG', STATICS_PATH / 'config.json'))
+    CACHE_DIR = Path(os.getenv('INSIGHTREVIEW_CACHE_DIR', STATICS_PATH / 'cache'))
     MODEL_DIR = STATICS_PATH / 'models'
     # Load environment variables from .env file
     load_dotenv(STATICS_PATH / '.env')
@@ -18,6 +20,8 @@ class Config:
         self.webhook = None
         self.postgresql = None
         self.volcengine = None
+        self.retrieval = {}
+        self.runtime = {}
         # ---------------
         self.init_config()
 
@@ -36,6 +40,33 @@ class Config:
             'sk': os.getenv('VOLCENGINE_SK'),
             'collection_name': os.getenv('COLLECTION_NAME')
         }
+        # 'remote' searches the Viking knowledge base, 'local' the on-disk LocalVectorIndex
+        self.retrieval = {
+            'backend': 'remote',
+            # Base URL of the Viking API; None is the public endpoint
+            'remote_url': None,
+            'index_path': str(self.STATICS_PATH / 'index'),
+            'embedding_model': 'sentence-transformers/all-MiniLM-L6-v2',
+            # Also serve cached results for near-duplicate queries (needs the embedding model)
+            'semantic_cache': False,
+            # Opt-in: deep_search re-scores its merged hits against the original query, downloading
+            # reranker_model at startup. Without a reranker_model the lexical overlap score is
+            # used; results scored that way while the model loads are not cached
+            'rerank': False,
+            'reranker_model': 'cross-encoder/ms-marco-MiniLM-L-6-v2',
+            'rerank_candidates': 50,
+            **config.get('retrieval', {})
+        }
+        # HuggingFace model loading; precision is 'fp32', 'int8' or 'bf16' (CPU only). int8 and bf16
+        # are opt-in ("runtime": {"precision": "int8"} in config.json): faster, but they can change
+        # title classifier and sub-query outputs
+        self.runtime = {
+            'precision': 'fp32',
+            'cache_dir': str(self.MODEL_DIR / 'hf'),
+            'intra_op_threads': None,
+            'inter_op_threads': None,
+            **config.get('runtime', {})
+        }
 
 
 if __name__ == '__main__':
@@ -0,0 +1,203 @@
+import time
+import queue
+import threading
+import torch
+from transformers import StoppingCriteria, StoppingCriteriaList
+from transformers.generation.streamers import BaseStreamer
+from system_code.core.config import logger
+
+
+class GenerationRequest:
+    """
+    One prompt queued on a GenerationService.
+
+    Read it either with ``result()`` (the whole completion) or with ``stream()`` (decoded text
+    pieces as soon as their tokens are generated). Only one consumer should call ``stream()``.
+    ``finish_reason`` tells how it ended: 'eos', 'length', 'cancelled' or 'error'.
+    """
+
+    _DONE = object()
+
+    def __init__(self, service, prompt, options, skip_special_tokens):
+        self.service = service
+        self.prompt = prompt
+        self.options = options
+        self.skip_special_tokens = skip_special_tokens
+        self.token_ids = []
+        self.error = None
+        self.finish_reason = None
+        self._tokens = queue.Queue()
+        self._done = threading.Event()
+
+    @property
+    def done(self):
+        return self._done.is_set()
+
+    def _put(self, token_id):
+        self.token_ids.append(token_id)
+        self._tokens.put(token_id)
+
+    def _finish(self, error=None, reason='length'):
+        if self._done.is_set():
+            return
+        self.error = error
+        self.finish_reason = 'error' if error is not None else reason
+        self._done.set()
+        self._tokens.put(self._DONE)
+
+    def cancel(self):
+        """Stops the request; its batch stops decoding once every request in it is finished."""
+        self._finish(reason='cancelled')
+
+    def _decode(self, token_ids):
+        return self.service.tokenizer.decode(token_ids, skip_special_tokens=self.skip_special_tokens,
+                                             clean_up_tokenization_spaces=False)
+
+    def result(self, timeout=None) -> str:
+        if not self._done.wait(timeout):
+            raise TimeoutError('Generation did not finish in time')
+        if self.error is not None:
+            raise self.error
+        return self._decode(self.token_ids)
+
+    def stream(self, timeout=None, deadline=None):
+        """
+        Yields the completion as text pieces. ``timeout`` bounds the wait for each token and
+        ``deadline`` (a ``time.monotonic()`` value) the whole stream.
+        """
+        token_ids, text = [], ''
+        while True:
+            wait = timeout
+            if deadline is not None:
+                remaining = max(deadline - time.monotonic(), 0)
+                wait = remaining if wait is None else min(wait, remaining)
+            try:
+                token_id = self._tokens.get(timeout=wait)
+            except queue.Empty:
+                raise TimeoutError('Generation stalled' if wait == timeout else 'Generation deadline passed')
+            if token_id is self._DONE:
+                break
+            token_ids.append(token_id)
+            # Decode the whole prefix so multi-token characters come out whole
+            decoded = self._decode(token_ids)
+            if decoded.startswith(text) and len(decoded) > len(text):
+                yield decoded[len(text):]
+                text = decoded
+        if self.error is not None:
+            raise self.error
+
+
+class _BatchStreamer(BaseStreamer):
+    """Routes each row of a batched ``generate`` to its request and finishes rows at their EOS."""
+
+    def __init__(self, requests, eos_token_ids):
+        self.requests = requests
+        self.eos_token_ids = eos_token_ids
+        self.prompt_seen = False
+
+    def put(self, value):
+        # generate() first passes the prompt ids, then one new token per row per step
+        if not self.prompt_seen:
+            self.prompt_seen = True
+            return
+        for request, token_id in zip(self.requests, value.reshape(len(self.requests), -1)[:, -1].tolist()):
+            if request.done:
+                continue
+            if token_id in self.eos_token_ids:
+                request._finish(reason='eos')
+            else:
+                request._put(token_id)
+
+    def end(self):
+        for request in self.requests:
+            request._finish()
+
+
+class _AllFinished(StoppingCriteria):
+    """Ends a batched ``generate`` as soon as every request in it is finished or cancelled."""
+
+    def __init__(self, requests):
+        self.requests = requests
+
+    def __call__(self, input_ids, scores, **kwargs):
+        finished = all(request.done for request in self.requests)
+        return torch.full((input_ids.shape[0],), finished, dtype=torch.bool, device=input_ids.device)
+
+
+class GenerationService:
+    """
+    Shares one causal LM between concurrent callers.
+
+    Requests are gathered into micro-batches of up to ``max_batch_size`` prompts, waiting at most
+    ``max_wait`` seconds after the first one arrives. Requests with identical generation options
+    are left-padded and decoded together in a single ``generate`` call on a background thread,
+    and every row's tokens are streamed back to its request as they are produced.
+    """
+
+    def __init__(self, model, tokenizer, max_batch_size=8, max_wait=0.02, max_input_length=None):
+        self.model = model
+        self.tokenizer = tokenizer
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait
+        self.max_input_length = max_input_length
+
+        # Decoder-only generation needs left padding so every prompt ends at the same position
+        self.tokenizer.padding_side = 'left'
+        if self.tokenizer.pad_token is None:
+            self.tokenizer.pad_token = self.tokenizer.eos_token
+
+        self._queue = queue.Queue()
+        self._worker = threading.Thread(target=self._run, name='generation-service', daemon=True)
+        self._worker.start()
+
+    def submit(self, prompt, skip_special_tokens=True, **generate_kwargs) -> GenerationRequest:
+        """Queues ``prompt``; ``generate_kwargs`` are passed to ``model.generate``."""
+        request = GenerationRequest(self, prompt, generate_kwargs, skip_special_tokens)
+        self._queue.put(request)
+        return request
+
+    def generate(self, prompt, timeout=None, skip_special_tokens=True, **generate_kwargs) -> str:
+        return self.submit(prompt, skip_special_tokens, **generate_kwargs).result(timeout)
+
+    def _run(self):
+        pending = []
+        while True:
+            if not pending:
+                pending.append(self._queue.get())
+            deadline = time.monotonic() + self.max_wait
+            while len(pending) < self.max_batch_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    pending.append(self._queue.get(timeout=remaining))
+                except queue.Empty:
+                    break
+
+            # Requests cancelled while queued are not decoded at all
+            pending = [request for request in pending if not request.done]
+            if not pending:
+                continue
+            options = pending[0].options
+            batch = [request for request in pending if request.options == options][:self.max_batch_size]
+            pending = [request for request in pending if not any(request is r for r in batch)]
+            self._generate(batch, options)
+
+    def _generate(self, batch, options):
+        eos_token_ids = options.get('eos_token_id', self.tokenizer.eos_token_id)
+        eos_token_ids = set(eos_token_ids) if isinstance(eos_token_ids, (list, tuple)) else {eos_token_ids}
+
+        error = None
+        try:
+            inputs = self.tokenizer([request.prompt for request in batch], return_tensors='pt', padding=True,
+                                    truncation=self.max_input_length is not None,
+                                    max_length=self.max_input_length).to(self.model.device)
+            with torch.no_grad():
+                self.model.generate(**inputs, streamer=_BatchStreamer(batch, eos_token_ids),
+                                    stopping_criteria=StoppingCriteriaList([_AllFinished(batch)]),
+                                    pad_token_id=self.tokenizer.pad_token_id, **options)
+        except Exception as e:
+            logger.error(f'[GenerationService] Batch of {len(batch)} failed: {e}')
+            error = e
+        for request in batch:
+            request._finish(error)
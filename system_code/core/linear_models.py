@@ -0,0 +1,181 @@
+import os
+import re
+import json
+import hashlib
+import joblib
+import itertools
+import numpy as np
+from system_code.core.config import Config, logger
+
+
+class LinearTextModel:
+    """
+    TF-IDF + logistic regression scoring in plain NumPy.
+
+    ``export`` turns a fitted sklearn TfidfVectorizer / LogisticRegression pair into a directory of
+    .npy arrays (idf, coef, intercept) plus a meta.json with the vocabulary and classes, and the
+    model memory-maps them. Scoring repeats sklearn's arithmetic in the same order (raw counts
+    times idf, l2 row normalisation, dot with coef plus intercept, then argmax or ``> 0``), so
+    predictions are identical to the pickled pipeline without its per-call overhead.
+
+    Only the configuration the InsightReview models use is supported: lower-cased word unigrams
+    from the default token pattern, smoothed idf, l2 norm.
+    """
+
+    EXPORT_DIR = Config.MODEL_DIR / 'fast'
+    # Same tokens as sklearn's default r'(?u)\b\w\w+\b': a greedy run of word characters always
+    # ends on a word boundary and can only start mid-word after a shorter run failed. Faster in re.
+    TOKEN_PATTERN = re.compile(r'\w\w+')
+    # TfidfVectorizer settings the NumPy path reproduces
+    SUPPORTED_PARAMS = {
+        'analyzer': 'word', 'ngram_range': (1, 1), 'lowercase': True, 'strip_accents': None,
+        'preprocessor': None, 'tokenizer': None, 'token_pattern': r'(?u)\b\w\w+\b',
+        'binary': False, 'norm': 'l2', 'use_idf': True, 'sublinear_tf': False,
+    }
+
+    def __init__(self, path):
+        path = str(path)
+        with open(os.path.join(path, 'meta.json'), 'r', encoding='utf-8') as f:
+            meta = json.load(f)
+        self.source = meta['source']
+        # Content hash of the source pickles; identifies the model in the analysis result cache
+        self.version = meta['version']
+        self.vocabulary = meta['vocabulary']
+        self.classes = np.asarray(meta['classes'])
+        self.idf = np.load(os.path.join(path, 'idf.npy'), mmap_mode='r')
+        # One row of per-class weights per term, so a document gathers contiguous rows
+        self.coef = np.load(os.path.join(path, 'coef.npy'), mmap_mode='r')
+        self.intercept = np.load(os.path.join(path, 'intercept.npy'))
+
+    @staticmethod
+    def fingerprint(*files):
+        """Size and mtime of the source pickles, to tell when an export is stale."""
+        return {os.path.basename(file): [os.stat(file).st_size, os.stat(file).st_mtime_ns] for file in files}
+
+    @staticmethod
+    def content_version(*files):
+        digest = hashlib.sha256()
+        for file in files:
+            with open(file, 'rb') as f:
+                digest.update(f.read())
+        return digest.hexdigest()[:16]
+
+    @classmethod
+    def export(cls, vectorizer_path, model_path, path):
+        vectorizer = joblib.load(vectorizer_path)
+        model = joblib.load(model_path)
+        params = vectorizer.get_params()
+        unsupported = {name: params[name] for name, value in cls.SUPPORTED_PARAMS.items() if params[name] != value}
+        if unsupported:
+            raise ValueError(f'Vectorizer settings not supported by the NumPy path: {unsupported}')
+
+        os.makedirs(path, exist_ok=True)
+        np.save(os.path.join(path, 'idf.npy'), vectorizer.idf_.astype(np.float64))
+        np.save(os.path.join(path, 'coef.npy'), np.ascontiguousarray(model.coef_.T, dtype=np.float64))
+        np.save(os.path.join(path, 'intercept.npy'), model.intercept_.astype(np.float64))
+        # meta.json is written last: its presence marks a complete export
+        with open(os.path.join(path, 'meta.json'), 'w', encoding='utf-8') as f:
+            json.dump({
+                'source': cls.fingerprint(vectorizer_path, model_path),
+                'version': cls.content_version(vectorizer_path, model_path),
+                'vocabulary': {term: int(column) for term, column in vectorizer.vocabulary_.items()},
+                'classes': model.classes_.tolist(),
+            }, f, ensure_ascii=False)
+        logger.info(f'[LinearTextModel] Exported {os.path.basename(model_path)} to {path}')
+
+    @classmethod
+    def from_pickles(cls, name, vectorizer_file, model_file):
+        """Loads the export called ``name``, re-exporting it first if the pickles changed."""
+        vectorizer_path = os.path.join(Config.MODEL_DIR, vectorizer_file)
+        model_path = os.path.join(Config.MODEL_DIR, model_file)
+        path = cls.EXPORT_DIR / name
+        meta_path = path / 'meta.json'
+        if os.path.exists(meta_path):
+            with open(meta_path, 'r', encoding='utf-8') as f:
+                meta = json.load(f)
+            fresh = 'version' in meta and meta['source'] == cls.fingerprint(vectorizer_path, model_path)
+        else:
+            fresh = False
+        if not fresh:
+            cls.export(vectorizer_path, model_path, path)
+        return cls(path)
+
+    @classmethod
+    def tokenize(cls, text):
+        return cls.TOKEN_PATTERN.findall(text.lower())
+
+    def decision_function(self, token_lists):
+        """Logistic regression scores, shape (n_docs, n_outputs)."""
+        n_docs = len(token_lists)
+        lengths = np.fromiter(map(len, token_lists), dtype=np.int64, count=n_docs)
+        # Column of every token, -1 when out of vocabulary
+        columns = np.fromiter(map(self.vocabulary.get, itertools.chain.from_iterable(token_lists), itertools.repeat(-1)),
+                              dtype=np.int64, count=int(lengths.sum()))
+        return self.decision_from_columns(np.repeat(np.arange(n_docs), lengths), columns, n_docs)
+
+    def decision_from_columns(self, docs, columns, n_docs):
+        """Scores from the document and vocabulary column of every token (-1: out of vocabulary)."""
+        n_terms = len(self.idf)
+        known = columns >= 0
+
+        scores = np.zeros((n_docs, self.coef.shape[1]), dtype=np.float64)
+        if known.any():
+            # Sorted (doc, term) pairs with their counts: the CSR layout sklearn builds
+            keys, counts = np.unique(docs[known] * n_terms + columns[known], return_counts=True)
+            docs, terms = np.divmod(keys, n_terms)
+            present, starts = np.unique(docs, return_index=True)
+
+            weights = counts * self.idf[terms]
+            norms = np.sqrt(np.add.reduceat(weights * weights, starts))
+            weights /= np.repeat(norms, np.diff(np.append(starts, len(docs))))
+            scores[present] = np.add.reduceat(weights[:, None] * self.coef[terms], starts, axis=0)
+        return scores + self.intercept
+
+    def labels(self, scores):
+        if scores.shape[1] == 1:
+            return self.classes[(scores[:, 0] > 0).astype(int)].tolist()
+        return self.classes[np.argmax(scores, axis=1)].tolist()
+
+    def predict_tokens(self, token_lists):
+        return self.labels(self.decision_function(token_lists))
+
+    def predict_batch(self, texts):
+        return self.predict_tokens([self.tokenize(text) for text in texts])
+
+
+class SharedFeatures:
+    """
+    One tokenization and vocabulary lookup for several LinearTextModels.
+
+    Every token is looked up once in the union of the models' vocabularies. Each model then reads
+    its own columns through an index array, so the two review classifiers share all text work
+    and only the scoring runs per model.
+    """
+
+    def __init__(self, models):
+        self.models = models
+        self.vocabulary = {}
+        for model in models:
+            for term in model.vocabulary:
+                self.vocabulary.setdefault(term, len(self.vocabulary))
+        # Union id -> model column; the extra last slot (index -1) maps unknown tokens to -1
+        self.columns = []
+        for model in models:
+            columns = np.full(len(self.vocabulary) + 1, -1, dtype=np.int64)
+            for term, column in model.vocabulary.items():
+                columns[self.vocabulary[term]] = column
+            self.columns.append(columns)
+
+    def extract(self, texts):
+        """Returns (docs, union_ids): the document and union vocabulary id of every token."""
+        token_lists = [LinearTextModel.tokenize(text) for text in texts]
+        lengths = np.fromiter(map(len, token_lists), dtype=np.int64, count=len(token_lists))
+        union_ids = np.fromiter(map(self.vocabulary.get, itertools.chain.from_iterable(token_lists),
+                                    itertools.repeat(-1)), dtype=np.int64, count=int(lengths.sum()))
+        return np.repeat(np.arange(len(texts)), lengths), union_ids
+
+    def predict(self, texts):
+        """Predictions of every model, in the order the models were given."""
+        docs, union_ids = self.extract(texts)
+        return [model.labels(model.decision_from_columns(docs, columns[union_ids], len(texts)))
+                for model, columns in zip(self.models, self.columns)]
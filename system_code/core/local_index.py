@@ -0,0 +1,568 @@
+import os
+import re
+import json
+import time
+import fcntl
+import threading
+from contextlib import contextmanager
+import numpy as np
+from scipy import sparse
+import torch
+from system_code.core.config import Config, logger
+from system_code.core.model_runtime import ModelRuntime
+
+
+class TextEmbedder:
+    """Mean-pooled, L2-normalised sentence embeddings from a HuggingFace encoder."""
+
+    def __init__(self, model_name='sentence-transformers/all-MiniLM-L6-v2', batch_size=64):
+        self.model_name = model_name
+        self.batch_size = batch_size
+        runtime = ModelRuntime.instance()
+        self.model, self.tokenizer = runtime.load(model_name, lambda: runtime.encoder(model_name))
+        self.dim = self.model.config.hidden_size
+
+    def encode(self, texts: list) -> np.ndarray:
+        """Returns a float32 matrix with one unit-length row per text."""
+        vectors = np.empty((len(texts), self.dim), dtype=np.float32)
+        for start in range(0, len(texts), self.batch_size):
+            batch = texts[start:start + self.batch_size]
+            inputs = self.tokenizer(batch, padding=True, truncation=True, max_length=256, return_tensors='pt')
+            with torch.no_grad():
+                hidden = self.model(**inputs).last_hidden_state
+            mask = inputs['attention_mask'].unsqueeze(-1).to(hidden.dtype)
+            pooled = (hidden * mask).sum(dim=1) / mask.sum(dim=1).clamp(min=1e-9)
+            vectors[start:start + len(batch)] = torch.nn.functional.normalize(pooled, dim=-1).float().numpy()
+        return vectors
+
+
+class BM25Index:
+    """
+    Append-only BM25 index.
+
+    Term counts are persisted as CSC chunks (documents x terms, one ``.npz`` file per ``add``) and
+    held in memory as a single CSR postings matrix (terms x documents), so a query scores all of
+    its terms with a few vectorized operations. Chunks added or loaded since the last query are
+    merged in on the next one; ``compact`` rewrites the files as a single chunk.
+    """
+
+    TOKEN_PATTERN = re.compile(r'(?u)\b\w\w+\b')
+
+    def __init__(self, path, k1=1.5, b=0.75):
+        self.path = path
+        self.k1 = k1
+        self.b = b
+        self.vocab = {}
+        self.df = np.zeros(0, dtype=np.int64)
+        self.doc_len = np.zeros(0, dtype=np.float32)
+        self.starts = []
+        self._postings = None
+        self._pending = []
+        self._norm = None
+
+    def tokenize(self, text):
+        return self.TOKEN_PATTERN.findall(text.lower())
+
+    def load(self, chunk_starts, count):
+        """
+        Loads the chunks listed in the index metadata, ignoring anything past ``count`` docs. When
+        the list only grew since the last load, just the new chunk files are read.
+        """
+        if not chunk_starts:
+            return
+        with open(os.path.join(self.path, 'bm25_vocab.json'), 'r', encoding='utf-8') as f:
+            self.vocab = json.load(f)
+        self.df = np.load(os.path.join(self.path, 'bm25_df.npy'))
+        self.doc_len = np.load(os.path.join(self.path, 'bm25_doc_len.npy'))[:count]
+        reset = not self.starts or chunk_starts[:len(self.starts)] != self.starts
+        # A chunk never holds more than the documents up to the next one (see compact)
+        ends = list(chunk_starts[1:]) + [count]
+        new_chunks = [sparse.load_npz(self._chunk_path(start))[:end - start]
+                      for start, end in list(zip(chunk_starts, ends))[0 if reset else len(self.starts):]]
+        if reset:
+            self._postings, self._pending = None, []
+        self._pending.extend(new_chunks)
+        self.starts = list(chunk_starts)
+        self._norm = None
+
+    def _chunk_path(self, start):
+        return os.path.join(self.path, f'bm25_{start:010d}.npz')
+
+    def add(self, start, texts):
+        """Indexes ``texts`` as documents ``start .. start + len(texts) - 1`` and persists the chunk."""
+        rows, cols, counts = [], [], []
+        doc_len = np.zeros(len(texts), dtype=np.float32)
+        for row, text in enumerate(texts):
+            tokens = self.tokenize(text)
+            doc_len[row] = len(tokens)
+            term_ids, term_counts = np.unique([self.vocab.setdefault(token, len(self.vocab)) for token in tokens],
+                                              return_counts=True)
+            rows.extend([row] * len(term_ids))
+            cols.extend(term_ids.tolist())
+            counts.extend(term_counts.tolist())
+
+        chunk = sparse.csc_matrix((np.asarray(counts, dtype=np.float32), (rows, cols)),
+                                  shape=(len(texts), len(self.vocab)))
+        self.df = np.concatenate([self.df, np.zeros(len(self.vocab) - len(self.df), dtype=np.int64)])
+        self.df += np.bincount(np.asarray(cols, dtype=np.int64), minlength=len(self.vocab))
+        self.doc_len = np.concatenate([self.doc_len[:start], doc_len])
+        self.starts.append(start)
+        self._pending.append(chunk)
+        self._norm = None
+
+        sparse.save_npz(self._chunk_path(start), chunk)
+        self._save_stats()
+
+    def _save_stats(self):
+        np.save(os.path.join(self.path, 'bm25_df.npy'), self.df)
+        np.save(os.path.join(self.path, 'bm25_doc_len.npy'), self.doc_len)
+        with open(os.path.join(self.path, 'bm25_vocab.json'), 'w', encoding='utf-8') as f:
+            json.dump(self.vocab, f, ensure_ascii=False)
+
+    def postings(self):
+        """The terms x documents CSR matrix of every loaded chunk."""
+        if self._pending:
+            n_terms = len(self.vocab)
+            parts = [] if self._postings is None else [self._postings]
+            parts.extend(chunk.T.tocsr() for chunk in self._pending)
+            for part in parts:
+                part.resize((n_terms, part.shape[1]))
+            self._postings = sparse.hstack(parts, format='csr')
+            self._pending = []
+        return self._postings
+
+    def compact(self):
+        """
+        Rewrites every chunk as one file starting at document 0. Returns the starts of the chunk
+        files that are no longer needed once the metadata lists only ``[0]``; until then the
+        longer chunk 0 is cut back to its old length on load, so a crash in between is harmless.
+        """
+        if len(self.starts) < 2:
+            return []
+        stale = self.starts[1:]
+        tmp_path = os.path.join(self.path, 'bm25_compact.tmp.npz')
+        sparse.save_npz(tmp_path, self.postings().T.tocsc())
+        os.replace(tmp_path, self._chunk_path(0))
+        self.starts = [0]
+        return stale
+
+    def remove_chunks(self, starts):
+        for start in starts:
+            try:
+                os.remove(self._chunk_path(start))
+            except FileNotFoundError:
+                pass
+
+    def scores(self, query):
+        """BM25 score of every document for ``query``, or None when no query term is indexed."""
+        if not len(self.doc_len):
+            return None
+        postings = self.postings()
+        term_ids = sorted({self.vocab[token] for token in self.tokenize(query)
+                           if token in self.vocab and self.vocab[token] < postings.shape[0]})
+        if not term_ids:
+            return None
+
+        if self._norm is None:
+            self._norm = self.k1 * (1 - self.b + self.b * self.doc_len / max(self.doc_len.mean(), 1e-9))
+        n_docs = len(self.doc_len)
+        idf = np.log(1 + (n_docs - self.df[term_ids] + 0.5) / (self.df[term_ids] + 0.5))
+
+        # Posting lists of the query terms, scored in one pass
+        rows = postings[term_ids]
+        weights = np.repeat(idf, np.diff(rows.indptr))
+        docs, tf = rows.indices, rows.data
+        return np.bincount(docs, weights=weights * tf * (self.k1 + 1) / (tf + self._norm[docs]),
+                           minlength=n_docs).astype(np.float32)[:n_docs]
+
+
+class LocalVectorIndex:
+    """
+    Local hybrid retrieval over beauty_reviews.text, used instead of the remote knowledge base.
+
+    Dense vectors live in a memory-mapped float32 matrix with an IVF (inverted file) index on top:
+    spherical k-means centroids, one cluster assignment per vector, and ``nprobe`` clusters scanned
+    per query. A BM25 index is kept next to it, and the two are blended with ``dense_weight``.
+    The index grows incrementally from Postgres, following beauty_reviews.review_seq, either by
+    calling ``sync_from_postgres`` or in the background after ``start_auto_sync``.
+
+    Files under ``path``: meta.json, vectors.f32, ids.bin, assign.i32, seqs.i64, centroids.npy,
+    bm25_*, sync.lock.
+    """
+
+    # Below this many vectors queries scan everything instead of using IVF
+    MIN_TRAIN_SIZE = 10000
+    # Retrain the centroids once the index has grown this many times past the last training
+    RETRAIN_FACTOR = 4
+    # Bytes per review_id in ids.bin
+    ID_WIDTH = 36
+    # review_seq values are assigned at insert time, so a long transaction can commit rows below
+    # the last synced one; every sync checks this many sequence values below it again
+    RESCAN_WINDOW = 100000
+    # Seconds change notifications are gathered before a background sync, and at most between two
+    SYNC_DEBOUNCE = 2
+    SYNC_INTERVAL = 300
+    # Every added batch is its own BM25 chunk file; a sync merges them once there are more than this
+    MAX_BM25_CHUNKS = 64
+    # Connections of the index's own pooled client; searches run on several threads
+    PG_MAX_CONNECTIONS = 10
+
+    def __init__(self, path=None, embedder=None, pg_client=None, nprobe=32):
+        self.path = str(path or Config().retrieval.get('index_path') or Config.STATICS_PATH / 'index')
+        os.makedirs(self.path, exist_ok=True)
+        self._embedder = embedder
+        self._pg_client = pg_client
+        self.nprobe = nprobe
+        self.bm25 = BM25Index(self.path)
+        self._meta_mtime = None
+        # Guards the in-memory state between searches and a sync on another thread
+        self._lock = threading.RLock()
+        self._sync_thread = None
+        self.load()
+        # See on_change
+        self._change_callbacks = []
+        self._announced_count = self.meta['count']
+
+    @property
+    def embedder(self):
+        if self._embedder is None:
+            self._embedder = TextEmbedder(self.meta.get('model') or Config().retrieval.get(
+                'embedding_model', 'sentence-transformers/all-MiniLM-L6-v2'))
+        return self._embedder
+
+    @property
+    def pg_client(self):
+        if self._pg_client is None:
+            from system_code.server.database.postgres_client import PGClient
+            self._pg_client = PGClient(pooled=True, minconn=1, maxconn=self.PG_MAX_CONNECTIONS)
+        return self._pg_client
+
+    def _file(self, name):
+        return os.path.join(self.path, name)
+
+    def load(self):
+        """(Re)opens the index files as described by meta.json."""
+        with self._lock:
+            meta_path = self._file('meta.json')
+            if os.path.exists(meta_path):
+                with open(meta_path, 'r') as f:
+                    self.meta = json.load(f)
+                self._meta_mtime = os.stat(meta_path).st_mtime
+            else:
+                self.meta = {'model': None, 'dim': None, 'count': 0, 'last_seq': 0,
+                             'trained_count': 0, 'chunks': []}
+
+            self._open_arrays()
+            self.bm25.load(self.meta['chunks'], self.meta['count'])
+
+    def _open_arrays(self):
+        """Maps the data files for meta['count'] documents; the BM25 state is kept up to date separately."""
+        count, dim = self.meta['count'], self.meta['dim']
+        if count:
+            self.vectors = np.memmap(self._file('vectors.f32'), dtype=np.float32, mode='r', shape=(count, dim))
+            self.ids = np.memmap(self._file('ids.bin'), dtype=f'S{self.ID_WIDTH}', mode='r', shape=(count,))
+            self.assign = np.memmap(self._file('assign.i32'), dtype=np.int32, mode='r', shape=(count,))
+        else:
+            self.vectors = np.zeros((0, dim or 0), dtype=np.float32)
+            self.ids = np.zeros(0, dtype=f'S{self.ID_WIDTH}')
+            self.assign = np.zeros(0, dtype=np.int32)
+        # Shorter than count for an index built before seqs.i64 existed, see _backfill_seqs
+        seqs_path = self._file('seqs.i64')
+        n_seqs = min(count, os.path.getsize(seqs_path) // 8) if os.path.exists(seqs_path) else 0
+        self.seqs = (np.memmap(seqs_path, dtype=np.int64, mode='r', shape=(n_seqs,)) if n_seqs
+                     else np.zeros(0, dtype=np.int64))
+        self.centroids = np.load(self._file('centroids.npy')) if self.meta['trained_count'] else None
+        self._lists = None
+
+    def refresh(self):
+        """Picks up documents another process has added since the last load."""
+        meta_path = self._file('meta.json')
+        with self._lock:
+            if os.path.exists(meta_path) and os.stat(meta_path).st_mtime != self._meta_mtime:
+                try:
+                    self.load()
+                except FileNotFoundError:
+                    # Chunk files compacted away by another process between meta.json and the chunks
+                    self.load()
+
+    def _save_meta(self):
+        tmp_path = self._file('meta.json.tmp')
+        with open(tmp_path, 'w') as f:
+            json.dump(self.meta, f)
+        os.replace(tmp_path, self._file('meta.json'))
+        self._meta_mtime = os.stat(self._file('meta.json')).st_mtime
+
+    def _append(self, name, array):
+        """Appends raw bytes to a data file, dropping any tail a crashed run left past meta['count']."""
+        path = self._file(name)
+        valid_bytes = self.meta['count'] * array.itemsize * (array.shape[1] if array.ndim > 1 else 1)
+        if os.path.exists(path) and os.path.getsize(path) > valid_bytes:
+            os.truncate(path, valid_bytes)
+        with open(path, 'ab') as f:
+            f.write(np.ascontiguousarray(array).tobytes())
+
+    def add(self, review_ids, texts, seqs):
+        """
+        Embeds and indexes one batch of reviews, ``seqs`` being their review_seq values. meta.json
+        is written last, so a crash mid-batch is harmless.
+        """
+        vectors = self.embedder.encode(texts)
+        with self._lock:
+            if self.meta['dim'] is None:
+                self.meta['dim'] = int(vectors.shape[1])
+                self.meta['model'] = getattr(self.embedder, 'model_name', None)
+
+            start = self.meta['count']
+            assign = (np.argmax(vectors @ self.centroids.T, axis=1).astype(np.int32)
+                      if self.centroids is not None else np.zeros(len(texts), dtype=np.int32))
+            self._append('vectors.f32', vectors)
+            self._append('ids.bin', np.asarray(review_ids, dtype=f'S{self.ID_WIDTH}'))
+            self._append('assign.i32', assign)
+            self._append('seqs.i64', np.asarray(seqs, dtype=np.int64))
+            self.bm25.add(start, texts)
+
+            self.meta['count'] = start + len(texts)
+            self.meta['last_seq'] = max(self.meta['last_seq'], int(max(seqs)))
+            self.meta['chunks'].append(start)
+            self._save_meta()
+            # Only the new rows changed: remap the data files instead of reloading every chunk
+            self._open_arrays()
+
+            count, trained = self.meta['count'], self.meta['trained_count']
+            if count >= self.MIN_TRAIN_SIZE and (not trained or count >= trained * self.RETRAIN_FACTOR):
+                self.train()
+
+    def train(self, iterations=10, seed=0):
+        """Fits spherical k-means centroids on a sample and re-assigns every vector to its cluster."""
+        count = self.meta['count']
+        nlist = int(np.clip(4 * np.sqrt(count), 16, 4096))
+        rng = np.random.default_rng(seed)
+        sample_idx = np.sort(rng.choice(count, min(count, nlist * 64), replace=False))
+        sample = np.asarray(self.vectors[sample_idx])
+
+        centroids = sample[rng.choice(len(sample), nlist, replace=False)].copy()
+        for _ in range(iterations):
+            labels = np.argmax(sample @ centroids.T, axis=1)
+            sums = np.zeros_like(centroids)
+            np.add.at(sums, labels, sample)
+            empty = np.bincount(labels, minlength=nlist) == 0
+            sums[empty] = centroids[empty]
+            centroids = sums / np.linalg.norm(sums, axis=1, keepdims=True).clip(min=1e-9)
+
+        assign = np.memmap(self._file('assign.i32'), dtype=np.int32, mode='r+', shape=(count,))
+        for start in range(0, count, 65536):
+            assign[start:start + 65536] = np.argmax(self.vectors[start:start + 65536] @ centroids.T, axis=1)
+        assign.flush()
+        np.save(self._file('centroids.npy'), centroids.astype(np.float32))
+
+        self.meta['trained_count'] = count
+        self._compact_bm25()
+        self._open_arrays()
+        logger.info(f'[LocalVectorIndex] Trained {nlist} IVF lists on {len(sample)} of {count} vectors')
+
+    def _compact_bm25(self):
+        """Merges the BM25 chunk files into one, so queries and loads stop paying per chunk."""
+        with self._lock:
+            stale = self.bm25.compact()
+            self.meta['chunks'] = list(self.bm25.starts)
+            self._save_meta()
+            self.bm25.remove_chunks(stale)
+
+    @contextmanager
+    def _sync_lock(self):
+        """Serializes syncs of every process sharing the index directory."""
+        with open(self._file('sync.lock'), 'a') as f:
+            fcntl.flock(f, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(f, fcntl.LOCK_UN)
+
+    def _backfill_seqs(self):
+        """Looks up the review_seq of documents indexed before seqs.i64 existed, once."""
+        known, count = len(self.seqs), self.meta['count']
+        if known >= count:
+            return
+        review_ids = [review_id.decode() for review_id in self.ids[known:count]]
+        rows = self.pg_client.execute(
+            "SELECT review_id::text, review_seq FROM beauty_reviews WHERE review_id = ANY(%s::uuid[])",
+            (review_ids,))
+        seq_of = dict(rows)
+        with self._lock:
+            with open(self._file('seqs.i64'), 'ab') as f:
+                f.write(np.asarray([seq_of.get(review_id, 0) for review_id in review_ids], dtype=np.int64).tobytes())
+            self._open_arrays()
+
+    def _add_rows(self, rows):
+        """Indexes (review_seq, review_id, text) rows; returns how many."""
+        self.add([row[1] for row in rows], [row[2] for row in rows], [row[0] for row in rows])
+        return len(rows)
+
+    def on_change(self, callback):
+        """
+        Calls ``callback()`` after every sync that changed the indexed documents, whether it indexed
+        them itself or picked up what another process indexed. Used to drop cached search results.
+        """
+        self._change_callbacks.append(callback)
+
+    def sync_from_postgres(self, batch_size=1024):
+        """
+        Indexes every review added to beauty_reviews since the last sync. Returns the number added.
+
+        Besides the rows past ``last_seq``, the RESCAN_WINDOW sequence values below it are checked
+        for rows that committed only after an earlier sync had moved past them. The BM25 chunk
+        files are merged once there are more than MAX_BM25_CHUNKS.
+        """
+        added = 0
+        with self._sync_lock():
+            # Another process may have synced first
+            self.refresh()
+            self._backfill_seqs()
+
+            floor = max(self.meta['last_seq'] - self.RESCAN_WINDOW, 0)
+            rows = self.pg_client.execute("""
+                SELECT review_seq FROM beauty_reviews
+                WHERE review_seq > %s AND review_seq <= %s AND COALESCE(text, '') <> ''
+            """, (floor, self.meta['last_seq']))
+            indexed = np.asarray(self.seqs)
+            missed = np.setdiff1d(np.asarray([row[0] for row in rows], dtype=np.int64), indexed[indexed > floor])
+            for start in range(0, len(missed), batch_size):
+                added += self._add_rows(self.pg_client.execute("""
+                    SELECT review_seq, review_id::text, text FROM beauty_reviews
+                    WHERE review_seq = ANY(%s)
+                    ORDER BY review_seq
+                """, (missed[start:start + batch_size].tolist(),)))
+            if added:
+                logger.info(f'[LocalVectorIndex] Indexed {added} reviews that committed out of sequence order')
+
+            while True:
+                rows = self.pg_client.execute("""
+                    SELECT review_seq, review_id::text, text FROM beauty_reviews
+                    WHERE review_seq > %s AND COALESCE(text, '') <> ''
+                    ORDER BY review_seq
+                    LIMIT %s
+                """, (self.meta['last_seq'], batch_size))
+                if not rows:
+                    break
+                added += self._add_rows(rows)
+                logger.info(f'[LocalVectorIndex] Indexed {self.meta["count"]} reviews')
+            if len(self.meta['chunks']) > self.MAX_BM25_CHUNKS:
+                self._compact_bm25()
+        # Also covers documents indexed by a sync that failed part-way
+        if self.meta['count'] != self._announced_count:
+            self._announced_count = self.meta['count']
+            for callback in self._change_callbacks:
+                callback()
+        return added
+
+    def start_auto_sync(self):
+        """
+        Keeps the index current from a daemon thread: syncs after review data changes are announced
+        (see PGClient.watch_data_changes, which also fires on connect) and at least every
+        SYNC_INTERVAL seconds.
+        """
+        if self._sync_thread is not None:
+            return
+        wanted = threading.Event()
+        self.pg_client.watch_data_changes(wanted.set)
+
+        def run():
+            while True:
+                wanted.wait(self.SYNC_INTERVAL)
+                # Ingest and processing notify once per chunk; let a burst settle
+                time.sleep(self.SYNC_DEBOUNCE)
+                wanted.clear()
+                try:
+                    self.sync_from_postgres()
+                except Exception as e:
+                    logger.warning(f'[LocalVectorIndex] Background sync failed: {e}')
+
+        self._sync_thread = threading.Thread(target=run, name='local-index-sync', daemon=True)
+        self._sync_thread.start()
+
+    def _inverted_lists(self):
+        if self._lists is None:
+            order = np.argsort(self.assign, kind='stable')
+            offsets = np.searchsorted(self.assign[order], np.arange(len(self.centroids) + 1))
+            self._lists = order, offsets
+        return self._lists
+
+    def _dense_candidates(self, query_vector, n):
+        """Top-``n`` document indexes by inner product, via IVF once trained, else by a full scan."""
+        if self.centroids is None:
+            scores = np.concatenate([self.vectors[start:start + 65536] @ query_vector
+                                     for start in range(0, len(self.vectors), 65536)])
+            candidates = np.arange(len(scores))
+        else:
+            order, offsets = self._inverted_lists()
+            probes = np.argsort(self.centroids @ query_vector)[-self.nprobe:]
+            candidates = np.sort(np.concatenate([order[offsets[c]:offsets[c + 1]] for c in probes]))
+            scores = self.vectors[candidates] @ query_vector
+        top = np.argpartition(-scores, min(n, len(scores)) - 1)[:n] if len(scores) > n else np.arange(len(scores))
+        return candidates[top]
+
+    def search(self, query, top_k=10, dense_weight=0.7):
+        """
+        Hybrid dense + BM25 search, returning hits shaped like the remote knowledge base results.
+
+        Both scores are min-max normalised over the candidate set and blended as
+        ``dense_weight * dense + (1 - dense_weight) * bm25``.
+        """
+        self.refresh()
+        if not self.meta['count']:
+            return []
+
+        n_candidates = max(top_k * 5, 50)
+        query_vector = self.embedder.encode([query])[0]
+        with self._lock:
+            candidates = self._dense_candidates(query_vector, n_candidates)
+
+            bm25_scores = self.bm25.scores(query) if dense_weight < 1 else None
+            if bm25_scores is not None:
+                sparse_top = np.argpartition(-bm25_scores, min(n_candidates, len(bm25_scores)) - 1)[:n_candidates]
+                candidates = np.union1d(candidates, sparse_top[bm25_scores[sparse_top] > 0])
+
+            candidates = np.sort(candidates)
+            dense = self.vectors[candidates] @ query_vector
+            combined = dense_weight * _min_max(dense)
+            if bm25_scores is not None:
+                combined += (1 - dense_weight) * _min_max(bm25_scores[candidates])
+
+            best = np.argsort(-combined)[:top_k]
+            review_ids = [self.ids[i].decode() for i in candidates[best]]
+        return self._fetch_hits(review_ids, combined[best])
+
+    def _fetch_hits(self, review_ids, scores):
+        rows = self.pg_client.execute(
+            "SELECT review_id::text, text, asin FROM beauty_reviews WHERE review_id = ANY(%s::uuid[])",
+            (review_ids,))
+        reviews = {row[0]: row for row in rows}
+
+        hits = []
+        for review_id, score in zip(review_ids, scores):
+            if review_id not in reviews:
+                continue  # Deleted since it was indexed
+            _, text, asin = reviews[review_id]
+            hits.append({
+                'id': review_id,
+                'point_id': review_id,
+                'content': f'text:{text}\nasin:{asin}',
+                'score': float(score),
+                'table_chunk_fields': [
+                    {'field_name': 'review_id', 'field_value': review_id},
+                    {'field_name': 'text', 'field_value': text},
+                    {'field_name': 'asin', 'field_value': asin},
+                ],
+            })
+        return hits
+
+
+def _min_max(scores):
+    spread = scores.max() - scores.min() if len(scores) else 0
+    return (scores - scores.min()) / spread if spread > 0 else np.ones_like(scores)
+
+
+if __name__ == '__main__':
+    index = LocalVectorIndex()
+    print(index.sync_from_postgres())
+    print(index.search('How about the smell of the perfume?', top_k=5))
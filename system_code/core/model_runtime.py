@@ -0,0 +1,134 @@
+import time
+import threading
+from collections import defaultdict
+import torch
+from transformers import AutoModel, AutoModelForCausalLM, AutoModelForSequenceClassification, AutoTokenizer
+from system_code.core.config import Config, logger
+
+
+class ModelNotReadyError(RuntimeError):
+    """Raised when a model is requested without waiting while it is still loading."""
+
+
+class ModelRuntime:
+    """
+    Process-wide home of the HuggingFace models.
+
+    Models are loaded on first use, at most once per process, from a local weight cache
+    (``cache_dir``). The hub is only contacted when the weights are not cached yet. On CPU,
+    ``precision`` picks the inference mode: 'fp32' (the default), or opt-in 'int8' (dynamic
+    quantization of the Linear layers) or 'bf16', which are faster but can change outputs. Thread
+    counts are only changed when configured, so worker processes that size their own torch threads
+    keep them.
+
+    Callers that must not block (the web API) pass ``wait=False`` and get ModelNotReadyError
+    while the model loads in the background.
+    """
+
+    _instance = None
+    _instance_lock = threading.Lock()
+
+    def __init__(self, cache_dir=None, precision='fp32', intra_op_threads=None, inter_op_threads=None):
+        self.cache_dir = str(cache_dir or Config.MODEL_DIR / 'hf')
+        self.precision = precision
+        self.device = torch.device('cuda' if torch.cuda.is_available() else 'cpu')
+        self._models = {}
+        self._errors = {}
+        self._loading = set()
+        self._key_locks = defaultdict(threading.Lock)
+        self._lock = threading.Lock()
+
+        if intra_op_threads:
+            torch.set_num_threads(intra_op_threads)
+        if inter_op_threads:
+            try:
+                torch.set_num_interop_threads(inter_op_threads)
+            except RuntimeError as e:
+                # Only allowed before torch starts any inter-op work
+                logger.warning(f'[ModelRuntime] Could not set inter-op threads: {e}')
+
+    @classmethod
+    def instance(cls):
+        """The shared runtime, configured from the ``runtime`` section of config.json."""
+        with cls._instance_lock:
+            if cls._instance is None:
+                settings = Config().runtime
+                cls._instance = cls(cache_dir=settings.get('cache_dir'),
+                                    precision=settings.get('precision', 'fp32'),
+                                    intra_op_threads=settings.get('intra_op_threads'),
+                                    inter_op_threads=settings.get('inter_op_threads'))
+            return cls._instance
+
+    def _from_pretrained(self, loader, name):
+        try:
+            return loader.from_pretrained(name, cache_dir=self.cache_dir, local_files_only=True)
+        except OSError:
+            logger.info(f'[ModelRuntime] {name} not cached yet, downloading to {self.cache_dir}')
+            return loader.from_pretrained(name, cache_dir=self.cache_dir)
+
+    def _optimize(self, model):
+        model.eval()
+        if self.device.type == 'cuda':
+            return model.to(self.device)
+        if self.precision == 'int8':
+            return torch.ao.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+        if self.precision == 'bf16':
+            return model.to(torch.bfloat16)
+        return model
+
+    def causal_lm(self, name):
+        """Loads (model, tokenizer) for a causal LM in the configured inference mode."""
+        return self._optimize(self._from_pretrained(AutoModelForCausalLM, name)), \
+            self._from_pretrained(AutoTokenizer, name)
+
+    def encoder(self, name):
+        """Loads (model, tokenizer) for an encoder in the configured inference mode."""
+        return self._optimize(self._from_pretrained(AutoModel, name)), self._from_pretrained(AutoTokenizer, name)
+
+    def cross_encoder(self, name):
+        """Loads (model, tokenizer) for a sequence-pair scoring model in the configured inference mode."""
+        return self._optimize(self._from_pretrained(AutoModelForSequenceClassification, name)), \
+            self._from_pretrained(AutoTokenizer, name)
+
+    def load(self, key, build, wait=True):
+        """
+        Returns ``build()`` for ``key``, building it once per process; ``build`` should include any
+        warm-up, so a ready model is a warm one.
+        """
+        if key in self._models:
+            return self._models[key]
+        if not wait:
+            self.load_in_background(key, build)
+            error = self._errors.get(key)
+            raise ModelNotReadyError(f'{key} is still loading' + (f' (last attempt failed: {error})' if error else ''))
+
+        with self._lock:
+            key_lock = self._key_locks[key]
+        with key_lock:
+            if key not in self._models:
+                started = time.time()
+                self._models[key] = build()
+                self._errors.pop(key, None)
+                logger.info(f'[ModelRuntime] {key} ready in {time.time() - started:.1f}s '
+                            f'({self.device.type}, {self.precision})')
+        return self._models[key]
+
+    def load_in_background(self, key, build):
+        with self._lock:
+            if key in self._models or key in self._loading:
+                return
+            self._loading.add(key)
+        threading.Thread(target=self._background_load, args=(key, build), name=f'load-{key}', daemon=True).start()
+
+    def _background_load(self, key, build):
+        try:
+            self.load(key, build)
+        except Exception as e:
+            logger.error(f'[ModelRuntime] Loading {key} failed: {e}')
+            self._errors[key] = e
+        finally:
+            with self._lock:
+                self._loading.discard(key)
+
+    def is_ready(self, key):
+        return key in self._models
@@ -0,0 +1,201 @@
+import re
+import json
+import time
+import sqlite3
+import threading
+import numpy as np
+from collections import OrderedDict
+from system_code.core.config import logger
+
+
+class QueryCache:
+    """
+    Result cache for RagSdk.search / deep_search.
+
+    Lookups first try an exact match on the normalized query text. If that misses and an embedder
+    is configured, they fall back to the most similar cached query of the same kind and parameters,
+    provided the cosine similarity reaches ``similarity``. Entries are bounded by ``max_entries``
+    (LRU) and expire after ``ttl`` seconds. When ``path`` is set they are written through to a
+    SQLite file and reloaded on start-up, most recently used first.
+
+    Entries are not tied to the data they were computed from. The owner calls ``clear()`` when
+    that data changes (RagSdk does for the local index); otherwise, as with the remote knowledge
+    base, an entry can be stale for up to ``ttl`` seconds.
+    """
+
+    PUNCTUATION = re.compile(r'[^\w\s]')
+    # Hits whose last_used is written to SQLite together, so hits do not each cost a write
+    TOUCH_BATCH = 64
+
+    def __init__(self, max_entries=1024, ttl=3600, path=None, embedder=None, similarity=0.95):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.path = path
+        self.embedder = embedder
+        self.similarity = similarity
+        # key -> (expires_at, value, embedding or None)
+        self._entries = OrderedDict()
+        # Embeddings computed by a missed get(), reused by the set() that follows
+        self._pending = {}
+        # key -> time of the last hit not yet written to SQLite
+        self._touched = {}
+        self._lock = threading.Lock()
+        self._counters = {'hits': 0, 'semantic_hits': 0, 'misses': 0, 'evictions': 0}
+        if path:
+            self._load()
+
+    def _db(self):
+        return sqlite3.connect(self.path, timeout=5)
+
+    def _load(self):
+        with self._db() as db:
+            db.execute('PRAGMA journal_mode=WAL')
+            db.execute('''
+                CREATE TABLE IF NOT EXISTS queries (
+                    key TEXT PRIMARY KEY,
+                    value TEXT NOT NULL,
+                    embedding BLOB,
+                    expires_at REAL NOT NULL,
+                    last_used REAL NOT NULL
+                )
+            ''')
+            db.execute('DELETE FROM queries WHERE expires_at <= ?', (time.time(),))
+            rows = db.execute('SELECT key, value, embedding, expires_at FROM queries ORDER BY last_used DESC LIMIT ?',
+                              (self.max_entries,)).fetchall()
+        for key, value, embedding, expires_at in reversed(rows):
+            embedding = np.frombuffer(embedding, dtype=np.float32) if embedding is not None else None
+            self._entries[key] = (expires_at, json.loads(value), embedding)
+        logger.info(f'[QueryCache] Loaded {len(rows)} cached queries from {self.path}')
+
+    @classmethod
+    def normalize(cls, query):
+        """Lower-cases, drops punctuation and collapses whitespace."""
+        return ' '.join(cls.PUNCTUATION.sub(' ', query.lower()).split())
+
+    @staticmethod
+    def _scope(kind, params):
+        return kind + json.dumps(params, default=str)
+
+    def _embed(self, text):
+        with self._lock:
+            if text in self._pending:
+                return self._pending[text]
+        try:
+            embedding = np.asarray(self.embedder.encode([text])[0], dtype=np.float32)
+        except Exception as e:
+            logger.warning(f'[QueryCache] Query embedding failed, exact matching only: {e}')
+            return None
+        embedding = embedding / max(float(np.linalg.norm(embedding)), 1e-9)
+        with self._lock:
+            self._pending[text] = embedding
+            while len(self._pending) > 64:
+                self._pending.pop(next(iter(self._pending)))
+        return embedding
+
+    def get(self, kind, query, params=()):
+        """Returns (hit, value) for ``query`` searched as ``kind`` with ``params``."""
+        text = self.normalize(query)
+        scope = self._scope(kind, params)
+        key = scope + '\n' + text
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            hit = entry is not None and entry[0] > now
+            if hit:
+                self._entries.move_to_end(key)
+                self._counters['hits'] += 1
+                touched = self._touch(key, now)
+        if hit:
+            self._persist_touched(touched)
+            return True, entry[1]
+
+        if self.embedder is not None and text:
+            embedding = self._embed(text)
+            if embedding is not None:
+                with self._lock:
+                    candidates = [(k, e) for k, e in self._entries.items()
+                                  if k.startswith(scope + '\n') and e[0] > now and e[2] is not None]
+                    if candidates:
+                        scores = np.stack([e[2] for _, e in candidates]) @ embedding
+                        best = int(np.argmax(scores))
+                        hit = scores[best] >= self.similarity
+                        if hit:
+                            best_key, entry = candidates[best]
+                            self._entries.move_to_end(best_key)
+                            self._counters['semantic_hits'] += 1
+                            touched = self._touch(best_key, now)
+                if hit:
+                    self._persist_touched(touched)
+                    return True, entry[1]
+
+        with self._lock:
+            self._counters['misses'] += 1
+        return False, None
+
+    def _touch(self, key, now):
+        """
+        Records a hit on ``key``; called with the lock held. Returns the hits to write to SQLite
+        once TOUCH_BATCH have gathered, else an empty dict.
+        """
+        if not self.path:
+            return {}
+        self._touched[key] = now
+        if len(self._touched) < self.TOUCH_BATCH:
+            return {}
+        touched, self._touched = self._touched, {}
+        return touched
+
+    def _persist_touched(self, touched):
+        if not touched:
+            return
+        try:
+            with self._db() as db:
+                db.executemany('UPDATE queries SET last_used = ? WHERE key = ?',
+                               [(last_used, key) for key, last_used in touched.items()])
+        except sqlite3.Error as e:
+            logger.warning(f'[QueryCache] Persisting query hits failed: {e}')
+
+    def set(self, kind, query, params, value, ttl=None):
+        text = self.normalize(query)
+        key = self._scope(kind, params) + '\n' + text
+        expires_at = time.time() + (ttl or self.ttl)
+        embedding = self._embed(text) if self.embedder is not None and text else None
+        evicted = []
+        with self._lock:
+            self._pending.pop(text, None)
+            # Pending hits go out with this write
+            touched, self._touched = self._touched, {}
+            self._entries[key] = (expires_at, value, embedding)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                evicted.append(self._entries.popitem(last=False)[0])
+                self._counters['evictions'] += 1
+
+        if self.path:
+            try:
+                with self._db() as db:
+                    db.execute('INSERT OR REPLACE INTO queries (key, value, embedding, expires_at, last_used) '
+                               'VALUES (?, ?, ?, ?, ?)',
+                               (key, json.dumps(value, default=str),
+                                embedding.tobytes() if embedding is not None else None, expires_at, time.time()))
+                    db.executemany('DELETE FROM queries WHERE key = ?', [(k,) for k in evicted])
+                    db.executemany('UPDATE queries SET last_used = ? WHERE key = ?',
+                                   [(last_used, k) for k, last_used in touched.items()])
+            except sqlite3.Error as e:
+                logger.warning(f'[QueryCache] Persisting query failed: {e}')
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._pending.clear()
+            self._touched.clear()
+        if self.path:
+            with self._db() as db:
+                db.execute('DELETE FROM queries')
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._counters, size=len(self._entries), max_entries=self.max_entries)
+        lookups = stats['hits'] + stats['semantic_hits'] + stats['misses']
+        stats['hit_ratio'] = round((stats['hits'] + stats['semantic_hits']) / lookups, 4) if lookups else 0.0
+        return stats
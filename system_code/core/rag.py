@@ -1,17 +1,44 @@
 import json
+import time
+import random
 import requests
+from concurrent.futures import ThreadPoolExecutor
+from requests.adapters import HTTPAdapter
 from volcengine.auth.SignerV4 import SignerV4
 from volcengine.base.Request import Request
 from volcengine.Credentials import Credentials
 import re
+from loguru import logger
 
 
-class RAG:
-    def __init__(self, ak, sk, domain, account_id):
-        self.ak = ak
-        self.sk = sk
+class SignedTransport:
+    """
+    签名 HTTP 传输层。
+
+    所有请求共用一个 requests.Session（连接池 + keep-alive，不必每次重新握手 TLS）和同一个
+    Credentials 对象。连接错误、超时以及 429 / 5xx 响应按指数退避加随机抖动（full jitter）重试，
+    每次重试都重新签名。base_url 可以指向本地 mock 服务用于测试，签名仍按 domain 计算。
+    """
+
+    # 可重试的 HTTP 状态码
+    RETRY_STATUS = {429, 500, 502, 503, 504}
+
+    def __init__(self, ak, sk, domain, account_id, base_url=None, max_retries=3, backoff=0.5,
+                 max_backoff=8.0, timeout=10, pool_size=10):
         self.domain = domain
         self.account_id = account_id
+        self.base_url = (base_url or f"https://{domain}").rstrip("/")
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.timeout = timeout
+        # 签名凭证只创建一次
+        self.credentials = Credentials(ak, sk, "air", "cn-north-1")
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
 
     def prepare_request(self, method, path, params=None, data=None, doseq=0):
         # 创建请求
@@ -21,12 +48,12 @@ class RAG:
                     params[key] = str(params[key])
                 elif isinstance(params[key], list) and not doseq:
                     params[key] = ",".join(params[key])
-        
+
         r = Request()
         r.set_shema("https")
         r.set_method(method)
-        r.set_connection_timeout(10)
-        r.set_socket_timeout(10)
+        r.set_connection_timeout(self.timeout)
+        r.set_socket_timeout(self.timeout)
         mheaders = {
             "Accept": "application/json",
             "Content-Type": "application/json",
@@ -40,13 +67,79 @@ class RAG:
         r.set_path(path)
         if data is not None:
             r.set_body(json.dumps(data))
-        
+
         # 生成签名
-        credentials = Credentials(self.ak, self.sk, "air", "cn-north-1")
-        SignerV4.sign(r, credentials)
+        SignerV4.sign(r, self.credentials)
         return r
 
+    def backoff_delay(self, attempt, response=None):
+        """第 attempt 次重试前的等待秒数；429 / 503 带 Retry-After 时至少等待该时长。"""
+        delay = random.uniform(0, min(self.max_backoff, self.backoff * 2 ** attempt))
+        retry_after = response.headers.get("Retry-After") if response is not None else None
+        if retry_after and retry_after.isdigit():
+            delay = max(delay, min(float(retry_after), self.max_backoff))
+        return delay
+
+    def request(self, method, path, params=None, data=None):
+        """发送签名请求并返回 requests.Response；重试用尽后返回最后一次响应或抛出最后一次异常。"""
+        for attempt in range(self.max_retries + 1):
+            # 签名带时间戳，每次尝试都重新签名
+            info_req = self.prepare_request(method, path, params=dict(params) if params else None, data=data)
+            response = None
+            try:
+                response = self.session.request(
+                    method=info_req.method,
+                    url=f"{self.base_url}{info_req.path}",
+                    headers=info_req.headers,
+                    params=info_req.query or None,
+                    data=info_req.body,
+                    timeout=self.timeout
+                )
+            except (requests.ConnectionError, requests.Timeout):
+                if attempt == self.max_retries:
+                    raise
+            else:
+                if response.status_code not in self.RETRY_STATUS or attempt == self.max_retries:
+                    return response
+            time.sleep(self.backoff_delay(attempt, response))
+
+    def post(self, path, data):
+        return self.request("POST", path, data=data)
+
+    def close(self):
+        self.session.close()
+
+
+class RAG:
+    # 批量检索的并发请求数上限：默认每条文本一个请求，整批耗时约等于最慢的一次检索
+    RETRIEVAL_CONCURRENCY = 64
+    # 检索结果清洗：去除开头的 'text:' 和结尾的 '\nasin:' 及其后内容（DOTALL 以匹配换行符）
+    TEXT_PREFIX = re.compile(r'^text:')
+    ASIN_SUFFIX = re.compile(r'(\n?)(asin:.*)$', flags=re.DOTALL)
+
+    def __init__(self, ak, sk, domain, account_id, backend=None, base_url=None, max_retries=3,
+                 retrieval_concurrency=None, reranker=None):
+        self.ak = ak
+        self.sk = sk
+        self.domain = domain
+        self.account_id = account_id
+        # 可选的本地检索后端（如 LocalVectorIndex），设置后 search 不再请求远程知识库
+        self.backend = backend
+        # 可选的本地重排器（如 LocalReranker），设置后 rerank 不再请求远程重排接口
+        self.reranker = reranker
+        self.retrieval_concurrency = retrieval_concurrency or self.RETRIEVAL_CONCURRENCY
+        # 复用连接和凭证的签名传输层；base_url 可指向本地 mock 服务。连接池与并发数一致，并发请求都能复用连接
+        self.transport = SignedTransport(ak, sk, domain, account_id, base_url=base_url, max_retries=max_retries,
+                                         pool_size=max(10, self.retrieval_concurrency))
+
+    def prepare_request(self, method, path, params=None, data=None, doseq=0):
+        return self.transport.prepare_request(method, path, params=params, data=data, doseq=doseq)
+
     def search(self, query, name, limit=5, rerank_switch=False, dense_weight=0.5):
+        if self.backend is not None:
+            # 与远程接口返回相同的结构
+            return {"code": 0, "data": {"result_list": self.backend.search(query, limit, dense_weight)}}
+
         # 创建搜索请求的请求体
         path = "/api/knowledge/collection/search"
         request_params = {
@@ -57,38 +150,59 @@ class RAG:
 
             "dense_weight": dense_weight
         }
-        info_req = self.prepare_request(method="POST", path=path, data=request_params)
-        
-        # 发送请求
-        rsp = requests.request(
-            method=info_req.method,
-            url=f"https://{self.domain}{info_req.path}",
-            headers=info_req.headers,
-            data=info_req.body
-        )
+        # 发送请求（复用连接，失败自动重试）
+        rsp = self.transport.post(path, request_params)
         return rsp.json()
 
+    @classmethod
+    def clean_content(cls, content):
+        return cls.TEXT_PREFIX.sub('', cls.ASIN_SUFFIX.sub('', content))
+
+    def _retrieve_one(self, text, topk, strict=True):
+        search_results = self.search(query=text, name="RAG", limit=topk)
+        if search_results.get("code", 0) != 0:
+            if not strict:
+                logger.warning(f"检索请求失败（{text}）：{search_results.get('message')}")
+                return []
+            raise Exception(f"检索请求失败：{search_results.get('message')}")
+        return [self.clean_content(item["content"])
+                for item in search_results.get("data", {}).get("result_list", [])]
+
+    def batch_retrieval(self, texts: list, topk=5, max_workers=None, strict=True) -> list:
+        """
+        并发检索多条文本：每条文本一个请求，最多同时发出 max_workers（默认 retrieval_concurrency）个。
+        输入: ['hello', 'world']
+        输出: 与输入顺序一致的列表，每个元素为
+            {"query": 文本, "results": ["t1", ... "t_topk"], "error": None 或错误信息}
+        单条检索失败只体现在该条的 error 中，不影响其它文本。
+        strict=False 时，响应码非 0 的文本记为空结果而不是错误。
+        """
+        def retrieve(text):
+            try:
+                return {"query": text, "results": self._retrieve_one(text, topk, strict), "error": None}
+            except Exception as e:
+                return {"query": text, "results": [], "error": str(e)}
+
+        if not texts:
+            return []
+        workers = min(max_workers or self.retrieval_concurrency, len(texts))
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix='rag-retrieval') as pool:
+            # map 按输入顺序返回结果
+            return list(pool.map(retrieve, texts))
+
     def retrieval(self, texts: list, topk=5):
         """
-        检索相似的文本
+        检索相似的文本（并发执行，见 batch_retrieval）
         输入: ['hello', 'world']
         输出: [["t1", ... "t_topk"], ["s1", ... "s_topk"]]
+        与原实现一致：响应码非 0 的文本返回空列表；请求本身失败（网络错误、重试耗尽等）时抛出异常。
+        需要逐条区分失败的调用方请使用 batch_retrieval。
         """
         results = []
-        for text in texts:
-            # 调用 search 函数进行检索
-            search_results = self.search(query=text, name="RAG", limit=topk)
-            
-            result_list = []
-            for item in search_results.get("data", {}).get("result_list", []):
-                original_content = item["content"]
-                # 正则替换：去除开头的 'text:' 和结尾的 '\nasin:' 及其后内容
-                # 在此正则中，我们用 re.DOTALL 来匹配换行符
-                cleaned_content = re.sub(r'^text:', '', re.sub(r'(\n?)(asin:.*)$', '', original_content, flags=re.DOTALL))
-
-                result_list.append(cleaned_content)
-            
-            results.append(result_list)
+        for item in self.batch_retrieval(texts, topk, strict=False):
+            if item["error"] is not None:
+                raise Exception(f"检索失败（{item['query']}）：{item['error']}")
+            results.append(item["results"])
         return results
 
     def rerank(self, query, results: list) -> list:
@@ -102,6 +216,12 @@ class RAG:
         返回:
         - list: 包含每个文本的重排分数
         """
+        if self.reranker is not None:
+            # 本地打分，与远程接口返回相同的结构
+            scores = self.reranker.score(query, results)
+            return sorted([{"text": result, "score": float(score)} for result, score in zip(results, scores)],
+                          key=lambda x: x['score'], reverse=True)
+
         # 构造请求数据
         datas = []
         for result in results:
@@ -115,20 +235,9 @@ class RAG:
             "datas": datas
         }
 
-        # 将请求数据转换为 JSON 字符串
-        request_json = json.dumps(request_data)
-        
-        # 使用 prepare_request 来生成签名并发起请求
+        # 通过签名传输层发起请求
         path = "/api/knowledge/service/rerank"
-        info_req = self.prepare_request(method="POST", path=path, data=request_data)
-        
-        # 发送请求
-        response = requests.request(
-            method=info_req.method,
-            url=f"https://{self.domain}{info_req.path}",
-            headers=info_req.headers,
-            data=info_req.body
-        )
+        response = self.transport.post(path, request_data)
         
         # 打印调试信息，查看返回的数据结构
         # print("Response JSON:", response.json())  # 打印完整的响应
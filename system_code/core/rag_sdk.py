@@ -1,27 +1,207 @@
+import json
+import time
+from contextlib import contextmanager
+from urllib.parse import urlsplit
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FuturesTimeoutError, wait
 from volcengine.viking_knowledgebase import VikingKnowledgeBaseService
+from volcengine.auth.SignerV4 import SignerV4
+from volcengine.base.Request import Request
+from volcengine.Credentials import Credentials
 from system_code.core.config import Config
-from transformers import AutoModelForCausalLM, AutoTokenizer
-import torch
+from system_code.core.local_index import LocalVectorIndex, TextEmbedder
+from system_code.core.query_cache import QueryCache
+from system_code.core.sub_queries import SubQueryProvider
+from system_code.core.generation import GenerationService
+from system_code.core.model_runtime import ModelRuntime, ModelNotReadyError
+from system_code.core.reranker import LocalReranker
 from loguru import logger
 
 
+class VikingBackend:
+    """Remote retrieval through the Volcengine Viking knowledge base."""
+
+    HOST = "api-knowledgebase.mlp.cn-beijing.volces.com"
+    SEARCH_PATH = "/api/knowledge/collection/search_knowledge"
+
+    def __init__(self, config):
+        self.collection = config.volcengine['collection_name']
+        # retrieval.remote_url redirects to a compatible server, such as the benchmark stub
+        url = urlsplit(config.retrieval.get('remote_url') or f"https://{self.HOST}")
+        self.scheme, self.host = url.scheme, url.netloc
+        self.service = VikingKnowledgeBaseService(host=self.host, scheme=self.scheme, connection_timeout=30, socket_timeout=30)
+        self.service.set_ak(config.volcengine['ak'])
+        self.service.set_sk(config.volcengine['sk'])
+        # Same signing scope as the SDK, for callers that send the request themselves
+        self.credentials = Credentials(config.volcengine['ak'], config.volcengine['sk'], "air", "cn-north-1")
+
+    def search(self, query, top_k=10, dense_weight=0.7):
+        response = self.service.search_knowledge(
+            collection_name=self.collection,
+            query=query,
+            limit=top_k,
+            dense_weight=dense_weight,
+            project="default")
+        return response['result_list']
+
+    def signed_search_request(self, query, top_k=10, dense_weight=0.7):
+        """Returns (url, headers, body) of a signed search_knowledge call, for non-SDK HTTP clients."""
+        r = Request()
+        r.set_shema(self.scheme)
+        r.set_method("POST")
+        r.set_host(self.host)
+        r.set_path(self.SEARCH_PATH)
+        r.set_headers({"Accept": "application/json", "Content-Type": "application/json", "Host": self.host})
+        r.set_body(json.dumps({"collection_name": self.collection, "project": "default", "query": query,
+                               "limit": top_k, "dense_weight": dense_weight}))
+        SignerV4.sign(r, self.credentials)
+        return f"{self.scheme}://{self.host}{self.SEARCH_PATH}", r.headers, r.body
+
+    async def async_search(self, client, query, top_k=10, dense_weight=0.7):
+        """``search`` over an ``httpx.AsyncClient``, so an event loop can wait on many at once."""
+        url, headers, body = self.signed_search_request(query, top_k, dense_weight)
+        response = await client.post(url, headers=headers, content=body)
+        response.raise_for_status()
+        payload = response.json()
+        if payload.get('code') != 0:
+            raise RuntimeError(f"search_knowledge failed: {payload.get('code')} {payload.get('message')}")
+        return payload['data']['result_list']
+
+
+class StageTimer:
+    """
+    Latency budget of one deep search, and a record of the stages it ran.
+
+    ``budget`` is in seconds (None: unbounded). ``report()`` is what the API returns.
+    """
+
+    def __init__(self, budget=None):
+        self.budget = budget
+        self.started = time.monotonic()
+        self.stages = []
+        self.fallback = False
+
+    def elapsed(self):
+        return time.monotonic() - self.started
+
+    def remaining(self):
+        return None if self.budget is None else self.budget - self.elapsed()
+
+    def deadline(self, reserve=0.0):
+        """``time.monotonic()`` value at which only ``reserve`` seconds of the budget are left."""
+        return None if self.budget is None else self.started + self.budget - reserve
+
+    @contextmanager
+    def stage(self, name):
+        """Times the ``with`` block; details added to the yielded dict are reported with it."""
+        details = {}
+        started = time.monotonic()
+        try:
+            yield details
+        finally:
+            self.stages.append(dict(stage=name, ms=round((time.monotonic() - started) * 1000, 1), **details))
+
+    def report(self):
+        return {
+            'budget_ms': None if self.budget is None else round(self.budget * 1000),
+            'elapsed_ms': round(self.elapsed() * 1000, 1),
+            'fallback': self.fallback,
+            'stages': self.stages,
+        }
+
+
 class RagSdk:
-    def __init__(self):
+    # Sub-query searches allowed in flight at once
+    SEARCH_CONCURRENCY = 5
+    # Seconds deep_search waits for its sub-query searches
+    SEARCH_TIMEOUT = 10
+    # Cached search / deep_search results and how long they stay valid (seconds)
+    QUERY_CACHE_SIZE = 1024
+    QUERY_CACHE_TTL = 3600
+    # Under a latency budget: generation cap, sub-queries after which decoding stops, and the
+    # seconds kept back for the searches (or the plain-search fallback) after decoding, at most
+    # a third of the budget
+    BUDGET_MAX_NEW_TOKENS = 192
+    BUDGET_SUB_QUERIES = 3
+    BUDGET_RESERVE = 1.0
+    DEEP_SEARCH_MODEL = "Carey8175/InsightView-DeepSearch"
+
+    def __init__(self, backend=None, wait_for_models=True, reranker=None):
+        """
+        Args:
+            backend: An object with ``search(query, top_k, dense_weight) -> list``. Defaults to the
+                one named by the ``retrieval.backend`` config: 'remote' (Viking) or 'local' (LocalVectorIndex).
+            wait_for_models: Whether the first deep search blocks until the model is loaded, or
+                raises ModelNotReadyError while it loads in the background.
+            reranker: An object with ``rerank(query, hits, top_k, details=None) -> list`` that orders
+                deep search results. Defaults to a LocalReranker when the ``retrieval.rerank`` config is on.
+        """
         self.config = Config()
-        self.ak = self.config.volcengine['ak']
-        self.sk = self.config.volcengine['sk']
-        self.collection = self.config.volcengine['collection_name']
-        self.viking_knowledgebase_service = VikingKnowledgeBaseService(host="api-knowledgebase.mlp.cn-beijing.volces.com",
-                                                                  scheme="https", connection_timeout=30,
-                                                                  socket_timeout=30)
-        self.viking_knowledgebase_service.set_ak(self.ak)
-        self.viking_knowledgebase_service.set_sk(self.sk)
-
-        self.deep_search_model = AutoModelForCausalLM.from_pretrained("Carey8175/InsightView-DeepSearch")
-        self.deep_search_model.to('cuda' if torch.cuda.is_available() else 'cpu')
-        self.tokenizer = AutoTokenizer.from_pretrained("Carey8175/InsightView-DeepSearch")
+        if backend is None:
+            if self.config.retrieval.get('backend') == 'local':
+                backend = LocalVectorIndex(self.config.retrieval.get('index_path'))
+                # New reviews are indexed in the background as they are ingested
+                backend.start_auto_sync()
+            else:
+                backend = VikingBackend(self.config)
+        self.backend = backend
+        if reranker is None and self.config.retrieval.get('rerank'):
+            reranker = LocalReranker(self.config.retrieval.get('reranker_model'),
+                                     max_candidates=self.config.retrieval.get('rerank_candidates', 50),
+                                     wait=wait_for_models)
+        self.reranker = reranker
+
+        # Near-duplicate query matching needs an embedder; the local backend already has one
+        embedder = None
+        if self.config.retrieval.get('semantic_cache'):
+            embedder = getattr(backend, 'embedder', None) or TextEmbedder(self.config.retrieval['embedding_model'])
+        cache_dir = self.config.CACHE_DIR
+        cache_dir.mkdir(parents=True, exist_ok=True)
+        self.query_cache = QueryCache(max_entries=self.QUERY_CACHE_SIZE, ttl=self.QUERY_CACHE_TTL,
+                                      path=str(cache_dir / 'queries.sqlite'), embedder=embedder)
+        if hasattr(backend, 'on_change'):
+            # Results of the local index go stale as soon as it indexes new reviews
+            backend.on_change(self.query_cache.clear)
+        self.sub_query_provider = SubQueryProvider(self.run_deep_search_model,
+                                                   store_path=cache_dir / 'sub_queries.jsonl')
+        self.search_pool = ThreadPoolExecutor(max_workers=self.SEARCH_CONCURRENCY, thread_name_prefix='rag-search')
+
+        # The deep search model is loaded on first use (or by start_warm_up) through the shared runtime
+        self.runtime = ModelRuntime.instance()
+        self.wait_for_models = wait_for_models
         self.eos_token = '<|deep_search_end|>'
 
+    def load_deep_search_model(self):
+        model, tokenizer = self.runtime.causal_lm(self.DEEP_SEARCH_MODEL)
+        # Concurrent deep searches share micro-batched, streamed decoding
+        generator = GenerationService(model, tokenizer, max_batch_size=8)
+        generator.generate(self.apply_deep_search_template('warm up'), skip_special_tokens=False, max_new_tokens=1)
+        return model, tokenizer, generator
+
+    def _deep_search_components(self):
+        return self.runtime.load(self.DEEP_SEARCH_MODEL, self.load_deep_search_model, wait=self.wait_for_models)
+
+    @property
+    def deep_search_model(self):
+        return self._deep_search_components()[0]
+
+    @property
+    def tokenizer(self):
+        return self._deep_search_components()[1]
+
+    @property
+    def generator(self):
+        return self._deep_search_components()[2]
+
+    @property
+    def models_ready(self):
+        return self.runtime.is_ready(self.DEEP_SEARCH_MODEL)
+
+    def start_warm_up(self):
+        """Loads and warms up the deep search model (and the reranker's model) on background threads."""
+        self.runtime.load_in_background(self.DEEP_SEARCH_MODEL, self.load_deep_search_model)
+        if hasattr(self.reranker, 'start_warm_up'):
+            self.reranker.start_warm_up()
+
     def init_deep_search_model(self):
         """
         Initialize the deep search model and tokenizer.
@@ -67,6 +247,13 @@ class RagSdk:
 
 
     def generate_sub_queries(self, query):
+        """
+        Sub-queries for a deep search: stored ones when the query (or a near-identical one) has been
+        seen before or is in query_database.json, otherwise generated by the model.
+        """
+        return self.sub_query_provider.get(query)
+
+    def run_deep_search_model(self, query):
         """
         Perform a deep search using the initialized model and tokenizer.
 
@@ -76,24 +263,46 @@ class RagSdk:
         Returns:
             str: The generated response from the deep search model.
         """
-        if self.deep_search_model is None or self.tokenizer is None:
-            logger.error("Deep search model and tokenizer must be initialized first.")
-            return
+        response = self.submit_deep_search(query).result()
+
+        return self.extract_sub_queries(response)
 
-        model_inputs = self.tokenizer([self.apply_deep_search_template(query)], return_tensors="pt").to(self.deep_search_model.device)
-        outputs = self.deep_search_model.generate(
-            **model_inputs,
-            max_new_tokens=512,
+    def submit_deep_search(self, query, max_new_tokens=512):
+        """Queues sub-query generation for ``query`` on the shared generation service."""
+        return self.generator.submit(
+            self.apply_deep_search_template(query),
+            skip_special_tokens=False,
+            max_new_tokens=max_new_tokens,
             temperature=0.1,
             do_sample=True,
             eos_token_id=self.tokenizer.convert_tokens_to_ids(self.eos_token))
-        generated_ids = [
-            output_ids[len(input_ids):] for input_ids, output_ids in zip(model_inputs.input_ids, outputs)
-        ]
 
-        response = self.tokenizer.batch_decode(generated_ids, skip_special_tokens=False)[0]
+    def stream_sub_queries(self, query, max_sub_queries=5, deadline=None, request=None):
+        """
+        Yields sub-queries one by one, each as soon as its ``<|subN_end|>`` marker is decoded.
 
-        return self.extract_sub_queries(response)
+        Decoding is cancelled once ``max_sub_queries`` have been yielded or at ``deadline`` (a
+        ``time.monotonic()`` value). ``request`` is a GenerationRequest already submitted for ``query``.
+        """
+        request = request or self.submit_deep_search(query)
+        response, emitted = '', set()
+        try:
+            for piece in request.stream(deadline=deadline):
+                response += piece
+                for i in range(5):
+                    start_marker, end_marker = f"<|sub{i}_start|>", f"<|sub{i}_end|>"
+                    if i in emitted or start_marker not in response or end_marker not in response:
+                        continue
+                    emitted.add(i)
+                    start = response.index(start_marker) + len(start_marker)
+                    yield response[start:response.index(end_marker)].strip()
+                    if len(emitted) >= max_sub_queries:
+                        return
+        except TimeoutError:
+            logger.warning(f"Sub-query generation hit the deadline after {len(emitted)} sub-queries")
+        finally:
+            # Frees the batch slot when stopping early; a no-op once decoding has finished
+            request.cancel()
 
     def search(self, query, top_k=10, dense_weight=0.7):
         """
@@ -108,38 +317,171 @@ class RagSdk:
             list: A list of dictionaries containing the search results.
         """
         try:
-            response = self.viking_knowledgebase_service.search_knowledge(
-                collection_name=self.collection,
-                query=query,
-                limit=top_k,
-                dense_weight=dense_weight,
-                project="default")
-
-            return response['result_list']
+            return self._search(query, top_k, dense_weight)
         except Exception as e:
-            print(f"Error during search: {e}")
+            logger.error(f"Error during search: {e}")
             return []
 
-    def deep_search(self, query, top_k=10, dense_weight=0.7):
+    def _search(self, query, top_k, dense_weight):
+        """``search`` that raises backend errors, for callers that must tell a failure from no hits."""
+        hit, results = self.query_cache.get('search', query, (top_k, dense_weight))
+        if hit:
+            return results
+        return self._search_uncached(query, top_k, dense_weight)
+
+    def _search_uncached(self, query, top_k, dense_weight):
+        """One backend round trip; raises on failure, caches on success."""
+        results = self.backend.search(query, top_k, dense_weight)
+        self.query_cache.set('search', query, (top_k, dense_weight), results)
+        return results
+
+    @staticmethod
+    def result_key(item):
+        """
+        Identity of a search hit, so the same chunk returned by several sub-queries is kept once.
+        """
+        if item.get('point_id') or item.get('id'):
+            return item.get('point_id') or item.get('id')
+        doc_info = item.get('doc_info') or {}
+        if doc_info.get('doc_id'):
+            return doc_info['doc_id'], item.get('chunk_id')
+        return item.get('content')
+
+    @classmethod
+    def merge_results(cls, hit_lists, top_k=None):
+        """Best-scoring copy of every distinct hit across ``hit_lists``, top_k by score."""
+        results = {}
+        for hits in hit_lists:
+            for item in hits:
+                key = cls.result_key(item)
+                if key not in results or item['score'] > results[key]['score']:
+                    results[key] = item
+        return sorted(results.values(), key=lambda x: x['score'], reverse=True)[:top_k]
+
+    def rank_results(self, query, hit_lists, top_k, details=None):
+        """
+        Merged sub-query hits, top_k. Remote scores of different sub-queries are not comparable, so
+        with a reranker every hit is re-scored against the original query instead. ``details``
+        receives what the reranker reports, including ``fallback`` when it used a stand-in score.
+        """
+        if self.reranker is None:
+            return self.merge_results(hit_lists, top_k)
+        return self.reranker.rerank(query, self.merge_results(hit_lists), top_k, details=details)
+
+    def budget_reserve(self, budget):
+        return min(self.BUDGET_RESERVE, budget / 3)
+
+    def sub_queries_truncated(self, timer, request, sub_queries):
+        """
+        Whether budgeted decoding was cut off before the model finished its sub-queries, at the
+        deadline or the token cap. Stopping after BUDGET_SUB_QUERIES counts as finished.
+        """
+        if timer.budget is None or request is None:
+            return False
+        return request.finish_reason != 'eos' and len(sub_queries) < self.BUDGET_SUB_QUERIES
+
+    def deep_search(self, query, top_k=10, dense_weight=0.7, timeout=None, timer=None):
         """
         Perform a deep search using the initialized model and tokenizer.
 
+        The sub-queries are searched concurrently (at most SEARCH_CONCURRENCY at a time), each one
+        as soon as the model has decoded it. Sub-queries that fail or miss the deadline are skipped,
+        and hits are de-duplicated by document chunk before being ranked (see rank_results).
+
+        Under a latency budget (``timer=StageTimer(budget)``) decoding is capped at
+        BUDGET_MAX_NEW_TOKENS, stops after BUDGET_SUB_QUERIES sub-queries or when only the reserve (see
+        BUDGET_RESERVE) is left, and the searches wait at most for the rest of the budget. When no
+        sub-query is ready in time, or the model is still loading, it falls back to a plain search,
+        which returns no hits if it does not finish within the budget either.
+
         Args:
             query (str): The search query.
             top_k (int): The number of top results to return.
             dense_weight (float): The weight for the dense vector search.
+            timeout (float): Seconds to wait for the sub-query searches. Defaults to SEARCH_TIMEOUT.
+            timer (StageTimer): Budget of this call; records the stages that ran and their timings.
 
         Returns:
-            list: A list of dictionaries containing the search results.
+            tuple: The sub-queries and a list of dictionaries containing the search results.
         """
-        sub_queries = self.generate_sub_queries(query)
-        results = []
-        for sub_query in sub_queries:
-            result = self.search(sub_query, top_k, dense_weight)
-            results.extend(result)
+        timer = timer or StageTimer()
+        with timer.stage('cache') as stage:
+            hit, cached = self.query_cache.get('deep_search', query, (top_k, dense_weight))
+            stage['hit'] = hit
+        if hit:
+            sub_queries, results = cached
+            return sub_queries, results
+
+        # Stored sub-queries are searched at once; freshly generated ones as each is decoded
+        stored = self.sub_query_provider.lookup(query)
+        sub_queries, futures, request = [], [], None
+        with timer.stage('sub_queries' if stored is not None else 'generate') as stage:
+            if stored is not None:
+                source = stored
+            elif timer.budget is None:
+                request = self.submit_deep_search(query)
+                source = self.stream_sub_queries(query, request=request)
+            else:
+                try:
+                    request = self.submit_deep_search(query, max_new_tokens=self.BUDGET_MAX_NEW_TOKENS)
+                except ModelNotReadyError as e:
+                    logger.warning(f"Deep search model not ready, falling back to plain search: {e}")
+                source = [] if request is None else self.stream_sub_queries(
+                    query, self.BUDGET_SUB_QUERIES, timer.deadline(self.budget_reserve(timer.budget)), request)
+            for sub_query in source:
+                sub_queries.append(sub_query)
+                # _search raises, so a failed sub-query marks the answer partial instead of looking empty
+                futures.append(self.search_pool.submit(self._search, sub_query, top_k, dense_weight))
+            stage['count'] = len(sub_queries)
+            if request is not None:
+                stage['finish_reason'] = request.finish_reason
+        # Sub-queries cut short by the budget are not stored or cached, or later asks would reuse the truncated set
+        truncated = self.sub_queries_truncated(timer, request, sub_queries)
+        if request is not None and not truncated:
+            self.sub_query_provider.store(query, sub_queries)
+
+        if not sub_queries and timer.budget is not None:
+            timer.fallback = True
+            with timer.stage('fallback_search') as stage:
+                future = self.search_pool.submit(self.search, query, top_k, dense_weight)
+                try:
+                    return [], future.result(timeout=max(timer.remaining(), 0))
+                except FuturesTimeoutError:
+                    future.cancel()
+                    logger.warning(f"Fallback search missed the deadline: {query}")
+                    stage['timed_out'] = True
+                    return [], []
+
+        with timer.stage('search') as stage:
+            wait_for = timeout or self.SEARCH_TIMEOUT
+            if timer.budget is not None:
+                wait_for = min(wait_for, max(timer.remaining(), 0))
+            done, not_done = wait(futures, timeout=wait_for)
+
+            hit_lists = []
+            complete = bool(sub_queries)
+            for sub_query, future in zip(sub_queries, futures):
+                if future in not_done:
+                    future.cancel()
+                    logger.warning(f"Search for sub-query timed out: {sub_query}")
+                    complete = False
+                    continue
+                try:
+                    hits = future.result()
+                except Exception as e:
+                    logger.warning(f"Search for sub-query failed: {sub_query}: {e}")
+                    complete = False
+                    continue
+                hit_lists.append(hits)
+            stage['completed'] = len(hit_lists)
 
-        results.sort(key=lambda x: x['score'], reverse=True)
-        return sub_queries, results[:top_k]  # Return top_k results
+        with timer.stage('rerank' if self.reranker is not None else 'merge') as stage:
+            results = self.rank_results(query, hit_lists, top_k, stage)
+        if complete and not truncated and not stage.get('fallback'):
+            # Partial answers, and ones ranked while the reranker model loads, are not cached,
+            # so the next ask gets another chance at all sub-queries and the model's ranking
+            self.query_cache.set('deep_search', query, (top_k, dense_weight), [sub_queries, results])
+        return sub_queries, results  # Return top_k results
 
 if __name__ == '__main__':
     sdk = RagSdk()
@@ -0,0 +1,138 @@
+import re
+import threading
+from collections import OrderedDict
+import torch
+from system_code.core.config import logger
+from system_code.core.model_runtime import ModelRuntime, ModelNotReadyError
+
+
+class LocalReranker:
+    """
+    Local (query, document) relevance scoring for search hits.
+
+    With ``model_name`` set, pairs are scored by a cross-encoder loaded through the shared
+    ModelRuntime, in CPU batches of ``batch_size``. Without one, or while the model is loading
+    (``wait=False``) or after it fails, a lexical score is used instead: the share of query terms
+    found in the document. Scores are cached per (scorer, query, document), so hits repeated across
+    sub-queries and repeated searches are scored once.
+
+    ``rerank`` scores at most ``max_candidates`` hits (the best by their original score) against
+    one query, so hits merged from different sub-queries or backends end up on a single scale.
+    Callers that keep results around can pass ``details`` and check its ``fallback`` flag, which
+    is set when the lexical score stood in for the configured model.
+    """
+
+    TOKEN_PATTERN = re.compile(r'(?u)\b\w\w+\b')
+    # Hit content from the knowledge base is 'text:<review>\nasin:<product>'
+    CONTENT_PATTERN = re.compile(r'^(?:text:)?(.*?)(?:\n?asin:.*)?$', flags=re.DOTALL)
+
+    def __init__(self, model_name=None, max_candidates=50, batch_size=32, max_length=256, cache_size=10000, wait=True):
+        self.model_name = model_name
+        self.max_candidates = max_candidates
+        self.batch_size = batch_size
+        self.max_length = max_length
+        self.cache_size = cache_size
+        self.wait = wait
+        self.runtime = ModelRuntime.instance() if model_name else None
+        self._cache = OrderedDict()
+        self._lock = threading.Lock()
+        self._counters = {'hits': 0, 'misses': 0, 'lexical_fallbacks': 0}
+
+    def load(self):
+        model, tokenizer = self.runtime.cross_encoder(self.model_name)
+        self._model_scores(model, tokenizer, 'warm up', ['warm up'])
+        return model, tokenizer
+
+    def _loaded(self):
+        return self.runtime.load(self.model_name, self.load, wait=self.wait)
+
+    def start_warm_up(self):
+        """Loads and warms up the cross-encoder on a background thread."""
+        if self.model_name:
+            self.runtime.load_in_background(self.model_name, self.load)
+
+    @classmethod
+    def content_text(cls, hit):
+        return cls.CONTENT_PATTERN.match(hit.get('content') or '').group(1).strip()
+
+    @classmethod
+    def lexical_scores(cls, query, texts):
+        """Share of the distinct query terms that occur in each text, in [0, 1]."""
+        terms = set(cls.TOKEN_PATTERN.findall(query.lower()))
+        if not terms:
+            return [0.0] * len(texts)
+        return [len(terms & set(cls.TOKEN_PATTERN.findall(text.lower()))) / len(terms) for text in texts]
+
+    def _model_scores(self, model, tokenizer, query, texts):
+        scores = []
+        for start in range(0, len(texts), self.batch_size):
+            batch = texts[start:start + self.batch_size]
+            inputs = tokenizer([query] * len(batch), batch, padding=True, truncation=True,
+                               max_length=self.max_length, return_tensors='pt').to(model.device)
+            with torch.no_grad():
+                logits = model(**inputs).logits.float()
+            # Single-logit relevance heads score directly; two-class heads use the 'relevant' logit
+            scores.extend((logits[:, 0] if logits.shape[1] == 1 else logits[:, -1]).tolist())
+        return scores
+
+    def _scorer(self):
+        """Returns (name, score(query, texts)) of the scorer to use right now."""
+        if self.model_name:
+            try:
+                model, tokenizer = self._loaded()
+                return self.model_name, lambda query, texts: self._model_scores(model, tokenizer, query, texts)
+            except ModelNotReadyError:
+                pass
+            except Exception as e:
+                logger.warning(f'[LocalReranker] {self.model_name} unavailable, using lexical scores: {e}')
+            with self._lock:
+                self._counters['lexical_fallbacks'] += 1
+        return 'lexical', self.lexical_scores
+
+    def score(self, query, texts, details=None):
+        """Relevance of every text to ``query``; higher is better."""
+        name, score = self._scorer()
+        if details is not None:
+            details['scorer'] = name
+            details['fallback'] = bool(self.model_name) and name == 'lexical'
+        scores, missing = [None] * len(texts), {}
+        with self._lock:
+            for i, text in enumerate(texts):
+                key = (name, query, text)
+                if key in self._cache:
+                    self._cache.move_to_end(key)
+                    scores[i] = self._cache[key]
+                    self._counters['hits'] += 1
+                else:
+                    missing.setdefault(text, []).append(i)
+                    self._counters['misses'] += 1
+        if missing:
+            new_scores = score(query, list(missing))
+            with self._lock:
+                for (text, positions), value in zip(missing.items(), new_scores):
+                    for i in positions:
+                        scores[i] = value
+                    self._cache[(name, query, text)] = value
+                while len(self._cache) > self.cache_size:
+                    self._cache.popitem(last=False)
+        return scores
+
+    def rerank(self, query, hits, top_k=None, details=None):
+        """
+        Hits re-ordered by relevance to ``query``, each copied with a ``rerank_score``. Hits beyond
+        ``max_candidates`` keep their original order after the reranked ones. ``details`` (a dict)
+        receives the scorer used and whether it was the lexical fallback.
+        """
+        ordered = sorted(hits, key=lambda hit: hit.get('score', 0), reverse=True)
+        candidates, rest = ordered[:self.max_candidates], ordered[self.max_candidates:]
+        scores = self.score(query, [self.content_text(hit) for hit in candidates], details)
+        reranked = sorted((dict(hit, rerank_score=score) for hit, score in zip(candidates, scores)),
+                          key=lambda hit: hit['rerank_score'], reverse=True)
+        return (reranked + rest)[:top_k]
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._counters, size=len(self._cache))
+        lookups = stats['hits'] + stats['misses']
+        stats['hit_ratio'] = round(stats['hits'] / lookups, 4) if lookups else 0.0
+        return stats
@@ -0,0 +1,112 @@
+import os
+import json
+import threading
+from difflib import SequenceMatcher
+from collections import Counter, defaultdict
+from system_code.core.config import Config, logger
+from system_code.core.query_cache import QueryCache
+
+
+class SubQueryProvider:
+    """
+    Memoized deep-search sub-queries.
+
+    Sub-queries are looked up in an in-memory store seeded from the curated
+    ``datasets/deep_search/query_database.json`` and from every earlier generation, which is
+    appended to ``store_path`` so it survives restarts. A near-identical query (same words with
+    small edits, SequenceMatcher ratio >= ``fuzzy_ratio``) reuses the stored answer. ``generate``
+    (the deep search model) only runs on a true miss.
+    """
+
+    SEED_PATH = Config.STATICS_PATH / 'datasets' / 'deep_search' / 'query_database.json'
+    # Stored queries compared in full per fuzzy lookup, picked by shared words
+    FUZZY_CANDIDATES = 20
+
+    def __init__(self, generate, store_path=None, seed_path=None, fuzzy_ratio=0.9):
+        self.generate = generate
+        self.store_path = str(store_path or Config.CACHE_DIR / 'sub_queries.jsonl')
+        self.fuzzy_ratio = fuzzy_ratio
+        self._store = {}
+        self._postings = defaultdict(set)
+        self._lock = threading.Lock()
+        self._counters = {'hits': 0, 'fuzzy_hits': 0, 'misses': 0}
+
+        self._load(seed_path or self.SEED_PATH)
+        if os.path.exists(self.store_path):
+            self._load(self.store_path, lines=True)
+
+    def _load(self, path, lines=False):
+        if not os.path.exists(path):
+            logger.warning(f'[SubQueryProvider] {path} not found')
+            return
+        with open(path, 'r', encoding='utf-8') as f:
+            if lines:
+                records = []
+                for line in f:
+                    try:
+                        records.append(json.loads(line))
+                    except json.JSONDecodeError:
+                        continue  # Torn last line from an interrupted write
+            else:
+                records = json.load(f)
+        for record in records:
+            if record.get('query') and record.get('sub_queries'):
+                self._remember(QueryCache.normalize(record['query']), record['sub_queries'])
+        logger.info(f'[SubQueryProvider] Loaded {len(records)} queries from {path}')
+
+    def _remember(self, text, sub_queries):
+        self._store[text] = sub_queries
+        for word in set(text.split()):
+            self._postings[word].add(text)
+
+    def lookup(self, query):
+        """Stored sub-queries for ``query`` or a near-identical one, else None."""
+        text = QueryCache.normalize(query)
+        with self._lock:
+            if text in self._store:
+                self._counters['hits'] += 1
+                return self._store[text]
+
+            words = set(text.split())
+            shared = Counter(key for word in words for key in self._postings.get(word, ()))
+            best, best_ratio = None, self.fuzzy_ratio
+            for key, _ in shared.most_common(self.FUZZY_CANDIDATES):
+                ratio = SequenceMatcher(None, text, key).ratio()
+                if ratio >= best_ratio:
+                    best, best_ratio = key, ratio
+            if best is not None:
+                self._counters['fuzzy_hits'] += 1
+                return self._store[best]
+
+            self._counters['misses'] += 1
+            return None
+
+    def get(self, query):
+        """Sub-queries for ``query``, generating (and storing) them only on a miss."""
+        sub_queries = self.lookup(query)
+        if sub_queries is not None:
+            return sub_queries
+
+        sub_queries = self.generate(query)
+        self.store(query, sub_queries)
+        return sub_queries
+
+    def store(self, query, sub_queries):
+        """Remembers freshly generated sub-queries, in memory and on disk."""
+        if not sub_queries:
+            return
+        with self._lock:
+            self._remember(QueryCache.normalize(query), sub_queries)
+            try:
+                os.makedirs(os.path.dirname(self.store_path), exist_ok=True)
+                with open(self.store_path, 'a', encoding='utf-8') as f:
+                    f.write(json.dumps({'query': query, 'sub_queries': sub_queries}, ensure_ascii=False) + '\n')
+            except OSError as e:
+                logger.warning(f'[SubQueryProvider] Storing sub-queries failed: {e}')
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._counters, size=len(self._store))
+        lookups = stats['hits'] + stats['fuzzy_hits'] + stats['misses']
+        stats['hit_ratio'] = round((stats['hits'] + stats['fuzzy_hits']) / lookups, 4) if lookups else 0.0
+        return stats
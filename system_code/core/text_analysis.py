@@ -1,14 +1,15 @@
-import os
-import joblib
-from system_code.core.config import Config
-from transformers import AutoModelForCausalLM, AutoTokenizer
+import hashlib
+from system_code.core.linear_models import LinearTextModel, SharedFeatures
+from system_code.core.generation import GenerationService
+from system_code.core.model_runtime import ModelRuntime
 import torch
 
 
 class SentimentClassifier:
     def __init__(self):
-        self.model = joblib.load(os.path.join(Config.STATICS_PATH, 'models', 'logistic_regression_sentiment_model.pkl'))
-        self.vectorizer = joblib.load(os.path.join(Config.STATICS_PATH, 'models', 'tfidf_sentiment_vectorizer.pkl'))
+        # NumPy export of logistic_regression_sentiment_model.pkl + tfidf_sentiment_vectorizer.pkl
+        self.model = LinearTextModel.from_pickles('sentiment', 'tfidf_sentiment_vectorizer.pkl',
+                                                  'logistic_regression_sentiment_model.pkl')
 
     def predict(self, text: str) -> str:
         """
@@ -17,21 +18,27 @@ class SentimentClassifier:
 
         """
 
-        text_tfidf = self.vectorizer.transform([text])
-
-        prediction = self.model.predict(text_tfidf)
+        prediction = self.model.predict_batch([text])
 
         return prediction[0]
 
+    def predict_batch(self, texts: list) -> list:
+        """
+        Input:List[str]
+        Output:List[positive neutral negative]
+
+        One vectorised TF-IDF + predict pass for the whole batch.
+        """
+        if not texts:
+            return []
+
+        return self.model.predict_batch(texts)
+
 
 class BotClassifier:
     def __init__(self):
-        # 加载保存的模型
-        self.model = joblib.load(
-            os.path.join(Config.STATICS_PATH, 'models', 'logistic_regression_model.pkl'))  # 替换为您的模型路径
-        # 加载保存的TF-IDF向量化器
-        self.vectorizer = joblib.load(
-            os.path.join(Config.STATICS_PATH, 'models', 'tfidf_vectorizer.pkl'))  # 替换为您的TF-IDF路径
+        # 加载保存的模型和TF-IDF向量化器（导出为NumPy格式，与sklearn预测结果一致）
+        self.model = LinearTextModel.from_pickles('bot', 'tfidf_vectorizer.pkl', 'logistic_regression_model.pkl')
 
     def predict(self, text: str) -> int:
         """
@@ -43,27 +50,73 @@ class BotClassifier:
         返回:
         str: "0" 表示虚假信息，"1" 表示真实信息
         """
-        # 将输入文本转换为TF-IDF特征
-        text_tfidf = self.vectorizer.transform([text])
-
         # 使用模型进行预测
-        prediction = self.model.predict(text_tfidf)
+        prediction = self.model.predict_batch([text])
+
+        return int(prediction[0])
 
-        return int(prediction)
+    def predict_batch(self, texts: list) -> list:
+        """
+        批量预测，一次TF-IDF转换 + 一次predict。
 
+        参数:
+        texts (list): 输入的文本列表
+
+        返回:
+        list: 每条文本对应 0 / 1
+        """
+        if not texts:
+            return []
+
+        return [int(p) for p in self.model.predict_batch(texts)]
 
-class TitleClassifier:
-    def __init__(self):
-        # Load model and tokenizer from Hugging Face
-        model_name = 'Carey8175/InsightView-Title'
-        self.tokenizer = AutoTokenizer.from_pretrained(model_name)
-        self.model = AutoModelForCausalLM.from_pretrained(model_name)
-        # Use GPU if available
-        self.device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
-        self.model.to(self.device)
-        self.model.eval() # Set model to evaluation mode
 
-        self.eos_token = self.tokenizer.convert_tokens_to_ids('<|im_end|>')
+class TitleClassifier:
+    MODEL_NAME = 'Carey8175/InsightView-Title'
+
+    def __init__(self, wait=True):
+        # The model is loaded on first use through the shared runtime (GPU if available)
+        self.runtime = ModelRuntime.instance()
+        self.device = self.runtime.device
+        self.wait = wait
+
+    def load(self):
+        model, tokenizer = self.runtime.causal_lm(self.MODEL_NAME)
+        eos_token = tokenizer.convert_tokens_to_ids('<|im_end|>')
+        # Concurrent predict() calls are decoded together; also sets up left padding
+        generator = GenerationService(model, tokenizer, max_batch_size=16, max_input_length=512)
+        generator.generate(self.apply_template('warm up'), max_new_tokens=1, eos_token_id=eos_token)
+        return model, tokenizer, generator, eos_token
+
+    def _loaded(self):
+        return self.runtime.load(self.MODEL_NAME, self.load, wait=self.wait)
+
+    @property
+    def version(self):
+        # The hub commit of the loaded snapshot, so updated weights do not reuse cached titles;
+        # quantized and full-precision weights can decode differently too
+        commit = getattr(self.model.config, '_commit_hash', None) or 'local'
+        return f'{self.MODEL_NAME}@{commit}:{self.runtime.precision}'
+
+    @property
+    def model(self):
+        return self._loaded()[0]
+
+    @property
+    def tokenizer(self):
+        return self._loaded()[1]
+
+    @property
+    def generator(self):
+        return self._loaded()[2]
+
+    @property
+    def eos_token(self):
+        return self._loaded()[3]
+
+    @staticmethod
+    def apply_template(text: str) -> str:
+        return '<|im_start|>' + text + '<|im_end|>\n<|im_start|>'
 
     def predict(self, text: str) -> str:
         """
@@ -75,46 +128,133 @@ class TitleClassifier:
         Returns:
             str: The predicted title category.
         """
-        text = '<|im_start|>' + text + '<|im_end|>\n<|im_start|>'
-
-        inputs = self.tokenizer([text], return_tensors="pt", truncation=True, padding=True, max_length=512).to(self.device)
-
-        generated_ids = self.model.generate(
-            **inputs,
+        return self.generator.generate(
+            self.apply_template(text),
             temperature=0.01,
             max_new_tokens=50,
             eos_token_id=self.eos_token,
             do_sample=True)
 
-        # Decode the generated tokens to get the predicted class
-        generated_ids_trimmed = [
-            out_ids[len(in_ids):] for in_ids, out_ids in zip(inputs.input_ids, generated_ids)
-        ]
+    def predict_batch(self, texts: list, batch_size: int = 16) -> list:
+        """
+        Predicts title categories for a list of texts.
+
+        Prompts are left-padded and generated together in micro-batches of
+        ``batch_size``, so one ``generate`` call serves many reviews.
 
-        output_text = self.tokenizer.batch_decode(
-            generated_ids_trimmed, skip_special_tokens=True, clean_up_tokenization_spaces=False
-        )
+        Args:
+            texts (list): The input texts.
+            batch_size (int): Number of prompts per ``generate`` call.
 
-        return output_text[0]
+        Returns:
+            list: The predicted title categories, in input order.
+        """
+        outputs = []
+        for start in range(0, len(texts), batch_size):
+            prompts = [self.apply_template(text) for text in texts[start:start + batch_size]]
+            # Left padding is set per call: the tokenizer may be shared with a GenerationService
+            inputs = self.tokenizer(prompts, return_tensors="pt", truncation=True, padding=True, padding_side='left',
+                                    max_length=512).to(self.device)
+
+            with torch.no_grad():
+                generated_ids = self.model.generate(
+                    **inputs,
+                    temperature=0.01,
+                    max_new_tokens=50,
+                    eos_token_id=self.eos_token,
+                    pad_token_id=self.tokenizer.pad_token_id,
+                    do_sample=True)
+
+            # With left padding all prompts share the same length, so slice once
+            generated_ids_trimmed = generated_ids[:, inputs.input_ids.shape[1]:]
+
+            outputs.extend(self.tokenizer.batch_decode(
+                generated_ids_trimmed, skip_special_tokens=True, clean_up_tokenization_spaces=False
+            ))
+
+        return outputs
 
 class TextAnalysis:
+    # Reviews per chunk for the linear models; one transform + predict per chunk
+    CHUNK_SIZE = 4096
+    # Prompts per generate call for the title model
+    TITLE_BATCH_SIZE = 16
+
     def __init__(self):
         self.bot_classifier = BotClassifier()
         self.sentiment_classifier = SentimentClassifier()
         self.title_classifier = TitleClassifier() # Add title classifier instance
+        # Both linear models score from one tokenization of each text
+        self.features = SharedFeatures([self.sentiment_classifier.model, self.bot_classifier.model])
 
     def single_process(self, text: str):
         """执行各项文本分析任务， 返回3种分析结果"""
-        sentiment = self.sentiment_classifier.predict(text)
-        is_real = self.bot_classifier.predict(text)
+        (sentiment,), (is_real,) = self.features.predict([text])
+        is_real = int(is_real)
         title = self.title_classifier.predict(text) # Get title prediction
 
 
         return sentiment, is_real, title # Update return value
 
-    def text_analyse(self, df):
+    @staticmethod
+    def text_hash(text: str) -> bytes:
+        """Hash of the whitespace-normalised text; identical reviews share their results."""
+        return hashlib.sha256(' '.join(text.split()).encode('utf-8')).digest()
+
+    @property
+    def model_versions(self) -> dict:
+        return {
+            'sentiment': self.sentiment_classifier.model.version,
+            'bot': self.bot_classifier.model.version,
+            'title': self.title_classifier.version,
+        }
+
+    def batch_process(self, texts: list, cache=None):
+        """
+        批量执行文本分析，返回 (sentiments, is_reals, titles) 三个与输入等长的列表
+
+        Duplicate texts are classified once. With a ``cache`` (see postgres_client.AnalysisCache)
+        results stored for the current model versions are reused, and new ones are stored.
+        """
+        hashes = [self.text_hash(text) for text in texts]
+        unique = dict(zip(hashes, texts))
+        versions = self.model_versions
+        results = cache.lookup(versions, list(unique)) if cache is not None else {name: {} for name in versions}
+        computed = {name: {} for name in versions}
+
+        missing = [h for h in unique if h not in results['sentiment'] or h not in results['bot']]
+        if missing:
+            sentiments, is_reals = self.features.predict([unique[h] for h in missing])
+            computed['sentiment'].update(zip(missing, sentiments))
+            computed['bot'].update(zip(missing, (int(p) for p in is_reals)))
+
+        missing = [h for h in unique if h not in results['title']]
+        if missing:
+            titles = self.title_classifier.predict_batch([unique[h] for h in missing], batch_size=self.TITLE_BATCH_SIZE)
+            computed['title'].update(zip(missing, titles))
+
+        if cache is not None:
+            cache.store(versions, computed)
+        for name in versions:
+            results[name].update(computed[name])
+
+        return ([results['sentiment'][h] for h in hashes],
+                [results['bot'][h] for h in hashes],
+                [results['title'][h] for h in hashes])
+
+    def text_analyse(self, df, chunk_size: int = None):
         """df is a pandas dataframe, include: id, text"""
-        df['sentiment'], df['real_review'], df['summary'] = zip(*df['text'].map(self.single_process))
+        chunk_size = chunk_size or self.CHUNK_SIZE
+        texts = df['text'].fillna('').astype(str).tolist()
+
+        sentiments, is_reals, titles = [], [], []
+        for start in range(0, len(texts), chunk_size):
+            chunk_sentiments, chunk_is_reals, chunk_titles = self.batch_process(texts[start:start + chunk_size])
+            sentiments.extend(chunk_sentiments)
+            is_reals.extend(chunk_is_reals)
+            titles.extend(chunk_titles)
+
+        df['sentiment'], df['real_review'], df['summary'] = sentiments, is_reals, titles
         return df
 
 
@@ -1,166 +1,511 @@
-from ast import main
+import io
+import os
+import csv
+import time
+import select
+import threading
+import multiprocessing as mp
+from contextlib import contextmanager
 import psycopg2
 from psycopg2 import sql
-from psycopg2.extensions import ISOLATION_LEVEL_AUTOCOMMIT
-from datetime import datetime
+from psycopg2.extras import execute_values
+from psycopg2.pool import ThreadedConnectionPool, PoolError
+from psycopg2.extensions import ISOLATION_LEVEL_AUTOCOMMIT, TRANSACTION_STATUS_IDLE
+from datetime import datetime, timezone
+import numpy as np
 import pandas as pd
 from tqdm import tqdm
+from collections import Counter
 from system_code.core.config import Config, logger
+from system_code.core.wordcloud import count_words
 import json # Add json import for parsing images string
 
+class _Echo:
+    """File-like sink that hands back what csv.writer writes, one formatted line per row."""
+
+    def write(self, line):
+        return line
+
+
+def _copy_value(value):
+    """Render a Python value as a field for COPY ... WITH (FORMAT csv, NULL '\\N')."""
+    if isinstance(value, (list, tuple, np.ndarray)):
+        items = ('"' + str(item).replace('\\', '\\\\').replace('"', '\\"') + '"' for item in value)
+        return '{' + ','.join(items) + '}'
+    if value is None or (not isinstance(value, str) and pd.isna(value)):
+        return '\\N'
+    if isinstance(value, (bool, np.bool_)):
+        return 't' if value else 'f'
+    return str(value)
+
+
+def _parse_images(images):
+    """Turns the raw 'images' field into a list of image URLs for the TEXT[] column."""
+    if isinstance(images, (list, np.ndarray)):
+        # JSONL dumps already hold a list of image dicts
+        urls = [img.get('large_image_url', '') for img in images if isinstance(img, dict)]
+        return [url for url in urls if url]
+    if not isinstance(images, str) or not images or images == '[]':
+        return []
+    try:
+        # Replace single quotes with double quotes for valid JSON
+        images_list = json.loads(images.replace("'", '"'))
+        # For TEXT[], we just store the URLs
+        urls = [img.get('large_image_url', '') for img in images_list if isinstance(img, dict)]
+        return [url for url in urls if url] # Filter out empty strings
+    except json.JSONDecodeError:
+        # If it's a single URL or malformed, return it in a list or handle as needed
+        if images.startswith('http'):
+            return [images]
+        logger.warning(f"Could not parse images string: {images[:100]}...")
+        return [] # Return empty list if parsing fails
+    except Exception as e:
+        logger.warning(f"Error processing images string: {images[:100]}... Error: {e}")
+        return []
+
+
+class AnalysisCache:
+    """
+    Classification results keyed by (model, model version, text hash), read and written through
+    the caller's cursor so they commit together with the reviews they were computed for.
+    A new model version simply misses, leaving the other models' entries in place.
+    """
+
+    def __init__(self, cursor):
+        self.cursor = cursor
+
+    def lookup(self, versions, hashes):
+        """Returns {model: {text_hash: result}} for the given model versions."""
+        results = {model: {} for model in versions}
+        if hashes:
+            self.cursor.execute("""
+                SELECT model, text_hash, result FROM analysis_cache
+                WHERE (model, version) IN %s AND text_hash = ANY(%s)
+            """, (tuple(versions.items()), [psycopg2.Binary(h) for h in hashes]))
+            for model, text_hash, result in self.cursor.fetchall():
+                results[model][bytes(text_hash)] = json.loads(result)
+        return results
+
+    def store(self, versions, results):
+        # Sorted so concurrent workers insert overlapping keys in the same order and cannot deadlock
+        rows = sorted((model, versions[model], text_hash, json.dumps(result))
+                      for model, items in results.items() for text_hash, result in items.items())
+        if rows:
+            execute_values(self.cursor, """
+                INSERT INTO analysis_cache (model, version, text_hash, result) VALUES %s
+                ON CONFLICT DO NOTHING
+            """, [(model, version, psycopg2.Binary(text_hash), result) for model, version, text_hash, result in rows],
+                page_size=len(rows))
+
+
+class BatchProcessingError(RuntimeError):
+    """A claimed batch failed after its rows were locked; ``last_review_id`` is the batch's last row."""
+
+    def __init__(self, last_review_id, error):
+        super().__init__(f"batch ending at review_id {last_review_id} failed: {error}")
+        self.last_review_id = last_review_id
+
+
+def _processing_worker(batch_size, torch_threads):
+    """Entry point of one processing worker process: own connection, own models."""
+    import torch
+    torch.set_num_threads(torch_threads)
+
+    client = PGClient()
+    try:
+        return client.process_and_update_reviews(workers=1, batch_size=batch_size)
+    finally:
+        client.close()
+
+
 class PGClient:
-    def __init__(self):
+    # Rows per COPY round trip
+    COPY_CHUNK_SIZE = 50000
+    # Side files for rows the bulk loader rejects
+    REJECT_DIR = Config.STATICS_PATH / 'rejected'
+    # Rows read from a review file per streaming chunk
+    INGEST_CHUNK_SIZE = 20000
+    # Reviews claimed and classified per transaction
+    PROCESS_BATCH_SIZE = 256
+    # Day bucket of a review, as used by the daily_review_stats rollup
+    REVIEW_DAY_SQL = "TO_TIMESTAMP({} / 1000)::date"
+    # Rollup bucket (sentiment, real_review) of reviews that are not classified yet. Their words
+    # are only counted in daily_word_totals, so classifying them never has to subtract any.
+    UNCLASSIFIED_BUCKET = ('', False)
+    # Key columns of the word rollups
+    WORD_ROLLUP_KEYS = {
+        'daily_word_totals': ('day', 'word'),
+        'daily_word_stats': ('day', 'sentiment', 'real_review', 'word'),
+    }
+    # (year, month) in UTC of a review, as used by the monthly partitions
+    REVIEW_MONTH_SQL = ("EXTRACT(YEAR FROM TO_TIMESTAMP(timestamp / 1000) AT TIME ZONE 'UTC')::int, "
+                        "EXTRACT(MONTH FROM TO_TIMESTAMP(timestamp / 1000) AT TIME ZONE 'UTC')::int")
+    # NOTIFY channel announcing committed changes to the review data
+    DATA_CHANGED_CHANNEL = 'review_data_changed'
+    # Advisory lock key that serializes migrate() across processes
+    MIGRATION_LOCK_ID = 8175_0001
+    # Versioned schema changes applied by migrate(), in order.
+    # Never edit an entry once released; append a new version instead.
+    MIGRATIONS = [
+        (1, 'beauty_reviews_timestamp_index', [
+            # Date-range filters on the epoch-ms timestamp
+            "CREATE INDEX IF NOT EXISTS beauty_reviews_timestamp_idx ON beauty_reviews (timestamp)",
+        ]),
+        (2, 'beauty_reviews_filter_index', [
+            # Dashboard filters: sentiment / real_review, then a date range
+            "CREATE INDEX IF NOT EXISTS beauty_reviews_filter_idx ON beauty_reviews (sentiment, real_review, timestamp)",
+        ]),
+        (3, 'beauty_reviews_unprocessed_index', [
+            # Only unprocessed rows, in the review_id order the processing workers claim them
+            "CREATE INDEX IF NOT EXISTS beauty_reviews_unprocessed_idx ON beauty_reviews (review_id) "
+            "WHERE sentiment = '' OR summary = '' OR real_review IS NULL",
+        ]),
+        (4, 'beauty_reviews_review_seq', [
+            # Insertion order, so the local vector index can sync incrementally
+            "ALTER TABLE beauty_reviews ADD COLUMN IF NOT EXISTS review_seq BIGSERIAL",
+            "CREATE INDEX IF NOT EXISTS beauty_reviews_seq_idx ON beauty_reviews (review_seq)",
+        ]),
+        (5, 'analysis_cache', [
+            # Classification results of already-seen texts, see AnalysisCache
+            """
+            CREATE TABLE IF NOT EXISTS analysis_cache (
+                model TEXT NOT NULL,
+                version TEXT NOT NULL,
+                text_hash BYTEA NOT NULL,
+                result TEXT NOT NULL,
+                PRIMARY KEY (model, version, text_hash)
+            )
+            """,
+        ]),
+    ]
+    # Raw review fields, in beauty_reviews column order
+    REVIEW_COLUMNS = [
+        'rating', 'title', 'text', 'images', 'asin', 'parent_asin',
+        'user_id', 'timestamp', 'verified_purchase', 'helpful_vote'
+    ]
+    # Expected CSV data types
+    REVIEW_DTYPES = {
+        'rating': float,
+        'title': str,
+        'text': str,
+        'images': str, # Keep as string initially for parsing
+        'asin': str,
+        'parent_asin': str,
+        'user_id': str,
+        'timestamp': 'Int64', # Use pandas Int64 for nullable integers
+        'verified_purchase': bool,
+        'helpful_vote': 'Int64' # Use pandas Int64 for nullable integers
+    }
+
+    # Seconds a caller waits for a free pooled connection before giving up
+    POOL_TIMEOUT = 30
+    # Pooled connections idle for longer than this are pinged before being handed out
+    HEALTH_CHECK_INTERVAL = 30
+
+    def __init__(self, pooled=False, minconn=1, maxconn=10):
+        """
+        Args:
+            pooled (bool): Serve connections from a thread-safe pool instead of one shared
+                connection. Use this from multi-threaded servers.
+            minconn (int): Connections the pool keeps open.
+            maxconn (int): Upper bound on concurrently checked-out connections.
+        """
         self.config = Config()
-        self.conn = psycopg2.connect(
+        self.pool = None
+        self.conn = None
+        if pooled:
+            self.pool = ThreadedConnectionPool(minconn, maxconn, **self._connect_kwargs())
+            self._pool_slots = threading.BoundedSemaphore(maxconn)
+            self._last_used = {}
+        else:
+            self.conn = psycopg2.connect(**self._connect_kwargs())
+        self.database_validation()
+
+    def _connect_kwargs(self, database=None):
+        return dict(
             host=self.config.postgresql['host'],
             port=self.config.postgresql['port'],
             user=self.config.postgresql['user'],
             password=self.config.postgresql['password'],
-            database=self.config.postgresql['database']
+            database=database or self.config.postgresql['database']
         )
-        self.database_validation()
 
-    def execute(self, query, params=None):
+    @contextmanager
+    def connection(self):
+        """
+        Checks out a connection for the duration of the ``with`` block.
+
+        In pooled mode every caller gets its own healthy connection, so one request's failure
+        cannot roll back another's transaction. Any transaction still open when the block exits
+        with an error is rolled back; callers commit their own work.
+        """
+        if self.pool is None:
+            # Check if connection is still valid, if not reconnect
+            if self.conn is None or self.conn.closed:
+                self.conn = psycopg2.connect(**self._connect_kwargs())
+            try:
+                yield self.conn
+            except Exception:
+                if not self.conn.closed:
+                    self.conn.rollback()
+                raise
+            return
+
+        conn = self._checkout()
+        try:
+            yield conn
+        except Exception:
+            if not conn.closed:
+                conn.rollback()
+            raise
+        finally:
+            self._checkin(conn)
+
+    def _checkout(self):
+        if not self._pool_slots.acquire(timeout=self.POOL_TIMEOUT):
+            raise PoolError(f'No database connection available within {self.POOL_TIMEOUT}s')
+        try:
+            conn = self.pool.getconn()
+            if not self._is_healthy(conn):
+                logger.warning('[PGClient] Discarding broken pooled connection and reconnecting')
+                self._last_used.pop(id(conn), None)
+                self.pool.putconn(conn, close=True)
+                conn = self.pool.getconn()
+            return conn
+        except Exception:
+            self._pool_slots.release()
+            raise
+
+    def _checkin(self, conn):
+        try:
+            if not conn.closed and conn.info.transaction_status != TRANSACTION_STATUS_IDLE:
+                conn.rollback()
+            self._last_used[id(conn)] = time.monotonic()
+            self.pool.putconn(conn, close=conn.closed)
+        finally:
+            self._pool_slots.release()
+
+    def _is_healthy(self, conn):
+        if conn.closed:
+            return False
+        if time.monotonic() - self._last_used.get(id(conn), 0) < self.HEALTH_CHECK_INTERVAL:
+            return True
         try:
-            with self.conn.cursor() as cursor:
+            with conn.cursor() as cursor:
+                cursor.execute('SELECT 1')
+            conn.rollback()
+            return True
+        except psycopg2.Error:
+            return False
+
+    def execute(self, query, params=None):
+        with self.connection() as conn:
+            with conn.cursor() as cursor:
                 cursor.execute(query, params)
                 # Check if the cursor has results to fetch
                 if cursor.description:
                     results = cursor.fetchall()
-                    self.conn.commit() # Commit after fetch if needed, though typically SELECT doesn't need commit
+                    conn.commit() # Commit after fetch if needed, though typically SELECT doesn't need commit
                     return results
                 else:
                     # For INSERT, UPDATE, DELETE, etc., commit the transaction
-                    self.conn.commit()
+                    conn.commit()
                     return None # Indicate no rows returned
-        except Exception as e:
-            # Rollback the transaction in case of any error
-            self.conn.rollback()
-            # Check if connection is still valid, if not reconnect
-            if self.conn.closed:
-                self.__init__()
-            # Re-raise the exception for the caller to handle
-            raise e
-
-    def insert_dataframe(self, table, df):
-        # Note: This row-by-row insert can be slow for large dataframes.
-        # Consider using psycopg2.extras.execute_values or COPY for bulk inserts.
-        with self.conn.cursor() as cursor:
-            columns = ', '.join(df.columns)
-            values_template = ', '.join(['%s'] * len(df.columns))
-            # Use sql.SQL for safe identifier quoting
-            query = sql.SQL("INSERT INTO {} ({}) VALUES ({}) ON CONFLICT (review_id) DO NOTHING").format(
-                sql.Identifier(table),
-                sql.SQL(', ').join(map(sql.Identifier, df.columns)),
-                sql.SQL(', ').join([sql.Placeholder()] * len(df.columns))
-            )
-            # Convert DataFrame rows to tuples for insertion
-            data_tuples = [tuple(x) for x in df.to_numpy()]
-            # Use execute_batch for potentially better performance than iterating
-            # Note: execute_batch might still be slower than execute_values or COPY
-            # psycopg2.extras.execute_batch(cursor, query, data_tuples)
-            # Fallback to row-by-row if execute_batch is not preferred or available in basic psycopg2
-            for row_tuple in data_tuples:
-                try:
-                    cursor.execute(query, row_tuple)
-                except Exception as e:
-                    logger.error(f"Error inserting row: {row_tuple}. Error: {e}")
-                    self.conn.rollback() # Rollback the specific failed row insert if desired, or handle differently
-                    # Optionally, continue to the next row or re-raise the exception
-                    continue
-            self.conn.commit()
-
-    def init_reviews(self, csv_files):
-        """Loads review data from a list of CSV files into the beauty_reviews table."""
-        logger.info(f"Starting review initialization from files: {csv_files}")
-        required_columns = [
-            'rating', 'title', 'text', 'images', 'asin', 'parent_asin',
-            'user_id', 'timestamp', 'verified_purchase', 'helpful_vote'
-        ]
-        # Define expected data types for conversion
-        dtype_map = {
-            'rating': float,
-            'title': str,
-            'text': str,
-            'images': str, # Keep as string initially for parsing
-            'asin': str,
-            'parent_asin': str,
-            'user_id': str,
-            'timestamp': 'Int64', # Use pandas Int64 for nullable integers
-            'verified_purchase': bool,
-            'helpful_vote': 'Int64' # Use pandas Int64 for nullable integers
-        }
 
-        for file_path in csv_files:
-            try:
-                logger.info(f"Processing file: {file_path}")
-                # Read CSV with specified dtypes, handle potential parsing errors
-                df = pd.read_csv(file_path, dtype=dtype_map, low_memory=False)
-
-                # Basic validation: Check if required columns exist
-                if not all(col in df.columns for col in required_columns):
-                    missing_cols = [col for col in required_columns if col not in df.columns]
-                    logger.error(f"File {file_path} is missing required columns: {missing_cols}. Skipping file.")
-                    continue
-
-                # Select and reorder columns to match the target table structure (optional but good practice)
-                df = df[required_columns].copy()
-
-                # Data Cleaning and Transformation
-                df.fillna({
-                    'title': '',
-                    'text': '',
-                    'images': '[]', # Default empty JSON array string for images
-                    'asin': '',
-                    'parent_asin': '',
-                    'user_id': '',
-                    'timestamp': 0, # Default timestamp if missing
-                    'helpful_vote': 0 # Default helpful_vote if missing
-                }, inplace=True)
-
-                # Convert boolean explicitly if needed (read_csv might handle it)
-                df['verified_purchase'] = df['verified_purchase'].astype(bool)
-
-                # Convert nullable integers to standard int, handling pd.NA
-                df['timestamp'] = df['timestamp'].fillna(0).astype(int)
-                df['helpful_vote'] = df['helpful_vote'].fillna(0).astype(int)
-
-                # Handle 'images' column: Convert string representation to list of strings (TEXT[])
-                def parse_images(image_str):
-                    if pd.isna(image_str) or not image_str or image_str == '[]':
-                        return []
+    def insert_dataframe(self, table, df, chunk_size=None, reject_path=None):
+        """
+        Bulk-loads a DataFrame into ``table``.
+
+        Rows are streamed with ``COPY FROM STDIN`` into a transaction-local staging table and then
+        moved over with a single ``INSERT ... SELECT ... ON CONFLICT DO NOTHING``. A chunk that
+        COPY rejects is bisected down to the offending rows, which are appended to
+        ``reject_path`` (JSON lines) instead of aborting the whole batch.
+
+        Returns:
+            tuple: (inserted_rows, rejected_rows)
+        """
+        if df.empty:
+            return 0, 0
+
+        chunk_size = chunk_size or self.COPY_CHUNK_SIZE
+        staging = f'{table}_staging'
+        columns = list(df.columns)
+        column_sql = sql.SQL(', ').join(map(sql.Identifier, columns))
+        copy_query = sql.SQL("COPY {} ({}) FROM STDIN WITH (FORMAT csv, NULL '\\N', ENCODING 'UTF8')").format(
+            sql.Identifier(staging), column_sql)
+        rejected = []
+        with self.connection() as conn:
+            with conn.cursor() as cursor:
+                # Only the loaded columns and no defaults: defaults (review_id, review_seq, ...) are
+                # evaluated once, by the final INSERT, so sequences advance once per stored row
+                cursor.execute(sql.SQL("CREATE TEMP TABLE {} ON COMMIT DROP AS SELECT {} FROM {} WITH NO DATA").format(
+                    sql.Identifier(staging), column_sql, sql.Identifier(table)))
+                copy_query = copy_query.as_string(cursor)
+
+                writer = csv.writer(_Echo(), lineterminator='\n')
+                lines = []
+                for row in df.itertuples(index=False, name=None):
                     try:
-                        # Replace single quotes with double quotes for valid JSON
-                        image_str = image_str.replace("'", '"')
-                        images_list = json.loads(image_str)
-                        # Extract 'large_image_url' or another relevant field if needed, otherwise keep the structure
-                        # For TEXT[], we might just store the URLs
-                        urls = [img.get('large_image_url', '') for img in images_list if isinstance(img, dict)]
-                        return [url for url in urls if url] # Filter out empty strings
-                    except json.JSONDecodeError:
-                        # Handle cases where the string is not valid JSON or not a list
-                        # If it's a single URL or malformed, return it in a list or handle as needed
-                        if image_str.startswith('http'):
-                             return [image_str]
-                        logger.warning(f"Could not parse images string: {image_str[:100]}...")
-                        return [] # Return empty list if parsing fails
+                        lines.append((row, writer.writerow([_copy_value(value) for value in row])))
                     except Exception as e:
-                         logger.warning(f"Error processing images string: {image_str[:100]}... Error: {e}")
-                         return []
+                        rejected.append((row, f'serialization failed: {e}'))
+                        continue
+                    if len(lines) >= chunk_size:
+                        self._copy_lines(cursor, copy_query, lines, rejected)
+                        lines = []
+                if lines:
+                    self._copy_lines(cursor, copy_query, lines, rejected)
+
+                if table == 'beauty_reviews' and self._reviews_partitioned(cursor):
+                    cursor.execute(sql.SQL(f"""
+                        SELECT DISTINCT {self.REVIEW_MONTH_SQL}
+                        FROM {{}} WHERE timestamp IS NOT NULL
+                    """).format(sql.Identifier(staging)))
+                    self._ensure_month_partitions(cursor, cursor.fetchall())
+
+                insert_query = sql.SQL("INSERT INTO {} ({}) SELECT {} FROM {} ON CONFLICT DO NOTHING").format(
+                    sql.Identifier(table), column_sql, column_sql, sql.Identifier(staging))
+                if table == 'beauty_reviews':
+                    # Fold the newly inserted rows into the daily rollup in the same statement,
+                    # and hand them back so their words can be counted
+                    cursor.execute(sql.SQL("""
+                        WITH inserted AS (
+                            {} RETURNING {} AS day, COALESCE(sentiment, '') AS sentiment,
+                                         COALESCE(real_review, FALSE) AS real_review, text
+                        ),
+                        rolled_up AS ({})
+                        SELECT day, sentiment, real_review, text FROM inserted
+                    """).format(insert_query, sql.SQL(self.REVIEW_DAY_SQL.format('timestamp')),
+                                sql.SQL(self._rollup_upsert_sql(
+                                    "SELECT day, sentiment, real_review, 1 FROM inserted"))))
+                    word_totals, word_deltas = Counter(), Counter()
+                    inserted = 0
+                    for day, sentiment, real_review, text in cursor:
+                        inserted += 1
+                        if text and day is not None:
+                            classified = (sentiment, real_review) != self.UNCLASSIFIED_BUCKET
+                            for word, count in count_words(text).items():
+                                word_totals[(day, word)] += count
+                                if classified:
+                                    word_deltas[(day, sentiment, real_review, word)] += count
+                    self._upsert_word_deltas(cursor, 'daily_word_totals', word_totals)
+                    self._upsert_word_deltas(cursor, 'daily_word_stats', word_deltas)
+                    # Delivered on commit
+                    cursor.execute(f"NOTIFY {self.DATA_CHANGED_CHANNEL}")
+                else:
+                    cursor.execute(insert_query)
+                    inserted = cursor.rowcount
+            conn.commit()
+
+        if rejected:
+            self._write_rejects(table, columns, rejected, reject_path)
+
+        return inserted, len(rejected)
+
+    def _copy_lines(self, cursor, copy_query, lines, rejected):
+        """COPY a list of (row, csv_line) pairs, bisecting on failure to isolate bad rows."""
+        cursor.execute("SAVEPOINT bulk_copy")
+        try:
+            cursor.copy_expert(copy_query, io.BytesIO(''.join(line for _, line in lines).encode('utf-8')))
+            cursor.execute("RELEASE SAVEPOINT bulk_copy")
+            return
+        except psycopg2.Error as e:
+            cursor.execute("ROLLBACK TO SAVEPOINT bulk_copy")
+            cursor.execute("RELEASE SAVEPOINT bulk_copy")
+            if len(lines) == 1:
+                rejected.append((lines[0][0], str(e).strip()))
+                return
 
-                df['images'] = df['images'].apply(parse_images)
+        mid = len(lines) // 2
+        self._copy_lines(cursor, copy_query, lines[:mid], rejected)
+        self._copy_lines(cursor, copy_query, lines[mid:], rejected)
 
-                # Add default columns if they don't exist
-                df['real_review'] = False
-                df['sentiment'] = ''
-                df['summary'] = ''
+    def _write_rejects(self, table, columns, rejected, reject_path=None):
+        reject_path = reject_path or os.path.join(self.REJECT_DIR, f'{table}.jsonl')
+        os.makedirs(os.path.dirname(reject_path), exist_ok=True)
+        with open(reject_path, 'a', encoding='utf-8') as f:
+            for row, error in rejected:
+                record = {'table': table, 'error': error, 'row': dict(zip(columns, row))}
+                f.write(json.dumps(record, default=str, ensure_ascii=False) + '\n')
+        logger.warning(f"{len(rejected)} rows rejected while loading {table}, written to {reject_path}")
 
-                # Ensure columns match the table definition order if necessary before insert
-                # Example: df = df[['review_id', 'rating', ...]] # Assuming review_id is generated by DB
+    def iter_review_chunks(self, file_path, chunk_size=None):
+        """
+        Yields fixed-size DataFrame chunks from a review dump.
 
-                logger.info(f"Inserting {len(df)} rows from {file_path} into beauty_reviews table.")
-                self.insert_dataframe('beauty_reviews', df)
-                logger.info(f"Finished inserting data from {file_path}.")
+        ``.csv`` files are read with ``pd.read_csv(chunksize=...)``; ``.jsonl`` files (the raw
+        Amazon dumps) are read directly with ``pd.read_json(lines=True, chunksize=...)``, so no
+        ``jsonl2csv.py`` round trip is needed. Only one chunk is held in memory at a time.
+        """
+        chunk_size = chunk_size or self.INGEST_CHUNK_SIZE
+        if str(file_path).endswith('.jsonl'):
+            # Keep raw values: pandas would otherwise turn the epoch-ms 'timestamp' column into datetimes
+            reader = pd.read_json(file_path, lines=True, chunksize=chunk_size, dtype=False,
+                                  convert_dates=False, keep_default_dates=False)
+        else:
+            reader = pd.read_csv(file_path, dtype=self.REVIEW_DTYPES, chunksize=chunk_size)
+
+        with reader:
+            for chunk in reader:
+                yield chunk
+
+    def _prepare_review_chunk(self, df):
+        """Cleans one raw review chunk in place and returns it in beauty_reviews column order."""
+        # Data Cleaning and Transformation
+        df.fillna({
+            'title': '',
+            'text': '',
+            'asin': '',
+            'parent_asin': '',
+            'user_id': '',
+            'timestamp': 0, # Default timestamp if missing
+            'helpful_vote': 0 # Default helpful_vote if missing
+        }, inplace=True)
+
+        # Convert boolean explicitly if needed (read_csv might handle it)
+        df['verified_purchase'] = df['verified_purchase'].astype(bool)
+
+        # Convert nullable integers to standard int, handling pd.NA
+        df['timestamp'] = df['timestamp'].astype('int64')
+        df['helpful_vote'] = df['helpful_vote'].astype('int64')
+
+        # Handle 'images' column: CSV holds a string representation, JSONL an actual list (TEXT[])
+        df['images'] = df['images'].map(_parse_images)
+
+        # Add default columns if they don't exist
+        df['real_review'] = False
+        df['sentiment'] = ''
+        df['summary'] = ''
+
+        return df[self.REVIEW_COLUMNS + ['real_review', 'sentiment', 'summary']]
+
+    def init_reviews(self, csv_files, chunk_size=None):
+        """
+        Loads review data from a list of CSV or JSONL files into the beauty_reviews table.
+
+        Each file is streamed in chunks of ``chunk_size`` rows and every chunk goes straight into
+        the bulk loader, so peak memory does not depend on the file size.
+        """
+        logger.info(f"Starting review initialization from files: {csv_files}")
+
+        for file_path in csv_files:
+            try:
+                logger.info(f"Processing file: {file_path}")
+                inserted, rejected = 0, 0
+                for index, chunk in enumerate(self.iter_review_chunks(file_path, chunk_size)):
+                    # Basic validation: Check if required columns exist
+                    missing_cols = [col for col in self.REVIEW_COLUMNS if col not in chunk.columns]
+                    if missing_cols:
+                        logger.error(f"File {file_path} is missing required columns: {missing_cols}. Skipping file.")
+                        break
+
+                    chunk = self._prepare_review_chunk(chunk)
+                    chunk_inserted, chunk_rejected = self.insert_dataframe('beauty_reviews', chunk)
+                    inserted += chunk_inserted
+                    rejected += chunk_rejected
+                    logger.info(f"Chunk {index} of {file_path}: {chunk_inserted} inserted, {chunk_rejected} rejected.")
+
+                logger.info(f"Finished inserting data from {file_path}: {inserted} inserted, {rejected} rejected.")
 
             except FileNotFoundError:
                 logger.error(f"File not found: {file_path}. Skipping.")
@@ -171,74 +516,412 @@ class PGClient:
 
         logger.info("Review initialization process completed.")
 
-    def process_and_update_reviews(self):
-        """Fetches reviews, processes text using TextAnalysis, and updates the table."""
+    def claim_and_process_batch(self, text_analyzer, batch_size=None, after_id=None):
+        """
+        Claims one batch of unprocessed reviews, classifies it and writes the results back.
+
+        Rows are locked with ``FOR UPDATE SKIP LOCKED`` inside a single transaction, so concurrent
+        workers never pick the same rows, and a crash simply releases the locks and leaves the rows
+        unprocessed for the next run. Results go back in one ``UPDATE ... FROM (VALUES ...)`` joined
+        on (review_id, timestamp), so a partitioned beauty_reviews only probes the partitions the
+        batch lives in. The batch is walked in review_id order starting after ``after_id``.
+
+        Returns:
+            tuple: (rows_processed, last_review_id) — last_review_id is None when nothing is left.
+
+        Raises:
+            BatchProcessingError: the batch failed after it was claimed; carries its last review_id
+                so the caller can move past exactly this batch.
+        """
+        batch_size = batch_size or self.PROCESS_BATCH_SIZE
+        claim_query = """
+            SELECT review_id, timestamp, COALESCE(sentiment, ''), COALESCE(real_review, FALSE), text
+            FROM beauty_reviews
+            WHERE (sentiment = '' OR summary = '' OR real_review IS NULL)
+              AND COALESCE(text, '') <> ''
+              AND (%s::uuid IS NULL OR review_id > %s::uuid)
+            ORDER BY review_id
+            LIMIT %s
+            FOR UPDATE SKIP LOCKED
+        """
+        # Rolling back on error releases the row locks; the batch stays unprocessed
+        with self.connection() as conn:
+            with conn.cursor() as cursor:
+                cursor.execute(claim_query, (after_id, after_id, batch_size))
+                rows = cursor.fetchall()
+                if not rows:
+                    conn.commit()
+                    return 0, None
+
+                review_ids = [str(row[0]) for row in rows]
+                try:
+                    texts = dict(zip(review_ids, (row[-1] for row in rows)))
+                    sentiments, is_reals, summaries = text_analyzer.batch_process([row[-1] for row in rows],
+                                                                                  cache=AnalysisCache(cursor))
+                    values = [
+                        # Map is_real (int 0 or 1) to real_review (boolean); the claimed timestamp and
+                        # bucket stay valid because the rows are locked
+                        (review_id, timestamp, old_sentiment, old_real_review, sentiment, bool(is_real), summary)
+                        for review_id, (_, timestamp, old_sentiment, old_real_review, _), sentiment, is_real, summary
+                        in zip(review_ids, rows, sentiments, is_reals, summaries)
+                    ]
+                    # Move each row from its old rollup bucket to its new one in the same statement.
+                    # Matching the partition key lets Postgres skip the partitions the batch is not in;
+                    # rows without a timestamp all live in the default partition.
+                    moved = execute_values(cursor, f"""
+                        WITH updated AS (
+                            UPDATE beauty_reviews AS r
+                            SET sentiment = v.sentiment, real_review = v.real_review, summary = v.summary
+                            FROM (VALUES %s) AS v(review_id, timestamp, old_sentiment, old_real_review,
+                                                   sentiment, real_review, summary)
+                            WHERE r.review_id = v.review_id::uuid
+                              AND (r.timestamp = v.timestamp::bigint OR r.timestamp IS NULL AND v.timestamp IS NULL)
+                            RETURNING r.review_id::text, {self.REVIEW_DAY_SQL.format('r.timestamp')} AS day,
+                                      v.old_sentiment, v.old_real_review, r.sentiment, r.real_review
+                        ),
+                        rolled_up AS ({self._rollup_upsert_sql(
+                            "SELECT day, old_sentiment, old_real_review, -1 FROM updated "
+                            "UNION ALL SELECT day, sentiment, real_review, 1 FROM updated")})
+                        SELECT * FROM updated
+                    """, values, page_size=len(values), fetch=True)
+
+                    # Same move for the review's word counts; daily_word_totals does not change, and
+                    # unclassified reviews (nearly every old bucket) have nothing to subtract
+                    word_deltas = Counter()
+                    for review_id, day, old_sentiment, old_real_review, sentiment, real_review in moved:
+                        old, new = (old_sentiment, old_real_review), (sentiment, real_review)
+                        if day is None or old == new:
+                            continue
+                        for word, count in count_words(texts[review_id]).items():
+                            if old != self.UNCLASSIFIED_BUCKET:
+                                word_deltas[(day, *old, word)] -= count
+                            if new != self.UNCLASSIFIED_BUCKET:
+                                word_deltas[(day, *new, word)] += count
+                    self._upsert_word_deltas(cursor, 'daily_word_stats', word_deltas)
+                    cursor.execute(f"NOTIFY {self.DATA_CHANGED_CHANNEL}")
+                    conn.commit()
+                except Exception as e:
+                    raise BatchProcessingError(review_ids[-1], e) from e
+            return len(rows), review_ids[-1]
+
+    def process_and_update_reviews(self, workers=1, batch_size=None):
+        """
+        Classifies every unprocessed review and updates the table.
+
+        With ``workers > 1`` the work fans out over that many processes, each holding its own
+        connection and models and claiming batches independently. Several run_processing.py
+        processes can safely run at the same time, and an interrupted run resumes where it left off.
+        """
+        if workers > 1:
+            logger.info(f"Starting review text processing with {workers} worker processes.")
+            torch_threads = max(1, (os.cpu_count() or 1) // workers)
+            ctx = mp.get_context('spawn')
+            with ctx.Pool(workers) as pool:
+                counts = pool.starmap(_processing_worker, [(batch_size, torch_threads)] * workers)
+            logger.info(f"Finished processing and updating {sum(counts)} reviews.")
+            return sum(counts)
+
         try:
             from system_code.core.text_analysis import TextAnalysis # Import here to avoid circular dependency if TextAnalysis uses PGClient
             text_analyzer = TextAnalysis()
-            logger.info("Starting review text processing and update.")
-
-            with self.conn.cursor() as cursor:
-                # Fetch review_id and text for processing
-                # Assuming 'review_id' is the primary key or a unique identifier
-                # Adjust column names if they are different
-                cursor.execute("SELECT review_id, text FROM beauty_reviews WHERE sentiment = '' OR summary = '' OR real_review IS NULL") # Process only unprocessed rows
-                reviews_to_process = cursor.fetchall()
-                total_reviews = len(reviews_to_process)
-
-                processed_count = 0
-                for review_id, text in tqdm(reviews_to_process, desc=f"Processing reviews, total {total_reviews}"):
-                    try:
-                        if not text: # Skip if text is empty or null
-                            logger.warning(f"Skipping review_id {review_id} due to empty text.")
+        except ImportError as e:
+            logger.error(f"Failed to import TextAnalysis: {e}. Make sure system_code.core is in the Python path.")
+            return 0
+
+        self.prune_analysis_cache(text_analyzer.model_versions)
+        logger.info("Starting review text processing and update.")
+        processed_count, after_id = 0, None
+        with tqdm(desc=f"Processing reviews (pid {os.getpid()})") as progress:
+            while True:
+                try:
+                    count, last_id = self.claim_and_process_batch(text_analyzer, batch_size, after_id)
+                except BatchProcessingError as e:
+                    # Skip past the failing batch so one bad batch cannot stall the run
+                    logger.error(f"Error processing batch after review_id {after_id}: {e}")
+                    count, last_id = 0, e.last_review_id
+                except Exception as e:
+                    # Nothing was claimed (e.g. the database went away): stop, the next run resumes here
+                    logger.error(f"Error claiming batch after review_id {after_id}, stopping: {e}")
+                    break
+                if last_id is None:
+                    break
+                after_id = last_id
+                processed_count += count
+                progress.update(count)
+
+        logger.info(f"Finished processing and updating {processed_count} reviews.")
+        return processed_count
+
+    def prune_analysis_cache(self, versions):
+        """Drops cached results of model versions other than ``versions`` ({model: version})."""
+        with self.connection() as conn:
+            with conn.cursor() as cursor:
+                for model, version in versions.items():
+                    cursor.execute("DELETE FROM analysis_cache WHERE model = %s AND version <> %s", (model, version))
+                    if cursor.rowcount:
+                        logger.info(f"Dropped {cursor.rowcount} cached {model} results of older model versions")
+            conn.commit()
+
+    def _rollup_upsert_sql(self, deltas_sql):
+        """
+        Builds an upsert that adds ``deltas_sql`` rows (day, sentiment, real_review, delta) into
+        daily_review_stats. Keys are applied in a fixed order so concurrent writers cannot deadlock.
+        """
+        return f"""
+            INSERT INTO daily_review_stats (day, sentiment, real_review, review_count)
+            SELECT day, sentiment, real_review, SUM(delta)
+            FROM ({deltas_sql}) AS deltas(day, sentiment, real_review, delta)
+            WHERE day IS NOT NULL
+            GROUP BY day, sentiment, real_review
+            HAVING SUM(delta) <> 0
+            ORDER BY day, sentiment, real_review
+            ON CONFLICT (day, sentiment, real_review)
+            DO UPDATE SET review_count = daily_review_stats.review_count + EXCLUDED.review_count
+        """
+
+    def _upsert_word_deltas(self, cursor, table, word_deltas):
+        """
+        Adds {key: delta} into the word rollup ``table``, keyed by its WORD_ROLLUP_KEYS.
+
+        Deltas are COPYed into a session-local staging table and merged with one set-based upsert,
+        applied in key order so concurrent writers cannot deadlock.
+        """
+        if not word_deltas:
+            return
+        buffer = io.StringIO()
+        writer = csv.writer(buffer, lineterminator='\n')
+        for key, delta in word_deltas.items():
+            if delta:
+                writer.writerow([_copy_value(value) for value in key] + [delta])
+
+        keys = sql.SQL(', ').join(map(sql.Identifier, self.WORD_ROLLUP_KEYS[table]))
+        staging = sql.Identifier(f'{table}_staging')
+        cursor.execute(sql.SQL("CREATE TEMP TABLE IF NOT EXISTS {} (LIKE {} INCLUDING DEFAULTS)").format(
+            staging, sql.Identifier(table)))
+        cursor.execute(sql.SQL("TRUNCATE {}").format(staging))
+        cursor.copy_expert(sql.SQL("COPY {} FROM STDIN WITH (FORMAT csv, NULL '\\N', ENCODING 'UTF8')").format(
+            staging).as_string(cursor), io.BytesIO(buffer.getvalue().encode('utf-8')))
+        cursor.execute(sql.SQL("""
+            INSERT INTO {table} ({keys}, word_count)
+            SELECT {keys}, word_count
+            FROM {staging}
+            ORDER BY {keys}
+            ON CONFLICT ({keys})
+            DO UPDATE SET word_count = {table}.word_count + EXCLUDED.word_count
+        """).format(table=sql.Identifier(table), keys=keys, staging=staging))
+        cursor.execute(sql.SQL("TRUNCATE {}").format(staging))
+
+    def refresh_daily_word_stats(self, chunk_size=None):
+        """
+        Rebuilds the word rollups (daily_word_totals and daily_word_stats) from scratch, streaming
+        reviews through a server-side cursor.
+        """
+        chunk_size = chunk_size or self.INGEST_CHUNK_SIZE
+        with self.connection() as conn:
+            with conn.cursor() as cursor, conn.cursor(name='word_stats_rebuild') as reviews:
+                cursor.execute("LOCK TABLE beauty_reviews IN SHARE MODE")
+                cursor.execute("TRUNCATE daily_word_totals, daily_word_stats")
+                reviews.itersize = chunk_size
+                reviews.execute(f"""
+                    SELECT {self.REVIEW_DAY_SQL.format('timestamp')}, COALESCE(sentiment, ''),
+                           COALESCE(real_review, FALSE), text
+                    FROM beauty_reviews
+                    WHERE COALESCE(text, '') <> '' AND timestamp IS NOT NULL
+                """)
+                word_totals, word_deltas = Counter(), Counter()
+                for index, (day, sentiment, real_review, text) in enumerate(reviews, 1):
+                    classified = (sentiment, real_review) != self.UNCLASSIFIED_BUCKET
+                    for word, count in count_words(text).items():
+                        word_totals[(day, word)] += count
+                        if classified:
+                            word_deltas[(day, sentiment, real_review, word)] += count
+                    # Flush periodically so memory stays bounded; upserts add up
+                    if index % chunk_size == 0:
+                        self._upsert_word_deltas(cursor, 'daily_word_totals', word_totals)
+                        self._upsert_word_deltas(cursor, 'daily_word_stats', word_deltas)
+                        word_totals, word_deltas = Counter(), Counter()
+                self._upsert_word_deltas(cursor, 'daily_word_totals', word_totals)
+                self._upsert_word_deltas(cursor, 'daily_word_stats', word_deltas)
+                cursor.execute(f"NOTIFY {self.DATA_CHANGED_CHANNEL}")
+            conn.commit()
+        logger.info('[PGClient] daily_word_totals and daily_word_stats rebuilt')
+
+    def refresh_daily_review_stats(self):
+        """Rebuilds the daily_review_stats rollup from scratch out of beauty_reviews."""
+        with self.connection() as conn:
+            with conn.cursor() as cursor:
+                # Block concurrent writers so no increment lands between the truncate and the rebuild
+                cursor.execute("LOCK TABLE beauty_reviews IN SHARE MODE")
+                cursor.execute("TRUNCATE daily_review_stats")
+                cursor.execute(f"""
+                    INSERT INTO daily_review_stats (day, sentiment, real_review, review_count)
+                    SELECT {self.REVIEW_DAY_SQL.format('timestamp')}, COALESCE(sentiment, ''), COALESCE(real_review, FALSE), COUNT(*)
+                    FROM beauty_reviews
+                    WHERE timestamp IS NOT NULL
+                    GROUP BY 1, 2, 3
+                """)
+                cursor.execute(f"NOTIFY {self.DATA_CHANGED_CHANNEL}")
+            conn.commit()
+        logger.info('[PGClient] daily_review_stats rebuilt')
+
+    @contextmanager
+    def _schema_lock(self):
+        """Holds a session-level advisory lock on one connection for schema changes."""
+        with self.connection() as conn:
+            with conn.cursor() as cursor:
+                cursor.execute("SELECT pg_advisory_lock(%s)", (self.MIGRATION_LOCK_ID,))
+                conn.commit()
+                try:
+                    yield conn, cursor
+                finally:
+                    conn.rollback()
+                    cursor.execute("SELECT pg_advisory_unlock(%s)", (self.MIGRATION_LOCK_ID,))
+                    conn.commit()
+
+    def watch_data_changes(self, callback):
+        """
+        Calls ``callback()`` from a daemon thread every time ingest, processing or a rollup rebuild
+        commits changes to the review data (any process, via LISTEN/NOTIFY). The callback also runs
+        after every (re)connect, since notifications sent while disconnected are lost.
+        """
+        def listen():
+            while True:
+                conn = None
+                try:
+                    conn = psycopg2.connect(**self._connect_kwargs())
+                    conn.set_isolation_level(ISOLATION_LEVEL_AUTOCOMMIT)
+                    with conn.cursor() as cursor:
+                        cursor.execute(f"LISTEN {self.DATA_CHANGED_CHANNEL}")
+                    callback()
+                    while True:
+                        if select.select([conn], [], [], 60) == ([], [], []):
                             continue
+                        conn.poll()
+                        if conn.notifies:
+                            conn.notifies.clear()
+                            callback()
+                except Exception as e:
+                    logger.warning(f'[PGClient] Data change listener failed, retrying: {e}')
+                    time.sleep(5)
+                finally:
+                    if conn is not None and not conn.closed:
+                        conn.close()
 
-                        # Process the text
-                        sentiment, is_real, summary = text_analyzer.single_process(text)
-                        # Map is_real (int 0 or 1) to real_review (boolean)
-                        real_review = bool(is_real)
-
-                        # Update the database record
-                        update_query = sql.SQL("""
-                            UPDATE beauty_reviews
-                            SET sentiment = %s, real_review = %s, summary = %s
-                            WHERE review_id = %s
-                        """)
-                        cursor.execute(update_query, (sentiment, real_review, summary, review_id))
-                        processed_count += 1
-                        if processed_count % 100 == 0: # Log progress every 100 reviews
-                            logger.info(f"Processed {processed_count}/{total_reviews} reviews...")
-                            self.conn.commit() # Commit periodically
+        thread = threading.Thread(target=listen, name='pg-data-changes', daemon=True)
+        thread.start()
+        return thread
 
-                    except Exception as e:
-                        logger.error(f"Error processing review_id {review_id}: {e}")
-                        self.conn.rollback() # Rollback the transaction for this review
-                        # Optionally re-raise or continue
-                        continue
+    def migrate(self):
+        """
+        Applies pending MIGRATIONS in version order and records them in schema_migrations.
 
-                self.conn.commit() # Final commit
-                logger.info(f"Finished processing and updating {processed_count} reviews.")
+        Each migration commits on its own. An advisory lock serializes concurrent callers,
+        so several processes starting at once apply every migration exactly once.
+        """
+        with self._schema_lock() as (conn, cursor):
+            self._apply_migrations(conn, cursor)
 
-        except ImportError as e:
-             logger.error(f"Failed to import TextAnalysis: {e}. Make sure system_code.core is in the Python path.")
-        except Exception as e:
-            logger.error(f"An error occurred during review processing: {e}")
-            self.conn.rollback() # Rollback any pending changes if a major error occurs
+    def _apply_migrations(self, conn, cursor):
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS schema_migrations (
+                version INTEGER PRIMARY KEY,
+                name TEXT NOT NULL,
+                applied_at TIMESTAMPTZ NOT NULL DEFAULT now()
+            )
+        ''')
+        cursor.execute("SELECT version FROM schema_migrations")
+        applied = {row[0] for row in cursor.fetchall()}
+        conn.commit()
+        for version, name, statements in self.MIGRATIONS:
+            if version in applied:
+                continue
+            logger.info(f'[PGClient] Applying migration {version}: {name}')
+            for statement in statements:
+                cursor.execute(statement)
+            cursor.execute("INSERT INTO schema_migrations (version, name) VALUES (%s, %s)", (version, name))
+            conn.commit()
+
+    def _reviews_partitioned(self, cursor):
+        cursor.execute("SELECT relkind = 'p' FROM pg_class WHERE oid = 'beauty_reviews'::regclass")
+        return cursor.fetchone()[0]
+
+    def _ensure_month_partitions(self, cursor, months):
+        """Creates the beauty_reviews partition for each (year, month) that does not have one yet."""
+        for year, month in sorted(months):
+            lower = datetime(year, month, 1, tzinfo=timezone.utc)
+            upper = datetime(year + month // 12, month % 12 + 1, 1, tzinfo=timezone.utc)
+            cursor.execute(sql.SQL("""
+                CREATE TABLE IF NOT EXISTS {} PARTITION OF beauty_reviews
+                FOR VALUES FROM (%s) TO (%s)
+            """).format(sql.Identifier(f'beauty_reviews_y{year:04d}m{month:02d}')),
+                (int(lower.timestamp() * 1000), int(upper.timestamp() * 1000)))
+
+    def partition_reviews_by_month(self):
+        """
+        Converts beauty_reviews into a table range-partitioned by month (UTC) on ``timestamp``,
+        so date-range queries only touch the relevant partitions.
+
+        Existing rows are copied over in one transaction while writers are locked out. Afterwards,
+        ingest creates the partition for a new month before inserting into it; rows without a
+        timestamp land in beauty_reviews_default. The primary key becomes (review_id, timestamp)
+        because Postgres requires unique constraints on partitioned tables to include the key.
+        """
+        with self.connection() as conn:
+            with conn.cursor() as cursor:
+                if self._reviews_partitioned(cursor):
+                    logger.info('[PGClient] beauty_reviews is already partitioned')
+                    return
+
+                cursor.execute("LOCK TABLE beauty_reviews IN ACCESS EXCLUSIVE MODE")
+                cursor.execute('''
+                    CREATE TABLE beauty_reviews_partitioned (
+                        LIKE beauty_reviews INCLUDING DEFAULTS,
+                        UNIQUE (review_id, timestamp)
+                    ) PARTITION BY RANGE (timestamp)
+                ''')
+                cursor.execute("CREATE TABLE beauty_reviews_default PARTITION OF beauty_reviews_partitioned DEFAULT")
+                cursor.execute("ALTER TABLE beauty_reviews RENAME TO beauty_reviews_unpartitioned")
+                cursor.execute("ALTER TABLE beauty_reviews_partitioned RENAME TO beauty_reviews")
+
+                cursor.execute(f"""
+                    SELECT DISTINCT {self.REVIEW_MONTH_SQL}
+                    FROM beauty_reviews_unpartitioned WHERE timestamp IS NOT NULL
+                """)
+                self._ensure_month_partitions(cursor, cursor.fetchall())
+                cursor.execute("INSERT INTO beauty_reviews SELECT * FROM beauty_reviews_unpartitioned")
+
+                # Serial columns: the copied defaults still use the old table's sequences, so hand them over
+                cursor.execute("""
+                    SELECT seq.relname, col.attname
+                    FROM pg_depend dep
+                    JOIN pg_class seq ON seq.oid = dep.objid AND seq.relkind = 'S'
+                    JOIN pg_attribute col ON col.attrelid = dep.refobjid AND col.attnum = dep.refobjsubid
+                    WHERE dep.refobjid = 'beauty_reviews_unpartitioned'::regclass AND dep.deptype = 'a'
+                """)
+                for sequence, column in cursor.fetchall():
+                    cursor.execute(sql.SQL("ALTER SEQUENCE {} OWNED BY beauty_reviews.{}").format(
+                        sql.Identifier(sequence), sql.Identifier(column)))
+                cursor.execute("DROP TABLE beauty_reviews_unpartitioned")
+
+                # Index names are free again now that the old table is gone
+                for _, _, statements in self.MIGRATIONS:
+                    for statement in statements:
+                        if 'ON beauty_reviews ' in statement:
+                            cursor.execute(statement)
+            conn.commit()
+        logger.info('[PGClient] beauty_reviews partitioned by month')
 
     def close(self):
-        self.conn.close()
+        if self.pool is not None:
+            self.pool.closeall()
+        elif self.conn is not None:
+            self.conn.close()
 
     def database_validation(self):
         db_name = self.config.postgresql['database']
         try:
             # Connect to the default 'postgres' database to check existence/create the target database
-            conn_postgres = psycopg2.connect(
-                host=self.config.postgresql['host'],
-                user=self.config.postgresql['user'],
-                password=self.config.postgresql['password'],
-                port=self.config.postgresql['port'],
-                database='postgres'
-            )
+            conn_postgres = psycopg2.connect(**self._connect_kwargs(database='postgres'))
             conn_postgres.set_isolation_level(ISOLATION_LEVEL_AUTOCOMMIT)
 
             with conn_postgres.cursor() as cursor:
@@ -257,41 +940,79 @@ class PGClient:
 
             # Now connect to the target database (self.conn should be connected here from __init__)
             # Ensure self.conn is connected to the correct database
-            if self.conn.closed or self.conn.info.dbname != db_name:
+            if self.pool is None and (self.conn.closed or self.conn.info.dbname != db_name):
                 if not self.conn.closed:
                     self.conn.close()
-                self.conn = psycopg2.connect(
-                    host=self.config.postgresql['host'],
-                    port=self.config.postgresql['port'],
-                    user=self.config.postgresql['user'],
-                    password=self.config.postgresql['password'],
-                    database=db_name
-                )
-
-            # Create table if not exists in the target database
-            self.execute('''
-                CREATE TABLE IF NOT EXISTS beauty_reviews (
-                    review_id UUID PRIMARY KEY DEFAULT gen_random_uuid(),
-                    rating FLOAT,
-                    title TEXT,
-                    text TEXT,
-                    images TEXT[],
-                    asin TEXT,
-                    parent_asin TEXT,
-                    user_id TEXT,
-                    timestamp BIGINT,
-                    verified_purchase BOOLEAN,
-                    helpful_vote INTEGER,
-                    real_review BOOLEAN DEFAULT FALSE,
-                    sentiment TEXT DEFAULT '',
-                    summary TEXT DEFAULT ''
-                )
-            ''')
+                self.conn = psycopg2.connect(**self._connect_kwargs(database=db_name))
+
+            # Serialize schema setup so concurrent startups do not race on CREATE TABLE
+            with self._schema_lock() as (conn, cursor):
+                # Create table if not exists in the target database
+                cursor.execute('''
+                    CREATE TABLE IF NOT EXISTS beauty_reviews (
+                        review_id UUID PRIMARY KEY DEFAULT gen_random_uuid(),
+                        rating FLOAT,
+                        title TEXT,
+                        text TEXT,
+                        images TEXT[],
+                        asin TEXT,
+                        parent_asin TEXT,
+                        user_id TEXT,
+                        timestamp BIGINT,
+                        verified_purchase BOOLEAN,
+                        helpful_vote INTEGER,
+                        real_review BOOLEAN DEFAULT FALSE,
+                        sentiment TEXT DEFAULT '',
+                        summary TEXT DEFAULT ''
+                    )
+                ''')
+                # Per-day review counts the dashboard reads instead of scanning beauty_reviews
+                cursor.execute("SELECT to_regclass('daily_review_stats') IS NULL")
+                created = cursor.fetchone()[0]
+                cursor.execute('''
+                    CREATE TABLE IF NOT EXISTS daily_review_stats (
+                        day DATE NOT NULL,
+                        sentiment TEXT NOT NULL,
+                        real_review BOOLEAN NOT NULL,
+                        review_count BIGINT NOT NULL DEFAULT 0,
+                        PRIMARY KEY (day, sentiment, real_review)
+                    )
+                ''')
+                # Per-day word counts behind the dashboard wordcloud: totals over every review, and
+                # per (sentiment, real_review) bucket for the classified ones (see UNCLASSIFIED_BUCKET)
+                cursor.execute("SELECT to_regclass('daily_word_totals') IS NULL")
+                words_created = cursor.fetchone()[0]
+                cursor.execute('''
+                    CREATE TABLE IF NOT EXISTS daily_word_totals (
+                        day DATE NOT NULL,
+                        word TEXT NOT NULL,
+                        word_count BIGINT NOT NULL DEFAULT 0,
+                        PRIMARY KEY (day, word)
+                    )
+                ''')
+                cursor.execute('''
+                    CREATE TABLE IF NOT EXISTS daily_word_stats (
+                        day DATE NOT NULL,
+                        sentiment TEXT NOT NULL,
+                        real_review BOOLEAN NOT NULL,
+                        word TEXT NOT NULL,
+                        word_count BIGINT NOT NULL DEFAULT 0,
+                        PRIMARY KEY (day, sentiment, real_review, word)
+                    )
+                ''')
+                cursor.execute('SELECT EXISTS (SELECT 1 FROM beauty_reviews)')
+                has_reviews = cursor.fetchone()[0]
+                conn.commit()
+                if has_reviews and created:
+                    self.refresh_daily_review_stats()
+                if has_reviews and words_created:
+                    self.refresh_daily_word_stats()
+                self._apply_migrations(conn, cursor)
             logger.info('[PGClient] Table validation completed')
         except Exception as e:
             logger.error(f'Database validation failed: {str(e)}')
             # Attempt to close the main connection if it was opened and an error occurred
-            if hasattr(self, 'conn') and not self.conn.closed:
+            if self.conn is not None and not self.conn.closed:
                 self.conn.close()
 
 
@@ -1,6 +1,7 @@
 # -*- coding: utf-8 -*-
 import sys
 import os
+import argparse
 
 # Add project root to Python path to allow imports like system_code.server.database
 project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..'))
@@ -11,12 +12,17 @@ from system_code.core.config import logger
 
 def main():
     """Initializes PGClient, runs the review processing, and closes the connection."""
+    parser = argparse.ArgumentParser(description="Classify unprocessed reviews and write the results back.")
+    parser.add_argument('--workers', type=int, default=1, help="Number of worker processes")
+    parser.add_argument('--batch-size', type=int, default=None, help="Reviews claimed per transaction")
+    args = parser.parse_args()
+
     pg_client = None # Initialize to None
     try:
         logger.info("Initializing database client...")
         pg_client = PGClient()
         logger.info("Starting review processing...")
-        pg_client.process_and_update_reviews()
+        pg_client.process_and_update_reviews(workers=args.workers, batch_size=args.batch_size)
         logger.info("Review processing finished.")
     except Exception as e:
         logger.error(f"An error occurred during the process: {e}")
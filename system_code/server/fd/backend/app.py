@@ -5,27 +5,36 @@ from flask import Flask, request, jsonify
 from flask_cors import CORS
 import pandas as pd
 from datetime import datetime
-import re
 import psycopg2
 
 # Add parent directory to path to import from system_code
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../../../..')))
 from system_code.server.database.postgres_client import PGClient
-from system_code.core.rag_sdk import RagSdk
+from system_code.core.rag_sdk import RagSdk, StageTimer
+from system_code.core.model_runtime import ModelNotReadyError
 from system_code.core.config import Config
+from system_code.server.fd.backend.cache import ResponseCache
+from system_code.server.fd.backend import dashboard_queries
 
 app = Flask(__name__)
 CORS(app)
 
-# Initialize database client
-db_client = PGClient()
+# Initialize database client; pooled so concurrent requests each get their own connection
+db_client = PGClient(pooled=True, minconn=2, maxconn=20)
 
-# Initialize RAG system
+# Response cache shared by the worker processes on this host; emptied whenever review data changes
+os.makedirs(Config.CACHE_DIR, exist_ok=True)
+response_cache = ResponseCache(max_entries=2048, ttl=300, shared_path=str(Config.CACHE_DIR / 'responses.sqlite'))
+db_client.watch_data_changes(response_cache.invalidate)
+
+# Initialize RAG system; the deep search model loads in the background so the dashboard is served right away
 config = Config()
-rag = RagSdk()
+rag = RagSdk(wait_for_models=False)
+rag.start_warm_up()
 
 
 @app.route('/api/search', methods=['POST'])
+@response_cache.cached('search', ttl=600)
 def search():
     """Standard search endpoint"""
     try:
@@ -51,88 +60,45 @@ def deep_search():
         data = request.get_json()
         query = data.get('query')
         limit = data.get('limit', 10)
+        # Optional latency budget in milliseconds
+        budget_ms = data.get('budget_ms')
+        timer = StageTimer(float(budget_ms) / 1000 if budget_ms else None)
         
         # Use deep search method for enhanced search
         sub_queries, results = rag.deep_search(
             query,
-            limit
+            limit,
+            timer=timer
         )
         return jsonify({
             'success': True,
             'data': results,
-            'sub_queries': sub_queries
+            'sub_queries': sub_queries,
+            'stages': timer.report()
         })
+    except ModelNotReadyError as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 503
     except Exception as e:
         return jsonify({
             'success': False,
             'error': str(e)
         }), 500
 
-@app.route('/api/dashboard/bot_rate', methods=['GET'])
-def get_bot_rate():
-    """Get bot rate by date"""
+def _dashboard_response(builder, formatter):
+    """Runs the SQL of one dashboard panel for the current request and formats the rows as JSON."""
     try:
-        # Get date range from query parameters
-        start_date = request.args.get('start_date', None)
-        end_date = request.args.get('end_date', None)
-        
-        # Build query with filters
-        query = """
-            SELECT 
-                TO_CHAR(TO_TIMESTAMP(timestamp / 1000), 'YYYY-MM-DD') as date,
-                COUNT(*) as total_reviews,
-                SUM(CASE WHEN real_review = FALSE THEN 1 ELSE 0 END) as bot_reviews,
-                ROUND(CAST((SUM(CASE WHEN real_review = FALSE THEN 1 ELSE 0 END)::float / COUNT(*)) * 100 AS numeric), 2) as bot_rate
-            FROM beauty_reviews
-            WHERE 1=1
-        """
-        
-        params = []
-        
-        # Add date filters if provided
-        if start_date:
-            query += " AND timestamp >= extract(epoch from to_timestamp(%s, 'YYYY-MM-DD')) * 1000"
-            params.append(start_date)
-        
-        if end_date:
-            # Add 86399999 milliseconds (23:59:59.999) to include the entire end date
-            query += " AND timestamp <= extract(epoch from to_timestamp(%s, 'YYYY-MM-DD')) * 1000 + 86399999"
-            params.append(end_date)
-        
-        # Add filter for real_reviews if provided
-        real_reviews = request.args.get('real_reviews', None)
-        if real_reviews is not None:
-            real_reviews_bool = real_reviews.lower() == 'true'
-            query += " AND real_review = %s"
-            params.append(real_reviews_bool)
-        
-        # Add filter for sentiment if provided
-        sentiment = request.args.get('sentiment', None)
-        if sentiment:
-            query += " AND sentiment = %s"
-            params.append(sentiment)
-        
-        # Group by date and order by date
-        query += """
-            GROUP BY TO_CHAR(TO_TIMESTAMP(timestamp / 1000), 'YYYY-MM-DD')
-            ORDER BY date
-        """
-        
+        query, params = builder(request.args)
+
         try:
             # Execute query
             results = db_client.execute(query, params)
-            
-            # Format results
-            data = [{
-                'date': row[0],
-                'total_reviews': row[1],
-                'bot_reviews': row[2],
-                'bot_rate': row[3]
-            } for row in results]
-            
+
             return jsonify({
                 'success': True,
-                'data': data
+                'data': formatter(results)
             })
         except psycopg2.Error as db_err:
             # 特别处理PostgreSQL错误
@@ -141,258 +107,61 @@ def get_bot_rate():
                 'error': f'数据库错误: {str(db_err)}',
                 'error_code': db_err.pgcode if hasattr(db_err, 'pgcode') else 'UNKNOWN'
             }), 500
-    
+
     except Exception as e:
         return jsonify({
             'success': False,
             'error': str(e)
         }), 500
 
+@app.route('/api/dashboard/bot_rate', methods=['GET'])
+@response_cache.cached('dashboard/bot_rate')
+def get_bot_rate():
+    """Get bot rate by date"""
+    return _dashboard_response(dashboard_queries.bot_rate, dashboard_queries.format_bot_rate)
+
 @app.route('/api/dashboard/sentiment', methods=['GET'])
+@response_cache.cached('dashboard/sentiment')
 def get_sentiment_distribution():
     """Get sentiment distribution"""
-    try:
-        # Get date range from query parameters
-        start_date = request.args.get('start_date', None)
-        end_date = request.args.get('end_date', None)
-        
-        # Build query with filters
-        query = """
-            SELECT 
-                sentiment,
-                COUNT(*) as count
-            FROM beauty_reviews
-            WHERE sentiment != ''
-        """
-        
-        params = []
-        
-        # Add date filters if provided
-        if start_date:
-            query += " AND timestamp >= extract(epoch from to_timestamp(%s, 'YYYY-MM-DD')) * 1000"
-            params.append(start_date)
-        
-        if end_date:
-            # Add 86399999 milliseconds (23:59:59.999) to include the entire end date
-            query += " AND timestamp <= extract(epoch from to_timestamp(%s, 'YYYY-MM-DD')) * 1000 + 86399999"
-            params.append(end_date)
-        
-        # Add filter for real_reviews if provided
-        real_reviews = request.args.get('real_reviews', None)
-        if real_reviews is not None:
-            real_reviews_bool = real_reviews.lower() == 'true'
-            query += " AND real_review = %s"
-            params.append(real_reviews_bool)
-        
-        # Group by sentiment
-        query += """
-            GROUP BY sentiment
-            ORDER BY count DESC
-        """
-        
-        try:
-            # Execute query
-            results = db_client.execute(query, params)
-            
-            # Format results
-            data = [{
-                'sentiment': row[0],
-                'count': row[1]
-            } for row in results]
-            
-            return jsonify({
-                'success': True,
-                'data': data
-            })
-        except psycopg2.Error as db_err:
-            # 特别处理PostgreSQL错误
-            return jsonify({
-                'success': False,
-                'error': f'数据库错误: {str(db_err)}',
-                'error_code': db_err.pgcode if hasattr(db_err, 'pgcode') else 'UNKNOWN'
-            }), 500
-    
-    except Exception as e:
-        return jsonify({
-            'success': False,
-            'error': str(e)
-        }), 500
+    return _dashboard_response(dashboard_queries.sentiment, dashboard_queries.format_sentiment)
 
 @app.route('/api/dashboard/wordcloud', methods=['GET'])
+@response_cache.cached('dashboard/wordcloud')
 def get_wordcloud_data():
     """Get word frequency for wordcloud"""
-    try:
-        # Get date range from query parameters
-        start_date = request.args.get('start_date', None)
-        end_date = request.args.get('end_date', None)
-        
-        # Build query with filters
-        query = """
-            SELECT text
-            FROM beauty_reviews
-            WHERE text != ''
-        """
-        
-        params = []
-        
-        # Add date filters if provided
-        if start_date:
-            query += " AND timestamp >= extract(epoch from to_timestamp(%s, 'YYYY-MM-DD')) * 1000"
-            params.append(start_date)
-        
-        if end_date:
-            # Add 86399999 milliseconds (23:59:59.999) to include the entire end date
-            query += " AND timestamp <= extract(epoch from to_timestamp(%s, 'YYYY-MM-DD')) * 1000 + 86399999"
-            params.append(end_date)
-        
-        # Add filter for real_reviews if provided
-        real_reviews = request.args.get('real_reviews', None)
-        if real_reviews is not None:
-            real_reviews_bool = real_reviews.lower() == 'true'
-            query += " AND real_review = %s"
-            params.append(real_reviews_bool)
-        
-        # Add filter for sentiment if provided
-        sentiment = request.args.get('sentiment', None)
-        if sentiment:
-            query += " AND sentiment = %s"
-            params.append(sentiment)
-        
-        try:
-            # Execute query
-            results = db_client.execute(query, params)
-            
-            # Process text to get word frequencies
-            all_text = ' '.join([row[0] for row in results])
-            
-            # Remove common stop words (English)
-            stop_words = {
-                'i', 'me', 'my', 'myself', 'we', 'our', 'ours', 'ourselves', 'you', 'your', 'yours',
-                'yourself', 'yourselves', 'he', 'him', 'his', 'himself', 'she', 'her', 'hers',
-                'herself', 'it', 'its', 'itself', 'they', 'them', 'their', 'theirs', 'themselves',
-                'what', 'which', 'who', 'whom', 'this', 'that', 'these', 'those', 'am', 'is', 'are',
-                'was', 'were', 'be', 'been', 'being', 'have', 'has', 'had', 'having', 'do', 'does',
-                'did', 'doing', 'a', 'an', 'the', 'and', 'but', 'if', 'or', 'because', 'as', 'until',
-                'while', 'of', 'at', 'by', 'for', 'with', 'about', 'against', 'between', 'into',
-                'through', 'during', 'before', 'after', 'above', 'below', 'to', 'from', 'up', 'down',
-                'in', 'out', 'on', 'off', 'over', 'under', 'again', 'further', 'then', 'once', 'here',
-                'there', 'when', 'where', 'why', 'how', 'all', 'any', 'both', 'each', 'few', 'more',
-                'most', 'other', 'some', 'such', 'no', 'nor', 'not', 'only', 'own', 'same', 'so',
-                'than', 'too', 'very', 's', 't', 'can', 'will', 'just', 'don', 'should', 'now'
-            }
-            
-            # Clean text and count word frequencies
-            words = re.findall(r'\b[a-zA-Z]{3,}\b', all_text.lower())
-            word_freq = {}
-            
-            for word in words:
-                if word not in stop_words:
-                    if word in word_freq:
-                        word_freq[word] += 1
-                    else:
-                        word_freq[word] = 1
-            
-            # Convert to list of objects for the frontend
-            data = [{'text': word, 'value': count} for word, count in word_freq.items()]
-            
-            # Sort by frequency and limit to top 100 words
-            data.sort(key=lambda x: x['value'], reverse=True)
-            data = data[:100]
-            
-            return jsonify({
-                'success': True,
-                'data': data
-            })
-        except psycopg2.Error as db_err:
-            # 特别处理PostgreSQL错误
-            return jsonify({
-                'success': False,
-                'error': f'数据库错误: {str(db_err)}',
-                'error_code': db_err.pgcode if hasattr(db_err, 'pgcode') else 'UNKNOWN'
-            }), 500
-    
-    except Exception as e:
-        return jsonify({
-            'success': False,
-            'error': str(e)
-        }), 500
+    return _dashboard_response(dashboard_queries.wordcloud, dashboard_queries.format_wordcloud)
 
 @app.route('/api/dashboard/review_trend', methods=['GET'])
+@response_cache.cached('dashboard/review_trend')
 def get_review_trend():
     """Get review count trend by date"""
-    try:
-        # Get date range from query parameters
-        start_date = request.args.get('start_date', None)
-        end_date = request.args.get('end_date', None)
-        
-        # Build query with filters
-        query = """
-            SELECT 
-                TO_CHAR(TO_TIMESTAMP(timestamp / 1000), 'YYYY-MM-DD') as date,
-                COUNT(*) as review_count
-            FROM beauty_reviews
-            WHERE 1=1
-        """
-        
-        params = []
-        
-        # Add date filters if provided
-        if start_date:
-            query += " AND timestamp >= extract(epoch from to_timestamp(%s, 'YYYY-MM-DD')) * 1000"
-            params.append(start_date)
-        
-        if end_date:
-            # Add 86399999 milliseconds (23:59:59.999) to include the entire end date
-            query += " AND timestamp <= extract(epoch from to_timestamp(%s, 'YYYY-MM-DD')) * 1000 + 86399999"
-            params.append(end_date)
-        
-        # Add filter for real_reviews if provided
-        real_reviews = request.args.get('real_reviews', None)
-        if real_reviews is not None:
-            real_reviews_bool = real_reviews.lower() == 'true'
-            query += " AND real_review = %s"
-            params.append(real_reviews_bool)
-        
-        # Add filter for sentiment if provided
-        sentiment = request.args.get('sentiment', None)
-        if sentiment:
-            query += " AND sentiment = %s"
-            params.append(sentiment)
-        
-        # Group by date and order by date
-        query += """
-            GROUP BY TO_CHAR(TO_TIMESTAMP(timestamp / 1000), 'YYYY-MM-DD')
-            ORDER BY date
-        """
-        
-        try:
-            # Execute query
-            results = db_client.execute(query, params)
-            
-            # Format results
-            data = [{
-                'date': row[0],
-                'review_count': row[1]
-            } for row in results]
-            
-            return jsonify({
-                'success': True,
-                'data': data
-            })
-        except psycopg2.Error as db_err:
-            # 特别处理PostgreSQL错误
-            return jsonify({
-                'success': False,
-                'error': f'数据库错误: {str(db_err)}',
-                'error_code': db_err.pgcode if hasattr(db_err, 'pgcode') else 'UNKNOWN'
-            }), 500
-    
-    except Exception as e:
-        return jsonify({
-            'success': False,
-            'error': str(e)
-        }), 500
+    return _dashboard_response(dashboard_queries.review_trend, dashboard_queries.format_review_trend)
+
+@app.route('/api/dashboard/summary', methods=['GET'])
+@response_cache.cached('dashboard/summary')
+def get_dashboard_summary():
+    """Get every dashboard panel in one round trip"""
+    return _dashboard_response(dashboard_queries.summary, dashboard_queries.format_summary)
+
+@app.route('/api/health', methods=['GET'])
+def get_health():
+    """Readiness of the models behind the search endpoints"""
+    return jsonify({
+        'success': True,
+        'data': {'models_ready': rag.models_ready}
+    })
+
+@app.route('/api/cache/stats', methods=['GET'])
+def get_cache_stats():
+    """Hit/miss counters of the response cache and the RAG caches"""
+    return jsonify({
+        'success': True,
+        'data': dict(response_cache.stats(), query_cache=rag.query_cache.stats(),
+                     sub_queries=rag.sub_query_provider.stats(),
+                     reranker=rag.reranker.stats() if hasattr(rag.reranker, 'stats') else None)
+    })
 
 
 if __name__ == '__main__':
-    app.run(debug=True, host='0.0.0.0', port=5000)
\ No newline at end of file
+    app.run(debug=True, host='0.0.0.0', port=5000, threaded=True)
\ No newline at end of file
@@ -0,0 +1,390 @@
+"""
+Async (ASGI) serving mode of the backend API: the same routes as app.py on one event loop.
+
+Dashboard queries go through an asyncpg pool and remote retrieval through an httpx.AsyncClient,
+so waiting on Postgres or the knowledge base does not hold a thread. Model work (deep search
+decoding, local index embedding) runs on a bounded executor.
+
+Run with:
+    uvicorn system_code.server.fd.backend.async_app:app --host 0.0.0.0 --port 5000
+"""
+import os
+import sys
+import json
+import asyncio
+from functools import wraps
+from contextlib import asynccontextmanager
+from concurrent.futures import ThreadPoolExecutor
+import asyncpg
+import httpx
+from starlette.applications import Starlette
+from starlette.middleware import Middleware
+from starlette.middleware.cors import CORSMiddleware
+from starlette.responses import JSONResponse
+from starlette.routing import Route
+
+# Add parent directory to path to import from system_code
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../../../..')))
+from system_code.server.database.postgres_client import PGClient
+from system_code.core.rag_sdk import RagSdk, StageTimer
+from system_code.core.model_runtime import ModelNotReadyError
+from system_code.core.config import Config, logger
+from system_code.server.fd.backend.cache import ResponseCache
+from system_code.server.fd.backend import dashboard_queries
+
+# Postgres connections shared by all in-flight requests
+POOL_MIN_SIZE = 2
+POOL_MAX_SIZE = 20
+# Threads for blocking model work; requests beyond this queue instead of adding threads
+MODEL_WORKERS = 4
+# Keep-alive connections to the knowledge base, and the SDK's 30 s timeout
+HTTP_MAX_CONNECTIONS = 100
+HTTP_TIMEOUT = 30
+# Seconds between pings of the LISTEN connection
+LISTEN_HEALTH_INTERVAL = 60
+
+config = Config()
+
+# Same shared store as app.py, so both serving modes can run side by side on one host
+os.makedirs(Config.CACHE_DIR, exist_ok=True)
+response_cache = ResponseCache(max_entries=2048, ttl=300, shared_path=str(Config.CACHE_DIR / 'responses.sqlite'))
+
+# The deep search model loads in the background so the dashboard is served right away
+rag = RagSdk(wait_for_models=False)
+rag.start_warm_up()
+model_executor = ThreadPoolExecutor(max_workers=MODEL_WORKERS, thread_name_prefix='model')
+
+
+class JsonResponse(JSONResponse):
+    def render(self, content):
+        # Decimals (ROUND(...)::numeric) are written as strings, like Flask's jsonify
+        return json.dumps(content, ensure_ascii=False, default=str).encode('utf-8')
+
+
+class AsyncRag:
+    """
+    Async front of RagSdk. Sharing its query cache and sub-query store, it searches over httpx
+    when the backend supports it (Viking) and on the model executor otherwise. Cache and
+    sub-query store calls read SQLite or files and may embed the query, so they run in worker
+    threads rather than on the event loop.
+    """
+
+    def __init__(self, rag, client, executor):
+        self.rag = rag
+        self.client = client
+        self.executor = executor
+        self.search_slots = asyncio.Semaphore(rag.SEARCH_CONCURRENCY)
+
+    async def offload(self, function, *args):
+        return await asyncio.get_running_loop().run_in_executor(self.executor, function, *args)
+
+    async def search(self, query, top_k=10, dense_weight=0.7):
+        """Same contract as ``RagSdk.search``: failures are logged and return no hits."""
+        try:
+            return await self._search(query, top_k, dense_weight)
+        except Exception as e:
+            logger.error(f'[AsyncRag] Search failed: {e}')
+            return []
+
+    async def _search(self, query, top_k, dense_weight):
+        """Same contract as ``RagSdk._search``: raises backend errors."""
+        hit, results = await asyncio.to_thread(self.rag.query_cache.get, 'search', query, (top_k, dense_weight))
+        if hit:
+            return results
+
+        backend = self.rag.backend
+        if hasattr(backend, 'async_search'):
+            results = await backend.async_search(self.client, query, top_k, dense_weight)
+        else:
+            results = await self.offload(backend.search, query, top_k, dense_weight)
+
+        await asyncio.to_thread(self.rag.query_cache.set, 'search', query, (top_k, dense_weight), results)
+        return results
+
+    async def _sub_query_search(self, sub_query, top_k, dense_weight):
+        async with self.search_slots:
+            return await self._search(sub_query, top_k, dense_weight)
+
+    async def _decode_sub_queries(self, query, request, max_sub_queries=5, deadline=None):
+        """Yields sub-queries as the model decodes them; decoding runs on the executor."""
+        loop = asyncio.get_running_loop()
+        decoded = asyncio.Queue()
+        done = object()
+
+        def produce():
+            try:
+                for sub_query in self.rag.stream_sub_queries(query, max_sub_queries, deadline, request):
+                    loop.call_soon_threadsafe(decoded.put_nowait, sub_query)
+            except Exception as e:
+                loop.call_soon_threadsafe(decoded.put_nowait, e)
+            finally:
+                loop.call_soon_threadsafe(decoded.put_nowait, done)
+
+        producer = loop.run_in_executor(self.executor, produce)
+        while True:
+            item = await decoded.get()
+            if item is done:
+                break
+            if isinstance(item, Exception):
+                raise item
+            yield item
+        await producer
+
+    async def deep_search(self, query, top_k=10, dense_weight=0.7, timeout=None, timer=None):
+        """Same contract as ``RagSdk.deep_search``, including the latency budget: returns (sub_queries, results)."""
+        rag = self.rag
+        timer = timer or StageTimer()
+        with timer.stage('cache') as stage:
+            hit, cached = await asyncio.to_thread(rag.query_cache.get, 'deep_search', query, (top_k, dense_weight))
+            stage['hit'] = hit
+        if hit:
+            sub_queries, results = cached
+            return sub_queries, results
+
+        # Stored sub-queries are searched at once; freshly generated ones as each is decoded
+        stored = await asyncio.to_thread(rag.sub_query_provider.lookup, query)
+        sub_queries, tasks, request = [], [], None
+        try:
+            with timer.stage('sub_queries' if stored is not None else 'generate') as stage:
+                if stored is not None:
+                    for sub_query in stored:
+                        sub_queries.append(sub_query)
+                        tasks.append(asyncio.ensure_future(self._sub_query_search(sub_query, top_k, dense_weight)))
+                else:
+                    if timer.budget is None:
+                        request, limits = rag.submit_deep_search(query), (5, None)
+                    else:
+                        try:
+                            request = rag.submit_deep_search(query, max_new_tokens=rag.BUDGET_MAX_NEW_TOKENS)
+                        except ModelNotReadyError as e:
+                            logger.warning(f'[AsyncRag] Deep search model not ready, falling back to plain search: {e}')
+                        limits = (rag.BUDGET_SUB_QUERIES, timer.deadline(rag.budget_reserve(timer.budget)))
+                    if request is not None:
+                        async for sub_query in self._decode_sub_queries(query, request, *limits):
+                            sub_queries.append(sub_query)
+                            tasks.append(asyncio.ensure_future(self._sub_query_search(sub_query, top_k, dense_weight)))
+                        stage['finish_reason'] = request.finish_reason
+                stage['count'] = len(sub_queries)
+        except BaseException:
+            for task in tasks:
+                task.cancel()
+            raise
+        # Sub-queries cut short by the budget are not stored or cached
+        truncated = rag.sub_queries_truncated(timer, request, sub_queries)
+        if request is not None and not truncated:
+            await asyncio.to_thread(rag.sub_query_provider.store, query, sub_queries)
+
+        if not sub_queries and timer.budget is not None:
+            timer.fallback = True
+            with timer.stage('fallback_search') as stage:
+                try:
+                    return [], await asyncio.wait_for(self.search(query, top_k, dense_weight),
+                                                      timeout=max(timer.remaining(), 0))
+                except asyncio.TimeoutError:
+                    logger.warning(f'[AsyncRag] Fallback search missed the deadline: {query}')
+                    stage['timed_out'] = True
+                    return [], []
+
+        hit_lists = []
+        complete = bool(sub_queries)
+        with timer.stage('search') as stage:
+            if tasks:
+                wait_for = timeout or rag.SEARCH_TIMEOUT
+                if timer.budget is not None:
+                    wait_for = min(wait_for, max(timer.remaining(), 0))
+                done, not_done = await asyncio.wait(tasks, timeout=wait_for)
+                for sub_query, task in zip(sub_queries, tasks):
+                    if task in not_done:
+                        task.cancel()
+                        logger.warning(f'[AsyncRag] Search for sub-query timed out: {sub_query}')
+                        complete = False
+                        continue
+                    try:
+                        hits = task.result()
+                    except Exception as e:
+                        logger.warning(f'[AsyncRag] Search for sub-query failed: {sub_query}: {e}')
+                        complete = False
+                        continue
+                    hit_lists.append(hits)
+            stage['completed'] = len(hit_lists)
+
+        # Reranking is model work
+        with timer.stage('rerank' if rag.reranker is not None else 'merge') as stage:
+            results = await self.offload(rag.rank_results, query, hit_lists, top_k, stage)
+        if complete and not truncated and not stage.get('fallback'):
+            # Partial answers, and ones ranked while the reranker model loads, are not cached
+            await asyncio.to_thread(rag.query_cache.set, 'deep_search', query, (top_k, dense_weight),
+                                    [sub_queries, results])
+        return sub_queries, results
+
+
+def api(cache_endpoint=None, ttl=None):
+    """
+    Turns ``async handler(request, params) -> (payload, status)`` into a Starlette endpoint.
+
+    ``params`` merges the query string and, for POST, the JSON body. With ``cache_endpoint`` the
+    response goes through the shared ResponseCache exactly like ``ResponseCache.cached`` in app.py;
+    its SQLite reads and writes run in worker threads.
+    """
+    def decorator(handler):
+        @wraps(handler)
+        async def endpoint(request):
+            params = dict(request.query_params)
+            if request.method == 'POST':
+                try:
+                    body = await request.json()
+                except ValueError:
+                    body = None
+                if isinstance(body, dict):
+                    params.update(body)
+
+            key = None
+            if cache_endpoint:
+                try:
+                    key = ResponseCache.make_key(cache_endpoint, params)
+                except (TypeError, ValueError):
+                    # Unparseable arguments: let the handler report the error itself
+                    key = None
+                if key is not None:
+                    hit, payload = await asyncio.to_thread(response_cache.get, key)
+                    if hit:
+                        return JsonResponse(payload, headers={'X-Cache': 'HIT'})
+
+            try:
+                payload, status = await handler(request, params)
+            except ModelNotReadyError as e:
+                payload, status = {'success': False, 'error': str(e)}, 503
+            except Exception as e:
+                payload, status = {'success': False, 'error': str(e)}, 500
+
+            headers = {}
+            if key is not None:
+                if status == 200 and payload.get('success'):
+                    await asyncio.to_thread(response_cache.set, key, payload, ttl)
+                headers['X-Cache'] = 'MISS'
+            return JsonResponse(payload, status_code=status, headers=headers)
+        return endpoint
+    return decorator
+
+
+@api('search', ttl=600)
+async def search(request, params):
+    """Standard search endpoint"""
+    results = await request.app.state.rag.search(params.get('query'), params.get('limit', 10))
+    return {'success': True, 'data': results}, 200
+
+
+@api()
+async def deep_search(request, params):
+    """Deep search endpoint with enhanced parameters"""
+    # Optional latency budget in milliseconds
+    budget_ms = params.get('budget_ms')
+    timer = StageTimer(float(budget_ms) / 1000 if budget_ms else None)
+    sub_queries, results = await request.app.state.rag.deep_search(params.get('query'), params.get('limit', 10),
+                                                                   timer=timer)
+    return {'success': True, 'data': results, 'sub_queries': sub_queries, 'stages': timer.report()}, 200
+
+
+def dashboard(name):
+    """Endpoint of one dashboard panel, running its dashboard_queries SQL on the asyncpg pool."""
+    build_query, format_rows = dashboard_queries.PANELS[name]
+
+    @api(f'dashboard/{name}')
+    async def handler(request, params):
+        query, query_params = build_query(params)
+        try:
+            rows = await request.app.state.pool.fetch(dashboard_queries.to_asyncpg(query), *query_params)
+        except asyncpg.PostgresError as db_err:
+            # 特别处理PostgreSQL错误
+            return {
+                'success': False,
+                'error': f'数据库错误: {str(db_err)}',
+                'error_code': db_err.sqlstate or 'UNKNOWN'
+            }, 500
+        return {'success': True, 'data': format_rows(rows)}, 200
+
+    handler.__name__ = f'get_{name}'
+    return handler
+
+
+@api()
+async def get_health(request, params):
+    """Readiness of the models behind the search endpoints"""
+    return {'success': True, 'data': {'models_ready': rag.models_ready}}, 200
+
+
+@api()
+async def get_cache_stats(request, params):
+    """Hit/miss counters of the response cache and the RAG caches"""
+    return {
+        'success': True,
+        'data': dict(response_cache.stats(), query_cache=rag.query_cache.stats(),
+                     sub_queries=rag.sub_query_provider.stats(),
+                     reranker=rag.reranker.stats() if hasattr(rag.reranker, 'stats') else None)
+    }, 200
+
+
+def _connect_kwargs():
+    return dict(host=config.postgresql['host'], port=int(config.postgresql['port']),
+                user=config.postgresql['user'], password=config.postgresql['password'],
+                database=config.postgresql['database'])
+
+
+async def watch_data_changes():
+    """
+    asyncpg version of ``PGClient.watch_data_changes``: empties the response cache on every
+    review_data_changed notification, and after every (re)connect.
+    """
+    while True:
+        conn = None
+        try:
+            conn = await asyncpg.connect(**_connect_kwargs())
+            await conn.add_listener(PGClient.DATA_CHANGED_CHANNEL, lambda *args: response_cache.invalidate())
+            response_cache.invalidate()
+            while True:
+                await asyncio.sleep(LISTEN_HEALTH_INTERVAL)
+                await conn.fetchval('SELECT 1')
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.warning(f'[AsyncApp] Data change listener failed, retrying: {e}')
+            await asyncio.sleep(5)
+        finally:
+            if conn is not None and not conn.is_closed():
+                await conn.close()
+
+
+@asynccontextmanager
+async def lifespan(app):
+    # Creates the database and applies pending migrations, as the Flask app does on import
+    await asyncio.get_running_loop().run_in_executor(None, lambda: PGClient().close())
+    app.state.pool = await asyncpg.create_pool(min_size=POOL_MIN_SIZE, max_size=POOL_MAX_SIZE, **_connect_kwargs())
+    client = httpx.AsyncClient(timeout=HTTP_TIMEOUT,
+                               limits=httpx.Limits(max_connections=HTTP_MAX_CONNECTIONS,
+                                                   max_keepalive_connections=HTTP_MAX_CONNECTIONS))
+    app.state.rag = AsyncRag(rag, client, model_executor)
+    watcher = asyncio.create_task(watch_data_changes())
+    try:
+        yield
+    finally:
+        watcher.cancel()
+        await client.aclose()
+        await app.state.pool.close()
+
+
+app = Starlette(
+    routes=[
+        Route('/api/search', search, methods=['POST']),
+        Route('/api/deep_search', deep_search, methods=['POST']),
+        *[Route(f'/api/dashboard/{name}', dashboard(name), methods=['GET']) for name in dashboard_queries.PANELS],
+        Route('/api/health', get_health, methods=['GET']),
+        Route('/api/cache/stats', get_cache_stats, methods=['GET']),
+    ],
+    middleware=[Middleware(CORSMiddleware, allow_origins=['*'], allow_methods=['*'], allow_headers=['*'])],
+    lifespan=lifespan,
+)
+
+
+if __name__ == '__main__':
+    import uvicorn
+    uvicorn.run(app, host='0.0.0.0', port=5000)
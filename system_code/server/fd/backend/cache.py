@@ -0,0 +1,175 @@
+import json
+import time
+import sqlite3
+import threading
+from functools import wraps
+from collections import OrderedDict
+from flask import request, jsonify
+from system_code.core.config import logger
+
+
+class ResponseCache:
+    """
+    Two-level cache for JSON API responses.
+
+    Level one is an in-process LRU with per-entry TTLs. Level two is an optional SQLite file
+    shared by every backend process on the host, so a response computed by one worker is reused
+    by the others. invalidate() empties both levels; the backend calls it whenever ingest or
+    review processing commits new data.
+    """
+
+    # Request arguments that take part in the cache key
+    KEY_ARGS = ('start_date', 'end_date', 'real_reviews', 'sentiment', 'query', 'limit')
+
+    def __init__(self, max_entries=1024, ttl=60, shared_path=None):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.shared_path = shared_path
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._counters = {'hits': 0, 'shared_hits': 0, 'misses': 0, 'evictions': 0, 'invalidations': 0}
+        if shared_path:
+            with self._shared() as db:
+                db.execute('PRAGMA journal_mode=WAL')
+                db.execute('''
+                    CREATE TABLE IF NOT EXISTS responses (
+                        key TEXT PRIMARY KEY,
+                        value TEXT NOT NULL,
+                        expires_at REAL NOT NULL,
+                        created_at REAL NOT NULL
+                    )
+                ''')
+
+    def _shared(self):
+        return sqlite3.connect(self.shared_path, timeout=5)
+
+    @classmethod
+    def make_key(cls, endpoint, args):
+        """Builds a cache key from the endpoint and its normalized arguments."""
+        normalized = {}
+        for name in cls.KEY_ARGS:
+            value = args.get(name)
+            if value is None or value == '':
+                continue
+            if name == 'real_reviews':
+                # Matches the endpoints: anything but 'true' means False
+                value = str(value).lower() == 'true'
+            elif name == 'limit':
+                value = int(value)
+            elif name == 'query':
+                value = ' '.join(str(value).split())
+            else:
+                value = str(value).strip()
+            normalized[name] = value
+        return endpoint + '?' + json.dumps(normalized, sort_keys=True, ensure_ascii=False)
+
+    def get(self, key):
+        """Returns (hit, value)."""
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                expires_at, value = entry
+                if expires_at > now:
+                    self._entries.move_to_end(key)
+                    self._counters['hits'] += 1
+                    return True, value
+                del self._entries[key]
+
+        if self.shared_path:
+            try:
+                with self._shared() as db:
+                    row = db.execute('SELECT value, expires_at FROM responses WHERE key = ? AND expires_at > ?',
+                                     (key, now)).fetchone()
+            except sqlite3.Error as e:
+                logger.warning(f'[ResponseCache] Shared store read failed: {e}')
+                row = None
+            if row is not None:
+                value = json.loads(row[0])
+                self._store_local(key, value, row[1])
+                with self._lock:
+                    self._counters['shared_hits'] += 1
+                return True, value
+
+        with self._lock:
+            self._counters['misses'] += 1
+        return False, None
+
+    def set(self, key, value, ttl=None):
+        expires_at = time.time() + (ttl or self.ttl)
+        self._store_local(key, value, expires_at)
+        if self.shared_path:
+            try:
+                with self._shared() as db:
+                    db.execute('INSERT OR REPLACE INTO responses (key, value, expires_at, created_at) VALUES (?, ?, ?, ?)',
+                               (key, json.dumps(value, default=str), expires_at, time.time()))
+                    # Drop expired rows, then the oldest ones beyond the size bound
+                    db.execute('DELETE FROM responses WHERE expires_at <= ?', (time.time(),))
+                    db.execute('DELETE FROM responses WHERE key IN '
+                               '(SELECT key FROM responses ORDER BY created_at DESC LIMIT -1 OFFSET ?)',
+                               (self.max_entries,))
+            except sqlite3.Error as e:
+                logger.warning(f'[ResponseCache] Shared store write failed: {e}')
+
+    def _store_local(self, key, value, expires_at):
+        with self._lock:
+            self._entries[key] = (expires_at, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self._counters['evictions'] += 1
+
+    def invalidate(self):
+        """Drops every cached response in both levels."""
+        with self._lock:
+            self._entries.clear()
+            self._counters['invalidations'] += 1
+        if self.shared_path:
+            try:
+                with self._shared() as db:
+                    db.execute('DELETE FROM responses')
+            except sqlite3.Error as e:
+                logger.warning(f'[ResponseCache] Shared store invalidation failed: {e}')
+        logger.info('[ResponseCache] Invalidated')
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._counters, size=len(self._entries), max_entries=self.max_entries)
+        lookups = stats['hits'] + stats['shared_hits'] + stats['misses']
+        stats['hit_ratio'] = round((stats['hits'] + stats['shared_hits']) / lookups, 4) if lookups else 0.0
+        return stats
+
+    def cached(self, endpoint, ttl=None):
+        """
+        Decorator for Flask views returning ``jsonify({'success': ..., ...})``.
+
+        Arguments are read from the query string and, for POST, the JSON body. Only successful
+        responses are stored; hits are served without calling the view.
+        """
+        def decorator(view):
+            @wraps(view)
+            def wrapper(*args, **kwargs):
+                params = dict(request.args)
+                if request.method == 'POST':
+                    params.update(request.get_json(silent=True) or {})
+                try:
+                    key = self.make_key(endpoint, params)
+                except (TypeError, ValueError):
+                    # Unparseable arguments: let the view report the error itself
+                    return view(*args, **kwargs)
+
+                hit, payload = self.get(key)
+                if hit:
+                    response = jsonify(payload)
+                    response.headers['X-Cache'] = 'HIT'
+                    return response
+
+                response = view(*args, **kwargs)
+                if not isinstance(response, tuple) and response.status_code == 200:
+                    payload = response.get_json()
+                    if payload and payload.get('success'):
+                        self.set(key, payload, ttl)
+                    response.headers['X-Cache'] = 'MISS'
+                return response
+            return wrapper
+        return decorator
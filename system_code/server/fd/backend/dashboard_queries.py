@@ -0,0 +1,246 @@
+"""
+SQL of the dashboard panels, shared by the Flask app and the async app.
+
+Every builder takes the request arguments and returns ``(query, params)`` with psycopg2-style
+``%s`` placeholders; ``to_asyncpg`` rewrites them for asyncpg. Every formatter turns result rows
+into the JSON the frontend expects.
+"""
+import re
+
+
+class ReviewFilters:
+    """
+    The dashboard filters of one request (date range, real_reviews, sentiment), rendered as
+    parameterized SQL conditions on the daily rollup tables.
+    """
+
+    def __init__(self, args):
+        self.start_date = args.get('start_date', None) or None
+        self.end_date = args.get('end_date', None) or None
+        real_reviews = args.get('real_reviews', None)
+        self.real_review = None if real_reviews is None else real_reviews.lower() == 'true'
+        self.sentiment = args.get('sentiment', None) or None
+
+    def conditions(self, sentiment=True, real_review=True):
+        """
+        Returns (conditions, params): the active filters joined with AND ('TRUE' when none).
+        ``sentiment=False`` leaves out the sentiment filter, which the sentiment panel ignores;
+        ``real_review=False`` leaves out the real_review filter, for tables without that column.
+        """
+        conditions, params = [], []
+
+        # Date filters; day buckets are inclusive, so the entire end date is covered
+        if self.start_date:
+            conditions.append("day >= to_date(%s, 'YYYY-MM-DD')")
+            params.append(self.start_date)
+        if self.end_date:
+            conditions.append("day <= to_date(%s, 'YYYY-MM-DD')")
+            params.append(self.end_date)
+
+        if real_review and self.real_review is not None:
+            conditions.append("real_review = %s")
+            params.append(self.real_review)
+
+        if sentiment and self.sentiment:
+            conditions.append("sentiment = %s")
+            params.append(self.sentiment)
+
+        return ' AND '.join(conditions) or 'TRUE', params
+
+
+def word_counts(filters):
+    """
+    Returns (query, params) selecting (word, word_count) rows that add up to the word counts of
+    the reviews matching ``filters``. daily_word_stats only holds classified reviews, so filters
+    that unclassified reviews can match are answered from daily_word_totals, minus the buckets
+    they exclude.
+    """
+    if filters.sentiment or filters.real_review:
+        where, params = filters.conditions()
+        return f"SELECT word, word_count FROM daily_word_stats WHERE {where}", params
+
+    where, params = filters.conditions(real_review=False)
+    query = f"SELECT word, word_count FROM daily_word_totals WHERE {where}"
+    if filters.real_review is False:
+        query += f" UNION ALL SELECT word, -word_count FROM daily_word_stats WHERE real_review AND {where}"
+        params = params * 2
+    return query, params
+
+
+def bot_rate(args):
+    """Bot rate by date"""
+    where, params = ReviewFilters(args).conditions()
+    # Answered from the daily rollup instead of beauty_reviews
+    query = f"""
+        SELECT
+            TO_CHAR(day, 'YYYY-MM-DD') as date,
+            SUM(review_count)::bigint as total_reviews,
+            COALESCE(SUM(review_count) FILTER (WHERE real_review = FALSE), 0)::bigint as bot_reviews,
+            ROUND(CAST((COALESCE(SUM(review_count) FILTER (WHERE real_review = FALSE), 0)::float / SUM(review_count)) * 100 AS numeric), 2) as bot_rate
+        FROM daily_review_stats
+        WHERE {where}
+        GROUP BY day
+        HAVING SUM(review_count) > 0
+        ORDER BY date
+    """
+    return query, params
+
+
+def format_bot_rate(rows):
+    return [{
+        'date': row[0],
+        'total_reviews': row[1],
+        'bot_reviews': row[2],
+        'bot_rate': row[3]
+    } for row in rows]
+
+
+def sentiment(args):
+    """Sentiment distribution"""
+    where, params = ReviewFilters(args).conditions(sentiment=False)
+    # Answered from the daily rollup instead of beauty_reviews
+    query = f"""
+        SELECT
+            sentiment,
+            SUM(review_count)::bigint as count
+        FROM daily_review_stats
+        WHERE sentiment != '' AND {where}
+        GROUP BY sentiment
+        HAVING SUM(review_count) > 0
+        ORDER BY count DESC
+    """
+    return query, params
+
+
+def format_sentiment(rows):
+    return [{
+        'sentiment': row[0],
+        'count': row[1]
+    } for row in rows]
+
+
+def wordcloud(args):
+    """Word frequency for the wordcloud"""
+    words, params = word_counts(ReviewFilters(args))
+    # Word counts are pre-computed per day at ingest/processing time; keep the top 100 words
+    query = f"""
+        SELECT word, SUM(word_count)::bigint as value
+        FROM ({words}) AS words
+        GROUP BY word
+        HAVING SUM(word_count) > 0
+        ORDER BY value DESC, word
+        LIMIT 100
+    """
+    return query, params
+
+
+def format_wordcloud(rows):
+    # List of objects for the frontend
+    return [{'text': row[0], 'value': row[1]} for row in rows]
+
+
+def review_trend(args):
+    """Review count trend by date"""
+    where, params = ReviewFilters(args).conditions()
+    # Answered from the daily rollup instead of beauty_reviews
+    query = f"""
+        SELECT
+            TO_CHAR(day, 'YYYY-MM-DD') as date,
+            SUM(review_count)::bigint as review_count
+        FROM daily_review_stats
+        WHERE {where}
+        GROUP BY day
+        HAVING SUM(review_count) > 0
+        ORDER BY date
+    """
+    return query, params
+
+
+def format_review_trend(rows):
+    return [{
+        'date': row[0],
+        'review_count': row[1]
+    } for row in rows]
+
+
+def summary(args):
+    """
+    Every panel in one statement. The rollup is read once and grouped by both day and sentiment
+    through GROUPING SETS. The sentiment filter is applied with FILTER clauses, so the day
+    panels honour it while the sentiment panel still sees every sentiment. The top words are
+    appended with UNION ALL. Rows are (panel, key, total, bot, bot_rate, position).
+    """
+    filters = ReviewFilters(args)
+    where, params = filters.conditions(sentiment=False)
+    if filters.sentiment:
+        selected, selected_params = 'sentiment = %s', [filters.sentiment]
+    else:
+        selected, selected_params = 'TRUE', []
+    words, word_params = word_counts(filters)
+
+    query = f"""
+        WITH review_groups AS (
+            SELECT
+                GROUPING(day) = 0 as by_day,
+                day,
+                sentiment,
+                SUM(review_count)::bigint as review_count,
+                COALESCE(SUM(review_count) FILTER (WHERE {selected}), 0)::bigint as selected_count,
+                COALESCE(SUM(review_count) FILTER (WHERE {selected} AND real_review = FALSE), 0)::bigint as bot_count
+            FROM daily_review_stats
+            WHERE {where}
+            GROUP BY GROUPING SETS ((day), (sentiment))
+        ), top_words AS (
+            SELECT word, SUM(word_count)::bigint as value
+            FROM ({words}) AS words
+            GROUP BY word
+            HAVING SUM(word_count) > 0
+            ORDER BY value DESC, word
+            LIMIT 100
+        )
+        SELECT 'day', TO_CHAR(day, 'YYYY-MM-DD'), selected_count, bot_count,
+               ROUND(CAST((bot_count::float / selected_count) * 100 AS numeric), 2),
+               ROW_NUMBER() OVER (ORDER BY day)
+        FROM review_groups WHERE by_day AND selected_count > 0
+        UNION ALL
+        SELECT 'sentiment', sentiment, review_count, NULL, NULL,
+               ROW_NUMBER() OVER (ORDER BY review_count DESC, sentiment)
+        FROM review_groups WHERE NOT by_day AND sentiment != '' AND review_count > 0
+        UNION ALL
+        SELECT 'word', word, value, NULL, NULL, ROW_NUMBER() OVER (ORDER BY value DESC, word)
+        FROM top_words
+        ORDER BY 1, 6
+    """
+    return query, selected_params * 2 + params + word_params
+
+
+def format_summary(rows):
+    """The payload of each panel endpoint, keyed by panel name."""
+    days = [row for row in rows if row[0] == 'day']
+    return {
+        'bot_rate': [{
+            'date': row[1],
+            'total_reviews': row[2],
+            'bot_reviews': row[3],
+            'bot_rate': row[4]
+        } for row in days],
+        'sentiment': [{'sentiment': row[1], 'count': row[2]} for row in rows if row[0] == 'sentiment'],
+        'wordcloud': [{'text': row[1], 'value': row[2]} for row in rows if row[0] == 'word'],
+        'review_trend': [{'date': row[1], 'review_count': row[2]} for row in days],
+    }
+
+
+# Panel name -> (query builder, row formatter)
+PANELS = {
+    'bot_rate': (bot_rate, format_bot_rate),
+    'sentiment': (sentiment, format_sentiment),
+    'wordcloud': (wordcloud, format_wordcloud),
+    'review_trend': (review_trend, format_review_trend),
+    'summary': (summary, format_summary),
+}
+
+
+def to_asyncpg(query):
+    """Rewrites ``%s`` placeholders as asyncpg's ``$1, $2, ...``."""
+    counter = iter(range(1, query.count('%s') + 1))
+    return re.sub(r'%s', lambda _: f'${next(counter)}', query)
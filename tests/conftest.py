@@ -0,0 +1,131 @@
+import os
+import sys
+import json
+import threading
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import pytest
+import psycopg2
+from psycopg2 import sql
+from psycopg2.extensions import ISOLATION_LEVEL_AUTOCOMMIT
+
+# Add the repository root to the path to import from system_code
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from system_code.core.config import Config
+
+# Throwaway database the Postgres tests run in, next to the configured one
+TEST_DATABASE = 'insightreview_test'
+
+
+def _admin_connection(settings):
+    conn = psycopg2.connect(host=settings['host'], port=settings['port'], user=settings['user'],
+                            password=settings['password'], dbname='postgres', connect_timeout=3)
+    conn.set_isolation_level(ISOLATION_LEVEL_AUTOCOMMIT)
+    return conn
+
+
+@pytest.fixture
+def cache_dir(tmp_path, monkeypatch):
+    """Points Config.CACHE_DIR at a temporary directory, so cached queries do not leak between tests."""
+    monkeypatch.setattr(Config, 'CACHE_DIR', tmp_path / 'cache')
+    return Config.CACHE_DIR
+
+
+@pytest.fixture
+def config_file(tmp_path, monkeypatch):
+    """Writes ``settings`` as config.json (with the configured database) and points Config at it."""
+    def write(**settings):
+        path = tmp_path / 'config.json'
+        path.write_text(json.dumps(dict({'database': Config().postgresql}, **settings)))
+        monkeypatch.setattr(Config, 'CONFIG_PATH', path)
+        return path
+    return write
+
+
+@pytest.fixture
+def mock_server():
+    """
+    Starts a local HTTP server; ``start(respond)`` returns its base URL. ``respond(path, headers,
+    body)`` returns (status, headers, json payload) for every POST. Received requests are
+    recorded in ``start.requests``.
+    """
+    servers = []
+
+    def start(respond):
+        class Handler(BaseHTTPRequestHandler):
+            def do_POST(self):
+                body = json.loads(self.rfile.read(int(self.headers.get('Content-Length', 0))) or b'null')
+                start.requests.append((self.path, dict(self.headers), body))
+                status, headers, payload = respond(self.path, self.headers, body)
+                content = json.dumps(payload).encode('utf-8')
+                self.send_response(status)
+                for name, value in dict(headers, **{'Content-Length': str(len(content))}).items():
+                    self.send_header(name, value)
+                self.end_headers()
+                self.wfile.write(content)
+
+            def log_message(self, *args):
+                pass
+
+        server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        servers.append(server)
+        return f'http://127.0.0.1:{server.server_port}'
+
+    start.requests = []
+    yield start
+    for server in servers:
+        server.shutdown()
+        server.server_close()
+
+
+@contextmanager
+def _test_database(name, config_dir):
+    """
+    Creates the database ``name`` from scratch on the server and with the credentials of
+    config.json, and yields a PGClient on it. Skips when that server cannot be reached.
+    """
+    settings = dict(Config().postgresql or {}, database=name)
+    try:
+        admin = _admin_connection(settings)
+    except psycopg2.OperationalError as e:
+        pytest.skip(f'PostgreSQL not available: {e}')
+
+    drop = sql.SQL('DROP DATABASE IF EXISTS {} WITH (FORCE)').format(sql.Identifier(name))
+    with admin.cursor() as cursor:
+        cursor.execute(drop)
+        cursor.execute(sql.SQL('CREATE DATABASE {}').format(sql.Identifier(name)))
+
+    config_path = config_dir / 'config.json'
+    config_path.write_text(json.dumps({'database': settings}))
+    with pytest.MonkeyPatch.context() as patch:
+        patch.setattr(Config, 'CONFIG_PATH', config_path)
+        from system_code.server.database.postgres_client import PGClient
+        client = PGClient()
+        try:
+            yield client
+        finally:
+            client.close()
+            with admin.cursor() as cursor:
+                cursor.execute(drop)
+            admin.close()
+
+
+@pytest.fixture(scope='session')
+def pg_client(tmp_path_factory):
+    """
+    PGClient on a freshly created test database, shared by the whole session. Tests using it
+    are skipped when the configured server cannot be reached.
+    """
+    with _test_database(TEST_DATABASE, tmp_path_factory.mktemp('config')) as client:
+        yield client
+
+
+@pytest.fixture
+def schema_pg_client(tmp_path):
+    """
+    PGClient on its own freshly created database, for tests that change the schema. Config
+    points at that database for the duration of the test, so new clients open it too.
+    """
+    with _test_database(f'{TEST_DATABASE}_schema', tmp_path) as client:
+        yield client
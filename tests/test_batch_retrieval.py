@@ -0,0 +1,51 @@
+import time
+import pytest
+from system_code.core.rag import RAG
+
+
+def knowledge_base(delay=0.0):
+    """
+    Search endpoint answering every query with ``limit`` hits. 'unknown ...' queries get response
+    code 1000, and 'broken ...' ones a dropped connection.
+    """
+    def respond(path, headers, body):
+        time.sleep(delay)
+        query = body['query']
+        if query.startswith('unknown'):
+            return 200, {}, {'code': 1000, 'message': 'collection not found'}
+        if query.startswith('broken'):
+            raise ConnectionAbortedError('dropped')
+        hits = [{'content': f'text:{query} {i}\nasin:B00{i}'} for i in range(body['limit'])]
+        return 200, {}, {'code': 0, 'data': {'result_list': hits}}
+    return respond
+
+
+def rag(base_url, **kwargs):
+    return RAG('ak', 'sk', 'api-knowledgebase.example.com', 'account', base_url=base_url, max_retries=0, **kwargs)
+
+
+def test_results_keep_input_order_and_errors_stay_per_query(mock_server):
+    results = rag(mock_server(knowledge_base())).batch_retrieval(['scent', 'unknown query', 'glow'], topk=2)
+
+    assert [item['query'] for item in results] == ['scent', 'unknown query', 'glow']
+    assert results[0] == {'query': 'scent', 'results': ['scent 0', 'scent 1'], 'error': None}
+    assert results[1]['results'] == [] and 'collection not found' in results[1]['error']
+    assert results[2]['results'] == ['glow 0', 'glow 1']
+
+
+def test_queries_run_concurrently(mock_server):
+    client = rag(mock_server(knowledge_base(delay=0.2)))
+    started = time.monotonic()
+    results = client.batch_retrieval([f'query {i}' for i in range(8)], topk=1, max_workers=8)
+    assert time.monotonic() - started < 0.8
+    assert [item['results'] for item in results] == [[f'query {i} 0'] for i in range(8)]
+
+
+def test_retrieval_keeps_its_legacy_return(mock_server):
+    client = rag(mock_server(knowledge_base()))
+    # A non-zero response code gives an empty list, as before
+    assert client.retrieval(['scent', 'unknown query'], topk=1) == [['scent 0'], []]
+    # A request that fails outright raises
+    with pytest.raises(Exception, match='broken query'):
+        client.retrieval(['scent', 'broken query'], topk=1)
+    assert client.retrieval([], topk=1) == []
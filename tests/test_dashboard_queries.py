@@ -0,0 +1,73 @@
+import re
+import pytest
+from system_code.server.fd.backend import dashboard_queries
+
+ALL_FILTERS = {'start_date': '2023-01-01', 'end_date': '2023-06-30', 'real_reviews': 'false', 'sentiment': 'positive'}
+
+# The condition in front of a placeholder, e.g. "day >=" or "sentiment ="
+CONDITION = re.compile(r"(\w+ (?:>=|<=|=))(?: to_date\()?$")
+
+
+def bound_conditions(query, params):
+    """Pairs every %s placeholder of ``query`` with the condition it belongs to and its value."""
+    segments = query.split('%s')[:-1]
+    assert len(segments) == len(params)
+    return [(CONDITION.search(segment.rstrip()).group(1), value) for segment, value in zip(segments, params)]
+
+
+@pytest.mark.parametrize('name', sorted(dashboard_queries.PANELS))
+@pytest.mark.parametrize('args', [
+    {},
+    {'sentiment': 'positive'},
+    {'start_date': '2023-01-01', 'real_reviews': 'true'},
+    ALL_FILTERS,
+])
+def test_placeholders_match_params(name, args):
+    build_query, _ = dashboard_queries.PANELS[name]
+    query, params = build_query(args)
+    assert query.count('%s') == len(params)
+
+
+def test_summary_param_order():
+    query, params = dashboard_queries.summary(ALL_FILTERS)
+    assert bound_conditions(query, params) == [
+        # FILTER clauses of the day panels
+        ('sentiment =', 'positive'),
+        ('sentiment =', 'positive'),
+        # Rollup filters, without the sentiment
+        ('day >=', '2023-01-01'),
+        ('day <=', '2023-06-30'),
+        ('real_review =', False),
+        # Word filters, with the sentiment
+        ('day >=', '2023-01-01'),
+        ('day <=', '2023-06-30'),
+        ('real_review =', False),
+        ('sentiment =', 'positive'),
+    ]
+
+
+def test_summary_param_order_without_sentiment():
+    args = dict(ALL_FILTERS, sentiment='')
+    query, params = dashboard_queries.summary(args)
+    assert bound_conditions(query, params) == [
+        ('day >=', '2023-01-01'),
+        ('day <=', '2023-06-30'),
+        ('real_review =', False),
+        # Word totals, minus the real reviews
+        ('day >=', '2023-01-01'),
+        ('day <=', '2023-06-30'),
+        ('day >=', '2023-01-01'),
+        ('day <=', '2023-06-30'),
+    ]
+
+
+def test_sentiment_panel_ignores_sentiment_filter():
+    query, params = dashboard_queries.sentiment(ALL_FILTERS)
+    assert [condition for condition, _ in bound_conditions(query, params)] == ['day >=', 'day <=', 'real_review =']
+
+
+def test_to_asyncpg_numbers_placeholders_in_order():
+    query, params = dashboard_queries.summary(ALL_FILTERS)
+    rewritten = dashboard_queries.to_asyncpg(query)
+    assert '%s' not in rewritten
+    assert [int(n) for n in re.findall(r'\$(\d+)', rewritten)] == list(range(1, len(params) + 1))
@@ -0,0 +1,94 @@
+import time
+from system_code.core.model_runtime import ModelNotReadyError
+from system_code.core.rag_sdk import RagSdk, StageTimer
+
+QUERY = 'zq budget probe for sub queries'
+
+
+def hit(doc_id, score):
+    return {'id': doc_id, 'score': score, 'content': f'text:{doc_id}\nasin:B000'}
+
+
+class SlowBackend:
+    def __init__(self, delay=0.0):
+        self.delay = delay
+        self.calls = []
+
+    def search(self, query, top_k, dense_weight):
+        self.calls.append(query)
+        time.sleep(self.delay)
+        return [hit(query, 1.0)]
+
+
+class ScriptedRequest:
+    """GenerationRequest stand-in that streams ``pieces`` and then finishes with ``finish_reason``."""
+
+    def __init__(self, pieces, finish_reason):
+        self.pieces = pieces
+        self.final_reason = finish_reason
+        self.finish_reason = None
+
+    def stream(self, deadline=None):
+        for piece in self.pieces:
+            yield piece
+        self.finish_reason = self.final_reason
+
+    def cancel(self):
+        if self.finish_reason is None:
+            self.finish_reason = 'cancelled'
+
+
+def sub_query_pieces(count):
+    return [f'<|sub{i}_start|>aspect {i}<|sub{i}_end|>' for i in range(count)]
+
+
+def budgeted_rag(pieces, finish_reason, backend=None):
+    rag = RagSdk(backend=backend or SlowBackend())
+    rag.submit_deep_search = lambda query, max_new_tokens=512: ScriptedRequest(pieces, finish_reason)
+    return rag
+
+
+def test_sub_query_cap_counts_as_finished(cache_dir):
+    rag = budgeted_rag(sub_query_pieces(5), 'eos')
+    sub_queries, results = rag.deep_search(QUERY, timer=StageTimer(budget=5))
+
+    assert sub_queries == ['aspect 0', 'aspect 1', 'aspect 2']
+    assert len(results) == 3
+    assert rag.sub_query_provider.lookup(QUERY) == sub_queries
+    assert rag.query_cache.get('deep_search', QUERY, (10, 0.7)) == (True, [sub_queries, results])
+
+
+def test_truncated_sub_queries_are_not_cached(cache_dir):
+    # The token cap ends decoding after two of the sub-queries
+    rag = budgeted_rag(sub_query_pieces(2) + ['<|sub2_start|>asp'], 'length')
+    sub_queries, results = rag.deep_search(QUERY, timer=StageTimer(budget=5))
+
+    assert sub_queries == ['aspect 0', 'aspect 1']
+    assert len(results) == 2
+    assert rag.sub_query_provider.lookup(QUERY) is None
+    assert rag.query_cache.get('deep_search', QUERY, (10, 0.7)) == (False, None)
+
+
+def not_ready(query, max_new_tokens=512):
+    raise ModelNotReadyError('still loading')
+
+
+def test_fallback_search_while_model_loads(cache_dir):
+    backend = SlowBackend()
+    rag = RagSdk(backend=backend)
+    rag.submit_deep_search = not_ready
+    timer = StageTimer(budget=5)
+
+    assert rag.deep_search(QUERY, timer=timer) == ([], [hit(QUERY, 1.0)])
+    assert timer.fallback
+    assert backend.calls == [QUERY]
+
+
+def test_fallback_search_is_bounded_by_the_budget(cache_dir):
+    rag = RagSdk(backend=SlowBackend(delay=1.0))
+    rag.submit_deep_search = not_ready
+    timer = StageTimer(budget=0.2)
+
+    assert rag.deep_search(QUERY, timer=timer) == ([], [])
+    assert timer.elapsed() < 0.6
+    assert timer.stages[-1]['stage'] == 'fallback_search' and timer.stages[-1]['timed_out']
@@ -0,0 +1,139 @@
+import time
+import threading
+import pytest
+import torch
+from system_code.core.generation import GenerationService
+
+EOS = 1
+
+
+class CharTokenizer:
+    """One token per character (its code point); id 1 is EOS and padding."""
+
+    eos_token = '<eos>'
+    eos_token_id = EOS
+
+    def __init__(self):
+        self.pad_token = None
+        self.padding_side = 'right'
+
+    @property
+    def pad_token_id(self):
+        return EOS if self.pad_token is not None else None
+
+    def __call__(self, prompts, return_tensors, padding, truncation, max_length):
+        width = max(len(prompt) for prompt in prompts)
+        rows = [[EOS] * (width - len(prompt)) + [ord(c) for c in prompt] for prompt in prompts]
+        return _Inputs(input_ids=torch.tensor(rows))
+
+    def decode(self, token_ids, skip_special_tokens=True, clean_up_tokenization_spaces=False):
+        return ''.join(chr(token_id) for token_id in token_ids if token_id != EOS)
+
+
+class _Inputs(dict):
+    def to(self, device):
+        return self
+
+
+class EchoModel:
+    """Causal LM stand-in answering every prompt with the prompt upper-cased, one character per step."""
+
+    device = torch.device('cpu')
+
+    def __init__(self, step_delay=0.0, fail=False):
+        self.step_delay = step_delay
+        self.fail = fail
+        self.batches = []
+        self.steps = 0
+        self.started = threading.Event()
+
+    def generate(self, input_ids, streamer, stopping_criteria, pad_token_id, max_new_tokens=20, **options):
+        prompts = [''.join(chr(token_id) for token_id in row if token_id != EOS) for row in input_ids.tolist()]
+        self.batches.append(prompts)
+        self.started.set()
+        if self.fail:
+            raise RuntimeError('out of memory')
+        streamer.put(input_ids)
+        for step in range(max_new_tokens):
+            time.sleep(self.step_delay)
+            self.steps += 1
+            tokens = [ord(prompt.upper()[step]) if step < len(prompt) else EOS for prompt in prompts]
+            tokens = torch.tensor(tokens).unsqueeze(1)
+            input_ids = torch.cat([input_ids, tokens], dim=1)
+            streamer.put(tokens)
+            if stopping_criteria(input_ids, None).all():
+                break
+        streamer.end()
+
+
+def test_concurrent_prompts_are_decoded_in_one_batch():
+    model = EchoModel()
+    service = GenerationService(model, CharTokenizer(), max_batch_size=4, max_wait=0.2)
+    requests = [service.submit(prompt) for prompt in ('ab', 'scent', 'glow', 'x')]
+
+    assert [request.result(timeout=5) for request in requests] == ['AB', 'SCENT', 'GLOW', 'X']
+    assert model.batches == [['ab', 'scent', 'glow', 'x']]
+    assert {request.finish_reason for request in requests} == {'eos'}
+
+
+def test_different_options_are_decoded_separately():
+    model = EchoModel()
+    service = GenerationService(model, CharTokenizer(), max_batch_size=4, max_wait=0.2)
+    short = service.submit('lovely', max_new_tokens=3)
+    full = service.submit('lovely')
+
+    assert (short.result(timeout=5), short.finish_reason) == ('LOV', 'length')
+    assert (full.result(timeout=5), full.finish_reason) == ('LOVELY', 'eos')
+    assert sorted(map(len, model.batches)) == [1, 1]
+
+
+def test_stream_yields_pieces_as_they_are_decoded():
+    service = GenerationService(EchoModel(step_delay=0.01), CharTokenizer(), max_wait=0.0)
+    request = service.submit('smooth')
+    pieces = list(request.stream(timeout=5))
+
+    assert pieces == list('SMOOTH')
+    assert request.result(timeout=5) == 'SMOOTH'
+
+
+def test_stream_deadline_raises_timeout():
+    service = GenerationService(EchoModel(step_delay=0.05), CharTokenizer(), max_wait=0.0)
+    request = service.submit('a long answer', max_new_tokens=50)
+    with pytest.raises(TimeoutError):
+        list(request.stream(deadline=time.monotonic() + 0.12))
+    request.cancel()
+
+
+def test_cancelling_every_request_stops_the_batch():
+    model = EchoModel(step_delay=0.01)
+    service = GenerationService(model, CharTokenizer(), max_wait=0.0)
+    request = service.submit('a' * 40, max_new_tokens=40)
+    next(request.stream(timeout=5))
+    request.cancel()
+
+    # The next batch only starts once the cancelled one has stopped decoding
+    assert service.generate('ok', timeout=5) == 'OK'
+    assert request.finish_reason == 'cancelled'
+    assert model.steps < 40
+
+
+def test_requests_cancelled_while_queued_are_not_decoded():
+    model = EchoModel(step_delay=0.02)
+    service = GenerationService(model, CharTokenizer(), max_batch_size=1, max_wait=0.0)
+    running = service.submit('busy')
+    assert model.started.wait(5)
+    queued = service.submit('never')
+    queued.cancel()
+
+    assert running.result(timeout=5) == 'BUSY'
+    assert service.generate('next', timeout=5) == 'NEXT'
+    assert ['never'] not in model.batches
+
+
+def test_batch_errors_reach_every_request():
+    service = GenerationService(EchoModel(fail=True), CharTokenizer(), max_wait=0.1)
+    requests = [service.submit('a'), service.submit('b')]
+    for request in requests:
+        with pytest.raises(RuntimeError, match='out of memory'):
+            request.result(timeout=5)
+        assert request.finish_reason == 'error'
@@ -0,0 +1,41 @@
+import os
+import joblib
+import pandas as pd
+import pytest
+from system_code.core.config import Config
+from system_code.core.linear_models import LinearTextModel, SharedFeatures
+
+MODELS = [
+    ('sentiment', 'tfidf_sentiment_vectorizer.pkl', 'logistic_regression_sentiment_model.pkl'),
+    ('bot', 'tfidf_vectorizer.pkl', 'logistic_regression_model.pkl'),
+]
+# Texts the bundled reviews may not cover: empty, out of vocabulary, non-ASCII, one-letter words
+EDGE_CASES = ['', '!!!', 'a b c', 'zzzqqq xxyyzz', 'Très BIEN, très bien', 'don\'t buy_this 2x 100ml', 'éé ÅÅ']
+
+
+@pytest.fixture(scope='module')
+def texts():
+    """A sample of the bundled reviews, titles and texts alike."""
+    path = Config.STATICS_PATH / 'datasets' / 'reviews' / 'csv' / 'All_Beauty_part_1.csv'
+    df = pd.read_csv(path, nrows=1000, usecols=['title', 'text'])
+    return df['text'].fillna('').tolist() + df['title'].fillna('').tolist() + EDGE_CASES
+
+
+@pytest.fixture(scope='module')
+def exported(tmp_path_factory):
+    """The NumPy exports, written to a temporary directory instead of the model directory."""
+    with pytest.MonkeyPatch.context() as patch:
+        patch.setattr(LinearTextModel, 'EXPORT_DIR', tmp_path_factory.mktemp('fast'))
+        return {name: LinearTextModel.from_pickles(name, vectorizer, model) for name, vectorizer, model in MODELS}
+
+
+@pytest.mark.parametrize('name, vectorizer_file, model_file', MODELS)
+def test_predict_batch_matches_sklearn(exported, texts, name, vectorizer_file, model_file):
+    vectorizer = joblib.load(os.path.join(Config.MODEL_DIR, vectorizer_file))
+    model = joblib.load(os.path.join(Config.MODEL_DIR, model_file))
+    assert exported[name].predict_batch(texts) == model.predict(vectorizer.transform(texts)).tolist()
+
+
+def test_shared_features_match_each_model(exported, texts):
+    models = [exported[name] for name, _, _ in MODELS]
+    assert SharedFeatures(models).predict(texts) == [model.predict_batch(texts) for model in models]
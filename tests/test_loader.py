@@ -0,0 +1,64 @@
+import json
+import pandas as pd
+from system_code.server.database.postgres_client import PGClient
+
+COLUMNS = PGClient.REVIEW_COLUMNS + ['real_review', 'sentiment', 'summary']
+
+
+def reviews(count, user='loader', rating=3.0):
+    return pd.DataFrame([{
+        'rating': rating, 'title': f'title {i}', 'text': f'loader review {i}', 'images': ['http://img/1.jpg'],
+        'asin': 'L1', 'parent_asin': 'LP1', 'user_id': f'{user}{i}', 'timestamp': 1690000000000 + i * 1000,
+        'verified_purchase': True, 'helpful_vote': i, 'real_review': False, 'sentiment': '', 'summary': '',
+    } for i in range(count)], columns=COLUMNS)
+
+
+def seq_range(pg_client, user):
+    return pg_client.execute("SELECT min(review_seq), max(review_seq), count(*) FROM beauty_reviews "
+                             "WHERE user_id LIKE %s", (user + '%',))[0]
+
+
+def test_review_seq_advances_once_per_row(pg_client):
+    assert pg_client.insert_dataframe('beauty_reviews', reviews(50, user='seq-first'), chunk_size=20) == (50, 0)
+    first, last, count = seq_range(pg_client, 'seq-first')
+    assert (last - first + 1, count) == (50, 50)
+    # The staging table is dropped with its transaction and built afresh for the next load
+    assert pg_client.insert_dataframe('beauty_reviews', reviews(5, user='seq-again')) == (5, 0)
+    assert seq_range(pg_client, 'seq-again') == (last + 1, last + 5, 5)
+
+
+def test_rejected_rows_are_set_aside(pg_client, tmp_path):
+    frame = reviews(30, user='reject')
+    frame['rating'] = frame['rating'].astype(object)
+    frame.loc[[4, 17], 'rating'] = 'not a number'
+    reject_path = tmp_path / 'rejected.jsonl'
+
+    assert pg_client.insert_dataframe('beauty_reviews', frame, chunk_size=8, reject_path=str(reject_path)) == (28, 2)
+    rejected = [json.loads(line) for line in reject_path.read_text().splitlines()]
+    assert sorted(record['row']['user_id'] for record in rejected) == ['reject17', 'reject4']
+    assert all('not a number' in record['error'] for record in rejected)
+    assert pg_client.execute("SELECT count(*) FROM beauty_reviews WHERE user_id LIKE 'reject%%'")[0][0] == 28
+
+
+def write_dump(path, frame):
+    if path.suffix == '.jsonl':
+        frame.to_json(path, orient='records', lines=True)
+    else:
+        frame.to_csv(path, index=False)
+    return str(path)
+
+
+def test_review_files_are_streamed_in_chunks(pg_client, tmp_path):
+    raw = reviews(25, user='stream-csv')[PGClient.REVIEW_COLUMNS]
+    csv_path = write_dump(tmp_path / 'reviews.csv', raw)
+    jsonl_path = write_dump(tmp_path / 'reviews.jsonl', raw.assign(user_id=raw['user_id'].str.replace('csv', 'jsonl')))
+
+    for path in (csv_path, jsonl_path):
+        chunks = list(pg_client.iter_review_chunks(path, chunk_size=10))
+        assert [len(chunk) for chunk in chunks] == [10, 10, 5]
+        # Epoch-ms timestamps stay integers, JSONL included
+        assert chunks[0]['timestamp'].tolist()[:2] == [1690000000000, 1690000001000]
+
+    pg_client.init_reviews([csv_path, str(tmp_path / 'missing.csv'), jsonl_path], chunk_size=10)
+    assert seq_range(pg_client, 'stream-csv')[2] == 25
+    assert seq_range(pg_client, 'stream-jsonl')[2] == 25
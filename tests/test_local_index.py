@@ -0,0 +1,52 @@
+import glob
+import os
+import zlib
+import numpy as np
+import pandas as pd
+from system_code.core.local_index import LocalVectorIndex
+
+TEXTS = ['lovely scent', 'greasy and sticky', 'smooth glow all day', 'broke after a week', 'refund please',
+         'scent fades fast', 'sticky pump', 'lovely glow', 'smooth finish', 'greasy smell']
+
+
+class HashEmbedder:
+    """Deterministic stand-in for TextEmbedder: one unit vector per text."""
+
+    model_name = 'hash'
+    dim = 16
+
+    def encode(self, texts):
+        vectors = np.stack([np.random.default_rng(zlib.crc32(text.encode('utf-8'))).standard_normal(self.dim)
+                            for text in texts]).astype(np.float32)
+        return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+
+def load_reviews(client, texts):
+    df = pd.DataFrame([{
+        'rating': 5.0, 'title': '', 'text': text, 'images': '[]', 'asin': 'A1', 'parent_asin': 'P1',
+        'user_id': f'user{i}', 'timestamp': 1677628800000, 'verified_purchase': True, 'helpful_vote': 0,
+    } for i, text in enumerate(texts)], columns=client.REVIEW_COLUMNS)
+    client.insert_dataframe('beauty_reviews', client._prepare_review_chunk(df))
+
+
+def test_sync_compacts_bm25_chunks(schema_pg_client, tmp_path):
+    load_reviews(schema_pg_client, TEXTS)
+    index = LocalVectorIndex(tmp_path, embedder=HashEmbedder(), pg_client=schema_pg_client)
+    index.MAX_BM25_CHUNKS = 3
+    changes = []
+    index.on_change(lambda: changes.append(index.meta['count']))
+
+    # Five chunks of two reviews, merged into one at the end of the sync
+    assert index.sync_from_postgres(batch_size=2) == len(TEXTS)
+    assert index.meta['chunks'] == [0]
+    assert len(glob.glob(os.path.join(tmp_path, 'bm25_*.npz'))) == 1
+    assert changes == [len(TEXTS)]
+    assert index.sync_from_postgres(batch_size=2) == 0
+    assert changes == [len(TEXTS)]
+
+    # The merged chunk scores like the separate ones did, also after a reload
+    expected = [text for text in TEXTS if 'sticky' in text]
+    hits = index.search('sticky', top_k=2, dense_weight=0.0)
+    assert sorted(hit['content'].split('\n')[0] for hit in hits) == sorted(f'text:{text}' for text in expected)
+    reopened = LocalVectorIndex(tmp_path, embedder=HashEmbedder(), pg_client=schema_pg_client)
+    assert reopened.search('sticky', top_k=2, dense_weight=0.0) == hits
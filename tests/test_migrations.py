@@ -0,0 +1,92 @@
+import pandas as pd
+from system_code.server.database.postgres_client import PGClient
+
+DAY_MS = 24 * 3600 * 1000
+# 2023-01-15 00:00 UTC
+START_MS = 1673740800000
+
+
+def reviews(start, count, step_days=20):
+    """``count`` reviews ``step_days`` apart, so they span several months."""
+    rows = [{
+        'rating': 5.0,
+        'title': f'title {i}',
+        'text': f'lovely scent {i}',
+        'images': '[]',
+        'asin': 'A1',
+        'parent_asin': 'P1',
+        'user_id': f'user{i}',
+        'timestamp': START_MS + i * step_days * DAY_MS,
+        'verified_purchase': True,
+        'helpful_vote': 0,
+    } for i in range(start, start + count)]
+    return pd.DataFrame(rows, columns=PGClient.REVIEW_COLUMNS)
+
+
+class PositiveAnalyzer:
+    def batch_process(self, texts, cache=None):
+        return ['positive'] * len(texts), [1] * len(texts), ['summary'] * len(texts)
+
+
+def review_indexes(client):
+    return {row[0] for row in client.execute("SELECT indexname FROM pg_indexes WHERE tablename = 'beauty_reviews'")}
+
+
+def test_migrate_applies_each_version_once(schema_pg_client):
+    client = schema_pg_client
+    versions = [version for version, _, _ in PGClient.MIGRATIONS]
+    assert [row[0] for row in client.execute("SELECT version FROM schema_migrations ORDER BY version")] == versions
+
+    # A migration that is not recorded yet is applied again, the others are left alone
+    client.execute("DROP INDEX beauty_reviews_filter_idx")
+    client.execute("DELETE FROM schema_migrations WHERE version = 2")
+    client.migrate()
+    client.migrate()
+    assert 'beauty_reviews_filter_idx' in review_indexes(client)
+    assert [row[0] for row in client.execute("SELECT version FROM schema_migrations ORDER BY version")] == versions
+
+
+def test_partition_reviews_by_month(schema_pg_client):
+    client = schema_pg_client
+    client.insert_dataframe('beauty_reviews', client._prepare_review_chunk(reviews(0, 10)))
+    # Loaded reviews default to timestamp 0, so only other writers leave it NULL
+    client.execute("INSERT INTO beauty_reviews (user_id, text) VALUES ('user10', 'lovely scent 10')")
+    indexes = review_indexes(client)
+    before = client.execute("SELECT review_id, review_seq FROM beauty_reviews ORDER BY review_seq")
+
+    client.partition_reviews_by_month()
+    client.partition_reviews_by_month()
+
+    assert client.execute("SELECT relkind FROM pg_class WHERE relname = 'beauty_reviews'") == [('p',)]
+    # Jan 2023 to Jul 2023, plus the default partition for the review without a timestamp
+    partitions = client.execute("SELECT COUNT(*) FROM pg_inherits WHERE inhparent = 'beauty_reviews'::regclass")
+    assert partitions == [(8,)]
+    assert client.execute("SELECT COUNT(*) FROM beauty_reviews_default") == [(1,)]
+    assert client.execute("SELECT review_id, review_seq FROM beauty_reviews ORDER BY review_seq") == before
+    # The indexes of the migrations are recreated, and the primary key moves to (review_id, timestamp)
+    assert indexes - {'beauty_reviews_pkey'} <= review_indexes(client)
+    # The sequences now belong to the new table and carry on where they left off
+    assert client.execute("SELECT pg_get_serial_sequence('beauty_reviews', 'review_seq') IS NOT NULL") == [(True,)]
+
+    # A new client opens the partitioned table, creates partitions for new months and processes reviews
+    reopened = PGClient()
+    try:
+        reopened.insert_dataframe('beauty_reviews', reopened._prepare_review_chunk(reviews(20, 2)))
+        seqs = reopened.execute("SELECT review_seq FROM beauty_reviews WHERE user_id IN ('user20', 'user21')")
+        assert min(seqs)[0] > before[-1][1]
+        # Feb and Mar 2024
+        assert reopened.execute(
+            "SELECT COUNT(*) FROM pg_inherits WHERE inhparent = 'beauty_reviews'::regclass") == [(10,)]
+
+        processed, after_id = 0, None
+        while True:
+            count, after_id = reopened.claim_and_process_batch(PositiveAnalyzer(), 4, after_id)
+            processed += count
+            if after_id is None:
+                break
+        assert processed == 13
+        assert reopened.execute("SELECT COUNT(*) FROM beauty_reviews WHERE sentiment = 'positive'") == [(13,)]
+        assert reopened.execute(
+            "SELECT SUM(review_count) FROM daily_review_stats WHERE sentiment = 'positive'") == [(12,)]
+    finally:
+        reopened.close()
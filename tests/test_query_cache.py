@@ -0,0 +1,72 @@
+import time
+from system_code.core.query_cache import QueryCache
+from system_code.core.rag_sdk import RagSdk
+
+
+def test_exact_match_ignores_case_and_punctuation():
+    cache = QueryCache()
+    cache.set('search', 'Does it smell nice?', (10, 0.7), ['hit'])
+    assert cache.get('search', 'does it  smell nice', (10, 0.7)) == (True, ['hit'])
+    assert cache.get('search', 'does it smell nice', (5, 0.7)) == (False, None)
+    assert cache.get('deep_search', 'does it smell nice', (10, 0.7)) == (False, None)
+
+
+def test_entries_expire_and_are_evicted_least_recently_used_first():
+    cache = QueryCache(max_entries=2)
+    cache.set('search', 'short lived', (), 1, ttl=0.01)
+    time.sleep(0.02)
+    assert cache.get('search', 'short lived') == (False, None)
+
+    cache.set('search', 'a', (), 'a')
+    cache.set('search', 'b', (), 'b')
+    cache.get('search', 'a')
+    cache.set('search', 'c', (), 'c')
+    assert cache.get('search', 'b') == (False, None)
+    assert cache.get('search', 'a') == (True, 'a')
+    assert cache.stats()['evictions'] == 2
+
+
+def test_reload_keeps_the_most_recently_used(tmp_path):
+    path = str(tmp_path / 'queries.sqlite')
+    cache = QueryCache(path=path)
+    cache.TOUCH_BATCH = 2
+    for query in ('old favourite', 'one off', 'another one off'):
+        cache.set('search', query, (), query)
+        time.sleep(0.01)
+
+    # Hits are written in batches of TOUCH_BATCH
+    cache.get('search', 'one off')
+    assert QueryCache(max_entries=1, path=path).get('search', 'another one off')[0]
+    cache.get('search', 'old favourite')
+    assert QueryCache(max_entries=1, path=path).get('search', 'old favourite') == (True, 'old favourite')
+
+    # Pending hits also go out with the next set()
+    cache.get('search', 'one off')
+    cache.set('search', 'newest', (), 'newest')
+    assert QueryCache(max_entries=2, path=path).get('search', 'one off') == (True, 'one off')
+
+
+class ChangingBackend:
+    """Backend announcing index changes like LocalVectorIndex.on_change."""
+
+    def __init__(self):
+        self.callbacks = []
+
+    def on_change(self, callback):
+        self.callbacks.append(callback)
+
+    def search(self, query, top_k, dense_weight):
+        return [{'id': 'a', 'score': 1.0, 'content': query}]
+
+
+def test_index_changes_clear_cached_results(cache_dir):
+    backend = ChangingBackend()
+    rag = RagSdk(backend=backend)
+    rag.search('lovely scent')
+    assert rag.query_cache.get('search', 'lovely scent', (10, 0.7))[0]
+
+    for callback in backend.callbacks:
+        callback()
+    assert rag.query_cache.get('search', 'lovely scent', (10, 0.7)) == (False, None)
+    # Also after a restart
+    assert RagSdk(backend=backend).query_cache.get('search', 'lovely scent', (10, 0.7)) == (False, None)
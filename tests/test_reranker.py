@@ -0,0 +1,71 @@
+import pytest
+from system_code.core.config import Config
+from system_code.core.model_runtime import ModelNotReadyError
+from system_code.core.rag_sdk import RagSdk
+from system_code.core.reranker import LocalReranker
+
+
+def hit(doc_id, text, score):
+    return {'id': doc_id, 'score': score, 'content': f'text:{text}\nasin:B000'}
+
+
+class LoadingRuntime:
+    """ModelRuntime whose model never finishes loading."""
+
+    def load(self, key, loader, wait=True):
+        raise ModelNotReadyError(f'{key} is still loading')
+
+
+class StaticBackend:
+    def __init__(self, hits):
+        self.hits = hits
+
+    def search(self, query, top_k, dense_weight):
+        return self.hits
+
+
+def loading_reranker():
+    reranker = LocalReranker('cross-encoder/test', wait=False)
+    reranker.runtime = LoadingRuntime()
+    return reranker
+
+
+def test_lexical_rerank_orders_by_query_terms():
+    hits = [hit('a', 'cheap bottle', 0.9), hit('b', 'lovely scent that lasts', 0.1), hit('c', 'lovely box', 0.5)]
+    details = {}
+    ranked = LocalReranker().rerank('lovely lasting scent', hits, top_k=2, details=details)
+    assert [item['id'] for item in ranked] == ['b', 'c']
+    assert ranked[0]['rerank_score'] == pytest.approx(2 / 3)
+    # Without a model, the lexical score is the scorer, not a stand-in
+    assert details == {'scorer': 'lexical', 'fallback': False}
+
+
+def test_rerank_reports_fallback_while_model_loads():
+    details = {}
+    loading_reranker().rerank('scent', [hit('a', 'scent', 1.0)], details=details)
+    assert details == {'scorer': 'lexical', 'fallback': True}
+
+
+def test_rerank_is_opt_in(config_file, cache_dir):
+    config_file()
+    assert Config().retrieval['rerank'] is False
+    assert RagSdk(backend=StaticBackend([])).reranker is None
+
+    config_file(retrieval={'rerank': True, 'reranker_model': None})
+    assert isinstance(RagSdk(backend=StaticBackend([])).reranker, LocalReranker)
+
+
+def test_deep_search_does_not_cache_fallback_ranking(cache_dir):
+    backend = StaticBackend([hit('a', 'a lovely smell', 0.4), hit('b', 'sticky', 0.8)])
+    rag = RagSdk(backend=backend, reranker=loading_reranker())
+    rag.sub_query_provider.store('how does it smell', ['scent of the perfume', 'does the smell last'])
+
+    sub_queries, results = rag.deep_search('how does it smell')
+    assert sub_queries == ['scent of the perfume', 'does the smell last']
+    assert [item['id'] for item in results] == ['a', 'b']
+    assert rag.query_cache.get('deep_search', 'how does it smell', (10, 0.7)) == (False, None)
+
+    # Once the lexical score is the configured scorer the answer is cached as usual
+    rag.reranker = LocalReranker()
+    rag.deep_search('how does it smell')
+    assert rag.query_cache.get('deep_search', 'how does it smell', (10, 0.7))[0]
@@ -0,0 +1,63 @@
+import time
+from flask import Flask, jsonify, request
+from system_code.server.fd.backend.cache import ResponseCache
+
+
+def test_key_normalizes_arguments():
+    key = ResponseCache.make_key('search', {'query': ' lovely   scent ', 'limit': '10', 'real_reviews': 'TRUE'})
+    assert key == ResponseCache.make_key('search', {'real_reviews': 'true', 'limit': 10, 'query': 'lovely scent',
+                                                    'sentiment': '', 'unrelated': 'x'})
+    assert key != ResponseCache.make_key('search', {'query': 'lovely scent', 'limit': 10})
+    assert key != ResponseCache.make_key('dashboard/summary', {'query': 'lovely scent', 'limit': 10,
+                                                               'real_reviews': 'true'})
+
+
+def test_entries_expire_and_are_evicted():
+    cache = ResponseCache(max_entries=2)
+    cache.set('short', 1, ttl=0.01)
+    time.sleep(0.02)
+    assert cache.get('short') == (False, None)
+
+    for key in ('a', 'b', 'c'):
+        cache.set(key, key)
+    assert cache.get('a') == (False, None)
+    assert cache.get('c') == (True, 'c')
+    assert cache.stats()['evictions'] == 1
+
+
+def test_shared_store_and_invalidation(tmp_path):
+    path = str(tmp_path / 'responses.sqlite')
+    first, second = ResponseCache(shared_path=path), ResponseCache(shared_path=path)
+    first.set('dashboard/summary?{}', {'success': True})
+
+    assert second.get('dashboard/summary?{}') == (True, {'success': True})
+    assert second.stats()['shared_hits'] == 1
+
+    # One process invalidating empties the shared level; each process drops its own local level
+    first.invalidate()
+    second.invalidate()
+    assert second.get('dashboard/summary?{}') == (False, None)
+    assert ResponseCache(shared_path=path).get('dashboard/summary?{}') == (False, None)
+
+
+def test_cached_view_serves_hits_and_skips_failures():
+    cache = ResponseCache()
+    app = Flask(__name__)
+    calls = []
+
+    @app.route('/api/search')
+    @cache.cached('search')
+    def search():
+        calls.append(request.args.get('query'))
+        return jsonify({'success': request.args.get('query') != 'broken', 'data': len(calls)})
+
+    client = app.test_client()
+    first = client.get('/api/search?query=scent')
+    again = client.get('/api/search?query=%20scent%20')
+    assert (first.headers['X-Cache'], again.headers['X-Cache']) == ('MISS', 'HIT')
+    assert first.get_json() == again.get_json() == {'success': True, 'data': 1}
+
+    # Failed responses are not stored
+    client.get('/api/search?query=broken')
+    client.get('/api/search?query=broken')
+    assert calls == ['scent', 'broken', 'broken']
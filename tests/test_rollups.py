@@ -0,0 +1,115 @@
+import zlib
+from collections import Counter
+import pandas as pd
+import pytest
+from system_code.core.wordcloud import count_words
+from system_code.server.fd.backend import dashboard_queries
+
+DAY_MS = 24 * 3600 * 1000
+# 2023-03-01 00:00 UTC
+START_MS = 1677628800000
+WORDS = ['smooth', 'greasy', 'lovely', 'broke', 'scent', 'refund', 'glow', 'sticky']
+FILTERS = [
+    {},
+    {'sentiment': 'positive'},
+    {'start_date': '2023-03-02', 'end_date': '2023-03-04', 'real_reviews': 'true'},
+    {'real_reviews': 'false'},
+    {'start_date': '2023-03-02', 'real_reviews': 'false', 'sentiment': 'negative'},
+]
+
+
+def review_frame(pg_client, start, count):
+    """``count`` reviews spread over a few days, with overlapping words and some missing texts."""
+    rows = []
+    for i in range(start, start + count):
+        rows.append({
+            'rating': float(i % 5 + 1),
+            'title': f'title {i}',
+            'text': '' if i % 11 == 0 else ' '.join(WORDS[(i + k) % len(WORDS)] for k in range(i % 4 + 2)),
+            'images': '[]',
+            'asin': f'A{i % 3}',
+            'parent_asin': f'P{i % 3}',
+            'user_id': f'user{i}',
+            'timestamp': START_MS + (i % 6) * DAY_MS + i * 1000,
+            'verified_purchase': i % 2 == 0,
+            'helpful_vote': i % 7,
+        })
+    return pg_client._prepare_review_chunk(pd.DataFrame(rows, columns=pg_client.REVIEW_COLUMNS))
+
+
+class FakeAnalyzer:
+    """Deterministic stand-in for TextAnalysis: the labels only depend on the text."""
+
+    def batch_process(self, texts, cache=None):
+        labels = [zlib.crc32(text.encode('utf-8')) for text in texts]
+        sentiments = [('positive', 'negative', 'neutral')[label % 3] for label in labels]
+        is_reals = [label % 4 != 0 for label in labels]
+        return sentiments, is_reals, [f'summary {label}' for label in labels]
+
+
+def process_all(pg_client, batch_size):
+    after_id = None
+    while True:
+        _, after_id = pg_client.claim_and_process_batch(FakeAnalyzer(), batch_size, after_id)
+        if after_id is None:
+            return
+
+
+def rollup(pg_client, table, count_column):
+    # Buckets can drop to zero when every review moves out of them; a rebuild does not create those
+    return sorted(pg_client.execute(f"SELECT * FROM {table} WHERE {count_column} <> 0"))
+
+
+@pytest.fixture(scope='module')
+def loaded(pg_client):
+    """Reviews loaded and classified in several increments, as ingest and processing runs do."""
+    pg_client.insert_dataframe('beauty_reviews', review_frame(pg_client, 0, 60))
+    process_all(pg_client, batch_size=7)
+    # New reviews landing on days that already have processed ones
+    pg_client.insert_dataframe('beauty_reviews', review_frame(pg_client, 60, 40))
+    process_all(pg_client, batch_size=9)
+    # And some still waiting for classification
+    pg_client.insert_dataframe('beauty_reviews', review_frame(pg_client, 100, 15))
+    return pg_client
+
+
+def test_daily_review_stats_matches_rebuild(loaded):
+    incremental = rollup(loaded, 'daily_review_stats', 'review_count')
+    assert incremental
+
+    loaded.refresh_daily_review_stats()
+    assert rollup(loaded, 'daily_review_stats', 'review_count') == incremental
+
+
+def test_word_rollups_match_rebuild(loaded):
+    incremental = [rollup(loaded, table, 'word_count') for table in ('daily_word_totals', 'daily_word_stats')]
+    assert all(incremental)
+
+    loaded.refresh_daily_word_stats()
+    assert [rollup(loaded, table, 'word_count') for table in ('daily_word_totals', 'daily_word_stats')] == incremental
+
+
+@pytest.mark.parametrize('args', FILTERS)
+def test_wordcloud_matches_reviews(loaded, args):
+    filters = dashboard_queries.ReviewFilters(args)
+    conditions, params = filters.conditions()
+    day = loaded.REVIEW_DAY_SQL.format('timestamp')
+    counts = Counter()
+    for (text,) in loaded.execute(f"SELECT text FROM (SELECT {day} AS day, * FROM beauty_reviews) AS r "
+                                  f"WHERE timestamp IS NOT NULL AND {conditions}", params):
+        counts.update(count_words(text or ''))
+    expected = sorted(counts.items(), key=lambda item: (-item[1], item[0]))[:100]
+
+    query, params = dashboard_queries.wordcloud(args)
+    assert loaded.execute(query, params) == expected
+
+
+@pytest.mark.parametrize('args', FILTERS)
+def test_summary_matches_panels(loaded, args):
+    query, params = dashboard_queries.summary(args)
+    summary = dashboard_queries.format_summary(loaded.execute(query, params))
+
+    for name in ('bot_rate', 'sentiment', 'wordcloud', 'review_trend'):
+        build_query, format_rows = dashboard_queries.PANELS[name]
+        query, params = build_query(args)
+        assert summary[name] == format_rows(loaded.execute(query, params)), name
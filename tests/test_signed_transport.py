@@ -0,0 +1,68 @@
+import socket
+import pytest
+import requests
+from system_code.core.rag import SignedTransport
+
+
+def transport(base_url, **kwargs):
+    return SignedTransport('ak', 'sk', 'api-knowledgebase.example.com', 'account', base_url=base_url,
+                           backoff=0.001, **kwargs)
+
+
+def scripted(*statuses):
+    """Answers with ``statuses`` in turn, then keeps repeating the last one."""
+    remaining = list(statuses)
+
+    def respond(path, headers, body):
+        status = remaining.pop(0) if len(remaining) > 1 else remaining[0]
+        return status, {}, {'code': 0 if status == 200 else status}
+    return respond
+
+
+def test_retries_transient_errors_and_re_signs(mock_server):
+    client = transport(mock_server(scripted(503, 429, 200)))
+    response = client.post('/api/knowledge/collection/search', {'query': 'scent'})
+
+    assert response.status_code == 200
+    assert len(mock_server.requests) == 3
+    for path, headers, body in mock_server.requests:
+        assert path == '/api/knowledge/collection/search'
+        assert body == {'query': 'scent'}
+        # Signed for the real domain, whatever base_url points at
+        assert headers['Host'] == 'api-knowledgebase.example.com'
+        assert headers['Authorization'].startswith('HMAC-SHA256 Credential=ak/')
+
+
+def test_client_errors_are_not_retried(mock_server):
+    response = transport(mock_server(scripted(400))).post('/api/knowledge/collection/search', {})
+    assert response.status_code == 400
+    assert len(mock_server.requests) == 1
+
+
+def test_last_response_is_returned_once_retries_run_out(mock_server):
+    response = transport(mock_server(scripted(500)), max_retries=2).post('/api/knowledge/collection/search', {})
+    assert response.status_code == 500
+    assert len(mock_server.requests) == 3
+
+
+def test_connection_errors_are_raised_once_retries_run_out(monkeypatch):
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        port = s.getsockname()[1]
+    delays = []
+    monkeypatch.setattr('system_code.core.rag.time.sleep', delays.append)
+
+    with pytest.raises(requests.ConnectionError):
+        transport(f'http://127.0.0.1:{port}', max_retries=2).post('/api/knowledge/collection/search', {})
+    assert len(delays) == 2
+
+
+def test_backoff_honours_retry_after_up_to_the_cap():
+    client = SignedTransport('ak', 'sk', 'example.com', 'account', backoff=0.5, max_backoff=8.0)
+    assert all(0 <= client.backoff_delay(attempt) <= min(8.0, 0.5 * 2 ** attempt) for attempt in range(6))
+
+    response = requests.Response()
+    response.headers['Retry-After'] = '3'
+    assert 3 <= client.backoff_delay(0, response) <= 8.0
+    response.headers['Retry-After'] = '120'
+    assert client.backoff_delay(0, response) == 8.0
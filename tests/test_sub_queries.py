@@ -0,0 +1,48 @@
+import json
+from system_code.core.sub_queries import SubQueryProvider
+
+
+def provider(tmp_path, generated):
+    seed = tmp_path / 'seed.json'
+    seed.write_text(json.dumps([
+        {'query': 'How long does the scent last?', 'sub_queries': ['scent duration', 'fragrance longevity']},
+        {'query': 'Is it good for oily skin?', 'sub_queries': ['oily skin results']},
+    ]))
+    calls = []
+
+    def generate(query):
+        calls.append(query)
+        return generated
+    return SubQueryProvider(generate, store_path=tmp_path / 'store.jsonl', seed_path=seed), calls
+
+
+def test_seeded_queries_skip_generation(tmp_path):
+    sub_queries, calls = provider(tmp_path, ['unused'])
+    assert sub_queries.get('how long does the scent last') == ['scent duration', 'fragrance longevity']
+    # Small edits still match, unrelated queries do not
+    assert sub_queries.get('How long does the scent lasts?') == ['scent duration', 'fragrance longevity']
+    assert sub_queries.lookup('Does the pump break?') is None
+    assert calls == []
+    assert sub_queries.stats()['hits'] == 1 and sub_queries.stats()['fuzzy_hits'] == 1
+
+
+def test_generated_sub_queries_are_stored_across_restarts(tmp_path):
+    sub_queries, calls = provider(tmp_path, ['pump quality', 'pump durability'])
+    assert sub_queries.get('Does the pump break?') == ['pump quality', 'pump durability']
+    assert sub_queries.get('does the pump break') == ['pump quality', 'pump durability']
+    assert calls == ['Does the pump break?']
+
+    # A write torn by a crash is skipped on load
+    with open(tmp_path / 'store.jsonl', 'a') as f:
+        f.write('{"query": "torn')
+    restarted, calls = provider(tmp_path, ['unused'])
+    assert restarted.get('Does the pump break?') == ['pump quality', 'pump durability']
+    assert calls == []
+
+
+def test_empty_generations_are_not_stored(tmp_path):
+    sub_queries, calls = provider(tmp_path, [])
+    assert sub_queries.get('Does the pump break?') == []
+    assert sub_queries.get('Does the pump break?') == []
+    assert len(calls) == 2
+    assert not (tmp_path / 'store.jsonl').exists()
@@ -0,0 +1,26 @@
+from types import SimpleNamespace
+from system_code.core.text_analysis import TitleClassifier
+
+
+class LoadedRuntime:
+    """ModelRuntime stand-in holding an already loaded title model."""
+
+    def __init__(self, commit_hash, precision='fp32'):
+        self.precision = precision
+        self.model = SimpleNamespace(config=SimpleNamespace(_commit_hash=commit_hash))
+
+    def load(self, key, build, wait=True):
+        return self.model, None, None, None
+
+
+def title_classifier(runtime):
+    classifier = TitleClassifier()
+    classifier.runtime = runtime
+    return classifier
+
+
+def test_title_version_names_the_loaded_snapshot():
+    assert title_classifier(LoadedRuntime('abc123')).version == 'Carey8175/InsightView-Title@abc123:fp32'
+    assert title_classifier(LoadedRuntime('def456', 'int8')).version == 'Carey8175/InsightView-Title@def456:int8'
+    # Weights loaded from a plain directory have no hub commit
+    assert title_classifier(LoadedRuntime(None)).version == 'Carey8175/InsightView-Title@local:fp32'